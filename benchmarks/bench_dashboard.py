@@ -0,0 +1,86 @@
+"""Dashboard parsing benchmark"""
+##################################################
+# MIT License
+##################################################
+# File: bench_dashboard.py
+# Description: Compares the streaming projects meta tag extractor with the full BeautifulSoup parse
+# License: MIT
+##################################################
+#
+# Usage: python benchmarks/bench_dashboard.py [saved_dashboard.html ...]
+# Without arguments synthetic dashboard pages with 10 to 5000 projects are generated.
+
+import html
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from olsync.olclient import OverleafClient, extract_projects_meta, PAGE_CHUNK_SIZE  # noqa: E402
+
+PROJECT_COUNTS = [10, 100, 1000, 5000]
+REPEAT = 5
+
+
+def synthetic_page(project_count):
+    """
+    Build a dashboard page resembling the real one: the projects blob in the head,
+    followed by the scripts and markup of the React dashboard
+    """
+    projects = [{
+        "id": "%024x" % i,
+        "name": "Project <%d> & \"thesis\"" % i,
+        "lastUpdated": "2025-06-15T03:34:17.000Z",
+        "accessLevel": "owner",
+        "source": "owner",
+        "archived": i % 10 == 0,
+        "trashed": False,
+        "owner": {"id": "5f0000000000000000000000", "email": "user@example.com", "firstName": "A", "lastName": "B"},
+    } for i in range(project_count)]
+    blob = json.dumps({"totalSize": project_count, "projects": projects})
+    head = ('<!DOCTYPE html><html><head><title>Your Projects</title>'
+            '<meta name="ol-csrfToken" content="token">'
+            '<meta name="ol-prefetchedProjectsBlob" data-type="json" content="%s">' % html.escape(blob))
+    body = ''.join('<script>window.chunk%d = "%s";</script><div class="row"><span>%d</span></div>'
+                   % (i, "x" * 200, i) for i in range(project_count * 5))
+    return (head + '</head><body>' + body + '</body></html>').encode('utf-8')
+
+
+def chunked(page):
+    return (page[i:i + PAGE_CHUNK_SIZE] for i in range(0, len(page), PAGE_CHUNK_SIZE))
+
+
+def best_of(action):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(paths):
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                pages.append((os.path.basename(path), f.read()))
+    else:
+        pages = [("%d projects" % count, synthetic_page(count)) for count in PROJECT_COUNTS]
+
+    print("%-20s %10s %14s %14s %9s" % ("page", "size (KiB)", "full parse (s)", "streaming (s)", "speedup"))
+    for name, page in pages:
+        json_content, _ = extract_projects_meta(chunked(page))
+        streamed = list(OverleafClient.filter_projects(OverleafClient._projects_data(json_content)))
+        if streamed != OverleafClient._parse_projects_page(page):
+            raise AssertionError("Streaming extractor and full parse disagree for %s" % name)
+
+        full = best_of(lambda: OverleafClient._parse_projects_page(page))
+        streaming = best_of(lambda: extract_projects_meta(chunked(page)))
+        print("%-20s %10d %14.4f %14.4f %8.1fx" % (name, len(page) // 1024, full, streaming, full / streaming))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
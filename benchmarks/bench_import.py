@@ -0,0 +1,80 @@
+"""CLI import time benchmark"""
+##################################################
+# MIT License
+##################################################
+# File: bench_import.py
+# Description: Measures the cold-start import time of the ols command with python -X importtime
+# License: MIT
+##################################################
+#
+# Usage: python benchmarks/bench_import.py [-n RUNS] [--top N] [--max-ms MS]
+#
+# Imports olsync.olsync in fresh interpreters and reports the fastest run and the slowest imports of it.
+# Exits with code 1 if a dependency only some commands need (the login window, the HTML parser, the Socket.IO
+# client, asyncio) is imported at startup, or if the import takes longer than --max-ms.
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+MODULE = "olsync.olsync"
+# Imported only by the commands which need them, never at startup
+LAZY_MODULES = ("PySide6", "bs4", "socketIO_client", "aiohttp", "asyncio")
+
+
+def import_times():
+    """
+    Import MODULE in a fresh interpreter
+    Returns: dict of module name -> cumulative import time in microseconds
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + MODULE], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise SystemExit("Importing %s failed:\n%s" % (MODULE, result.stderr[-2000:]))
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == "site":
+            times = {}  # Everything before is the interpreter's own startup
+            continue
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the ols command")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="Number of fresh interpreters, the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest top-level imports to list")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the import takes longer")
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(max(1, args.runs))]
+    fastest = min(runs, key=lambda times: times[MODULE])
+    total_ms = fastest[MODULE] / 1000
+
+    print("%-40s %10s" % ("import", "ms"))
+    slowest = sorted(((name, us) for name, us in fastest.items() if name != MODULE and "." not in name),
+                     key=lambda item: -item[1])
+    for name, us in slowest[:args.top]:
+        print("%-40s %10.1f" % (name, us / 1000))
+    print("%-40s %10.1f  (fastest of %d runs)" % (MODULE, total_ms, len(runs)))
+
+    failed = False
+    eager = sorted(name for name in fastest if name.split(".")[0] in LAZY_MODULES)
+    if eager:
+        print("Imported at startup but only needed by some commands: %s" % ", ".join(eager))
+        failed = True
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print("Import took %.1f ms, more than the allowed %.1f ms" % (total_ms, args.max_ms))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Sync throughput benchmark"""
+##################################################
+# MIT License
+##################################################
+# File: bench_sync.py
+# Description: Times ols syncs against the fake Overleaf server on synthetic projects
+# License: MIT
+##################################################
+#
+# Usage: python benchmarks/bench_sync.py [-j JOBS] [--quick] [--max-concurrent N]
+#
+# For every synthetic project (file count x file size) the following syncs are run in order:
+#   initial      empty sync folder, every file is downloaded
+#   unchanged    nothing changed on either side
+#   remote edit  one doc was edited on Overleaf
+#   local edit   one file was edited locally and is pushed
+#   local add    10% new local files are pushed
+# Reported are the wall time, the requests received by the server and the bytes it received and sent.
+# With --max-concurrent the server answers requests beyond N at the same time with 429 Too Many Requests, as an
+# overloaded server does; they show up as "throttled" requests.
+
+import argparse
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+from click.testing import CliRunner
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from olsync.olsync import main as ols  # noqa: E402
+from fake_overleaf import FakeOverleaf, CSRF_TOKEN  # noqa: E402
+
+PROJECTS = [  # (file count, file size in bytes)
+    (10, 4 * 1024),
+    (100, 4 * 1024),
+    (1000, 1024),
+    (20, 1024 * 1024),
+]
+QUICK_PROJECTS = [(10, 4 * 1024), (100, 1024)]
+
+
+def synthetic_files(count, size, prefix=""):
+    """
+    Docs with a few binary files among them, spread over up to ten folders
+    """
+    files = {}
+    for i in range(count):
+        folder = "chapter%d/" % (i % 10) if count > 10 else ""
+        extension = ".png" if i % 5 == 4 else ".tex"
+        line = ("%% %s file %d " % (prefix, i)).encode("ascii")
+        files["%s%s%s%d%s" % (folder, prefix, "file", i, extension)] = (line * (size // len(line) + 1))[:size]
+    return files
+
+
+def run_sync(server, sync_path, cookie_path, jobs):
+    server.stats.reset()
+    start = time.perf_counter()
+    # Local edits are older than the remote copy in the remote to local phase, keep them to push them afterwards
+    result = CliRunner().invoke(ols, ["--store-path", cookie_path, "-p", sync_path, "-j", str(jobs)],
+                                input="n\n" * 1000)
+    elapsed = time.perf_counter() - start
+    if result.exit_code != 0:
+        raise AssertionError("Sync failed:\n%s\n%r" % (result.output, result.exception))
+    return elapsed, server.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ols syncs against a local fake Overleaf server")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Number of concurrent transfers per sync")
+    parser.add_argument("--quick", action="store_true", help="Only run the small projects")
+    parser.add_argument("--max-concurrent", type=int, default=None,
+                        help="Simulate an overloaded server accepting only N concurrent requests")
+    args = parser.parse_args()
+
+    server = FakeOverleaf().start()
+    server.max_concurrent = args.max_concurrent
+    work_dir = tempfile.mkdtemp(prefix="ols-bench-")
+    cookie_path = os.path.join(work_dir, ".olauth")
+    with open(cookie_path, "wb") as f:
+        pickle.dump({"cookie": {"overleaf.sid": "bench"}, "csrf": CSRF_TOKEN, "base_url": server.url}, f)
+
+    print("%-22s %-12s %9s %9s %12s %12s  %s" % (
+        "project", "sync", "wall (s)", "requests", "down (KiB)", "up (KiB)", "requests by endpoint"))
+    try:
+        for count, size in (QUICK_PROJECTS if args.quick else PROJECTS):
+            name = "bench-%d-files-%dk" % (count, size // 1024)
+            project = server.add_project(name, synthetic_files(count, size))
+            sync_path = os.path.join(work_dir, name)
+            os.makedirs(sync_path)
+
+            def local_edit():
+                path = os.path.join(sync_path, sorted(project.files())[0])
+                with open(path, "ab") as f:
+                    f.write(b"% local edit\n")
+
+            def local_add():
+                for path, content in synthetic_files(max(1, count // 10), size, "new").items():
+                    path = os.path.join(sync_path, path)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(content)
+
+            steps = [
+                ("initial", lambda: None),
+                ("unchanged", lambda: None),
+                ("remote edit", lambda: project.write(sorted(project.files())[0], b"% remote edit\n")),
+                ("local edit", local_edit),
+                ("local add", local_add),
+            ]
+            for step, prepare in steps:
+                prepare()
+                elapsed, stats = run_sync(server, sync_path, cookie_path, args.jobs)
+                by_endpoint = ", ".join("%s=%d" % item for item in sorted(stats.requests.items()))
+                print("%-22s %-12s %9.2f %9d %12.1f %12.1f  %s" % (
+                    name, step, elapsed, stats.total_requests, stats.bytes_out / 1024, stats.bytes_in / 1024,
+                    by_endpoint))
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
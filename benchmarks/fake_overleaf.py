@@ -0,0 +1,625 @@
+"""Fake Overleaf server"""
+##################################################
+# MIT License
+##################################################
+# File: fake_overleaf.py
+# Description: Local stand-in for the Overleaf endpoints used by the sync tool, for benchmarks
+# License: MIT
+##################################################
+#
+# Usage: python benchmarks/fake_overleaf.py [port]
+# Serves a small project named "demo"; benchmarks start FakeOverleaf in-process instead.
+#
+# Implements the dashboard (projects meta tag), zip download, single doc and file downloads, upload,
+# folder creation, deletion, compile with PDF download (cacheable ranges, range requests) and a minimal
+# Socket.IO 0.9 server (xhr-polling and, if enabled, websocket transport) answering joinProject. Every request is counted with the bytes
+# it moved. An overloaded server can be simulated by limiting the number of concurrent requests.
+
+import base64
+import email.parser
+import email.policy
+import hashlib
+import html
+import io
+import json
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+CSRF_TOKEN = "fake-csrf-token"
+SOCKET_IO_FRAME = "\ufffd"  # Separates the length and the text of Socket.IO 0.9 packets sent in one response
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"  # Appended to the key of a WebSocket handshake, RFC 6455
+DOC_EXTENSIONS = (".tex", ".bib", ".cls", ".sty", ".txt", ".md", ".bst")  # Uploads stored as docs, not files
+PDF_CACHING_MIN_CHUNK_SIZE = 1024  # Files of at least this size are reported as cacheable ranges of the PDF
+OTHER_OUTPUTS = {  # Output files besides the PDF, by extension
+    "log": b"This is a fake compile log.\n",
+    "synctex.gz": b"\x1f\x8b fake synctex\n",
+    "bbl": b"\\begin{thebibliography}{0}\n\\end{thebibliography}\n",
+    "aux": b"\\relax\n",
+}
+RANGE = re.compile(r"^bytes=(\d+)-(\d+)$")  # Only single byte ranges are supported
+
+
+def _read_frame(stream):
+    """
+    Read a WebSocket frame
+    Returns: tuple of opcode and payload, or None at the end of the stream
+    """
+    head = stream.read(2)
+    if len(head) < 2:
+        return None
+    length = head[1] & 0x7f
+    if length == 126:
+        length, = struct.unpack(">H", stream.read(2))
+    elif length == 127:
+        length, = struct.unpack(">Q", stream.read(8))
+    mask = stream.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+    payload = stream.read(length)
+    return head[0] & 0x0f, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+def _text_frame(text):
+    payload = text.encode("utf-8")
+    if len(payload) < 126:
+        head = struct.pack(">BB", 0x81, len(payload))
+    elif len(payload) < 1 << 16:
+        head = struct.pack(">BBH", 0x81, 126, len(payload))
+    else:
+        head = struct.pack(">BBQ", 0x81, 127, len(payload))
+    return head + payload
+
+
+def _new_id():
+    return uuid.uuid4().hex[:24]
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _folder(name):
+    return {"_id": _new_id(), "name": name, "docs": [], "fileRefs": [], "folders": []}
+
+
+class FakeProject(object):
+    """
+    A project held in memory: a file tree like the one joinProject returns, plus the content of every entity
+    """
+
+    def __init__(self, name):
+        self.id = _new_id()
+        self.name = name
+        self.last_updated = _now()
+        self.root = _folder("rootFolder")
+        self.content = {}  # Entity id -> bytes
+        self.modified = {}  # Entity id -> time of the last edit (POSIX time stamp)
+        self.builds = {}  # Build id -> PDF, of the latest compiles
+
+    def touch(self):
+        # The dashboard time stamp has a millisecond resolution, make sure it changes with every edit
+        time.sleep(0.002)
+        self.last_updated = _now()
+
+    def walk(self):
+        """
+        Returns: generator of (path, folder containing the entity, list key, entity) of all docs and files
+        """
+        pending = [("", self.root)]
+        while pending:
+            prefix, folder = pending.pop()
+            for key in ("docs", "fileRefs"):
+                for entity in folder[key]:
+                    yield prefix + entity["name"], folder, key, entity
+            for sub_folder in folder["folders"]:
+                pending.append((prefix + sub_folder["name"] + "/", sub_folder))
+
+    def find_folder(self, folder_id):
+        pending = [self.root]
+        while pending:
+            folder = pending.pop()
+            if folder["_id"] == folder_id:
+                return folder
+            pending.extend(folder["folders"])
+        return None
+
+    def find_parent(self, folder_id):
+        """
+        Returns: the folder containing the folder with folder_id, None for the root folder or unknown ids
+        """
+        pending = [self.root]
+        while pending:
+            folder = pending.pop()
+            if any(sub_folder["_id"] == folder_id for sub_folder in folder["folders"]):
+                return folder
+            pending.extend(folder["folders"])
+        return None
+
+    def find_entity(self, entity_id):
+        return next(((folder, key, entity) for _, folder, key, entity in self.walk()
+                     if entity["_id"] == entity_id), None)
+
+    def put(self, folder, name, content):
+        """
+        Store a file in a folder: docs keep their id when replaced, binary files get a new one
+        Returns: tuple of the entity type ("doc" or "file") and the entity
+        """
+        key = "docs" if name.lower().endswith(DOC_EXTENSIONS) else "fileRefs"
+        for existing_key in ("docs", "fileRefs"):
+            existing = next((e for e in folder[existing_key] if e["name"] == name), None)
+            if existing is None:
+                continue
+            if existing_key == key == "docs":
+                self.content[existing["_id"]] = content
+                self.modified[existing["_id"]] = time.time()
+                self.touch()
+                return "doc", existing
+            folder[existing_key].remove(existing)
+            self.content.pop(existing["_id"], None)
+        entity = {"_id": _new_id(), "name": name}
+        if key == "fileRefs":
+            entity["created"] = _now()
+        folder[key].append(entity)
+        self.content[entity["_id"]] = content
+        self.modified[entity["_id"]] = time.time()
+        self.touch()
+        return ("doc" if key == "docs" else "file"), entity
+
+    def write(self, path, content):
+        """
+        Create or replace a file by path, creating missing folders, as if it was edited in the browser
+        """
+        folder = self.root
+        *folder_names, name = path.split("/")
+        for folder_name in folder_names:
+            sub_folder = next((f for f in folder["folders"] if f["name"] == folder_name), None)
+            if sub_folder is None:
+                sub_folder = _folder(folder_name)
+                folder["folders"].append(sub_folder)
+            folder = sub_folder
+        self.put(folder, name, content)
+
+    def delete(self, path):
+        for entity_path, folder, key, entity in list(self.walk()):
+            if entity_path == path:
+                folder[key].remove(entity)
+                self.content.pop(entity["_id"], None)
+                self.touch()
+
+    def pdf(self, build):
+        """
+        Fake PDF of the project: every file becomes a stream object, files of at least PDF_CACHING_MIN_CHUNK_SIZE
+        bytes are reported as cacheable ranges (hashed with SHA-256) like Overleaf's PDF caching does.
+        The trailer changes with every build, like the document id of a real PDF.
+        Returns: tuple of the PDF and its ranges
+        """
+        pdf = bytearray(b"%PDF-1.5\n")
+        ranges = []
+        for number, (path, content) in enumerate(sorted(self.files().items()), 1):
+            pdf += b"%d 0 obj\n<< /Length %d >>\nstream\n" % (number, len(content))
+            if len(content) >= PDF_CACHING_MIN_CHUNK_SIZE:
+                ranges.append({"objectId": "%d 0 R" % number, "start": len(pdf), "end": len(pdf) + len(content),
+                               "hash": hashlib.sha256(content).hexdigest()})
+            pdf += content + b"\nendstream\nendobj\n"
+        pdf += b"trailer\n<< /ID [<%s>] >>\n%%%%EOF\n" % build.encode("ascii")
+        return bytes(pdf), ranges
+
+    def files(self):
+        """
+        Returns: dict of path -> content of all docs and files
+        """
+        return {path: self.content[entity["_id"]] for path, _, _, entity in self.walk()}
+
+    def zip(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for path, _, _, entity in sorted(self.walk(), key=lambda item: item[0]):
+                # Every entry carries the time its file was last edited, in UTC
+                info = zipfile.ZipInfo(path, time.gmtime(self.modified[entity["_id"]])[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, self.content[entity["_id"]])
+        return buffer.getvalue()
+
+    def infos(self):
+        return {"_id": self.id, "name": self.name, "rootFolder": [json.loads(json.dumps(self.root))]}
+
+
+class RequestStats(object):
+    """
+    Number of requests and bytes received and sent per endpoint
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.bytes_in = 0
+            self.bytes_out = 0
+
+    def add(self, endpoint, bytes_in, bytes_out):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real server
+
+    def log_message(self, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            pass  # The client dropped a kept-alive connection
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, endpoint, status, body=b"", content_type="application/json"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        elif not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        self.fake.stats.add(endpoint, self._bytes_in, len(body))
+
+    def _send_ranged(self, endpoint, body, content_type):
+        """
+        Send body, or the single byte range the request asks for
+        """
+        match = RANGE.match(self.headers.get("Range", ""))
+        if match is None:
+            return self._send(endpoint, 200, body, content_type)
+        start, end = int(match.group(1)), min(int(match.group(2)), len(body) - 1)
+        if start > end:
+            return self._send(endpoint, 416, b"", content_type)
+        part = body[start:end + 1]
+        self.send_response(206)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Range", "bytes %d-%d/%d" % (start, end, len(body)))
+        self.send_header("Content-Length", str(len(part)))
+        self.end_headers()
+        self.wfile.write(part)
+        self.fake.stats.add(endpoint + " range", self._bytes_in, len(part))
+
+    def _route(self, body):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip("/") or "/"
+        fake = self.fake
+
+        if path.startswith("/socket.io/1"):
+            return fake.socket_io(self, path, query, body)
+        if self.command == "GET" and path == "/login":
+            return self._send("login", 200, '<meta name="ol-csrfToken" content="%s">' % CSRF_TOKEN, "text/html")
+        if self.command == "GET" and path == "/project":
+            return self._send("dashboard", 200, fake.dashboard(), "text/html")
+
+        match = re.match(r"^/project/([0-9a-f]+)(/.*)?$", path)
+        project = fake.projects.get(match.group(1)) if match else None
+        if project is None:
+            return self._send("unknown", 404, {"message": "Not found"})
+        route = match.group(2) or ""
+
+        if self.command == "POST" and route == "/compile":
+            time.sleep(fake.compile_time)  # Compiles run concurrently, like on separate compile servers
+
+        with fake.lock:
+            if self.command == "GET" and route == "/download/zip":
+                return self._send("zip", 200, project.zip(), "application/zip")
+
+            doc = re.match(r"^/doc/([0-9a-f]+)(/download)?$", route)
+            file = re.match(r"^/file/([0-9a-f]+)$", route)
+            entity = (doc or file) and project.find_entity((doc or file).group(1))
+            if (doc or file) and self.command == "GET":
+                if entity is None:
+                    return self._send("download", 404)
+                return self._send("download", 200, project.content[entity[2]["_id"]], "application/octet-stream")
+            if (doc or file) and self.command == "DELETE":
+                if entity is None:
+                    return self._send("delete", 404)
+                folder, key, found = entity
+                folder[key].remove(found)
+                project.content.pop(found["_id"], None)
+                project.touch()
+                return self._send("delete", 204)
+
+            folder_match = re.match(r"^/folder/([0-9a-f]+)$", route)
+            if folder_match and self.command == "DELETE":
+                parent = project.find_parent(folder_match.group(1))
+                if parent is None:
+                    return self._send("delete folder", 404)
+                folder = next(f for f in parent["folders"] if f["_id"] == folder_match.group(1))
+                parent["folders"].remove(folder)
+                pending = [folder]
+                while pending:
+                    removed = pending.pop()
+                    for entity in removed["docs"] + removed["fileRefs"]:
+                        project.content.pop(entity["_id"], None)
+                    pending.extend(removed["folders"])
+                project.touch()
+                return self._send("delete folder", 204)
+
+            if self.command == "POST" and route == "/folder":
+                params = json.loads(body or b"{}")
+                parent = project.find_folder(params.get("parent_folder_id")) or project.root
+                if any(f["name"] == params.get("name") for f in parent["folders"]):
+                    return self._send("folder", 400, {"message": "file already exists"})
+                folder = _folder(params["name"])
+                parent["folders"].append(folder)
+                project.touch()
+                return self._send("folder", 200, folder)
+
+            if self.command == "POST" and route == "/upload":
+                folder = project.find_folder((query.get("folder_id") or [None])[0]) or project.root
+                name, content = self._multipart_file(body)
+                if name is None:
+                    return self._send("upload", 422, {"success": False})
+                name = (query.get("qqfilename") or [name])[0].rpartition("/")[2]
+                entity_type, entity = project.put(folder, name, content)
+                return self._send("upload", 200, {"success": True, "entity_id": entity["_id"],
+                                                  "entity_type": entity_type})
+
+            if self.command == "POST" and route == "/compile":
+                build = _new_id()
+                pdf, ranges = project.pdf(build)
+                # Keep the PDFs of the latest builds only
+                project.builds = dict(list(project.builds.items())[-1:])
+                project.builds[build] = pdf
+                url = "/project/%s/build/%s/output/output.%%s" % (project.id, build)
+                output_files = [{"path": "output.pdf", "type": "pdf", "build": build, "contentId": build,
+                                 "size": len(pdf), "ranges": ranges, "url": url % "pdf"}]
+                output_files += [{"path": "output." + output, "type": output.rpartition(".")[2], "build": build,
+                                  "url": url % output} for output in sorted(OTHER_OUTPUTS)]
+                return self._send("compile", 200, {
+                    "status": "success",
+                    "pdfCachingMinChunkSize": PDF_CACHING_MIN_CHUNK_SIZE,
+                    "outputFiles": output_files,
+                })
+            output = re.match(r"^/build/([0-9a-f]+)/output/output\.pdf$", route)
+            if self.command == "GET" and output:
+                pdf = project.builds.get(output.group(1))
+                if pdf is None:
+                    return self._send("output", 404)
+                return self._send_ranged("output", pdf, "application/pdf")
+            output = re.match(r"^/build/[0-9a-f]+/output/output\.(.+)$", route)
+            if self.command == "GET" and output and output.group(1) in OTHER_OUTPUTS:
+                return self._send("output", 200, OTHER_OUTPUTS[output.group(1)], "application/octet-stream")
+
+        return self._send("unknown", 404, {"message": "Not found"})
+
+    def _multipart_file(self, body):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + self.headers.get("Content-Type", "").encode("latin-1") + b"\r\n\r\n" + body)
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "qqfile":
+                return part.get_filename(), part.get_payload(decode=True)
+        return None, None
+
+    def _handle(self):
+        fake = self.fake
+        try:
+            body = self._body()
+            self._bytes_in = len(body)  # Only the request and response bodies are counted
+            with fake.lock:
+                fake.in_flight += 1
+                overloaded = fake.max_concurrent is not None and fake.in_flight > fake.max_concurrent
+            try:
+                if overloaded and not self.path.startswith("/socket.io/"):
+                    self.send_response(429)
+                    if fake.retry_after is not None:
+                        self.send_header("Retry-After", str(fake.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    fake.stats.add("throttled", self._bytes_in, 0)
+                else:
+                    self._route(body)
+            finally:
+                with fake.lock:
+                    fake.in_flight -= 1
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    do_GET = do_POST = do_DELETE = do_HEAD = _handle
+
+
+class FakeOverleaf(object):
+    """
+    In-process fake Overleaf server on 127.0.0.1, see the module description for the supported endpoints
+    """
+
+    def __init__(self, port=0):
+        self.projects = {}  # Project id -> FakeProject
+        self.stats = RequestStats()
+        self.compile_time = 0.0  # Seconds every compile takes
+        # Requests beyond this many at the same time are answered with 429 Too Many Requests, None for no limit
+        self.max_concurrent = None
+        self.retry_after = None  # Retry-After header of the 429 answers, in seconds
+        self.in_flight = 0
+        self.transports = ["xhr-polling"]  # Socket.IO transports offered, add "websocket" to enable it
+        self.lock = threading.RLock()  # Guards the projects, requests are handled on concurrent threads
+        self._sockets = {}  # Socket.IO session id -> list of packets waiting to be polled
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d" % self._server.server_address[1]
+
+    def add_project(self, name, files=None):
+        """
+        Create a project
+        Params: name, the project name; files, dict of path -> bytes
+        Returns: FakeProject
+        """
+        project = FakeProject(name)
+        for path, content in (files or {}).items():
+            project.write(path, content)
+        with self.lock:
+            self.projects[project.id] = project
+        return project
+
+    def dashboard(self):
+        with self.lock:
+            projects = [{"id": p.id, "name": p.name, "lastUpdated": p.last_updated, "accessLevel": "owner",
+                         "archived": False, "trashed": False} for p in self.projects.values()]
+        blob = json.dumps({"totalSize": len(projects), "projects": projects})
+        return ('<!DOCTYPE html><html><head><title>Your Projects</title>'
+                '<meta name="ol-csrfToken" content="%s">'
+                '<meta name="ol-prefetchedProjectsBlob" data-type="json" content="%s">'
+                '</head><body><div id="projects-root"></div></body></html>' % (CSRF_TOKEN, html.escape(blob)))
+
+    def socket_io(self, handler, path, query, body):
+        """
+        Minimal Socket.IO 0.9 server: handshake and the xhr-polling transport, answering joinProject
+        """
+        parts = path.split("/")  # '', 'socket.io', '1', transport, session id
+        if len(parts) == 3:
+            session_id = _new_id()
+            with self.lock:
+                self._sockets[session_id] = ["1::"]
+            return handler._send("socket.io", 200, "%s:60:60:%s" % (session_id, ",".join(self.transports)),
+                                 "text/plain")
+
+        session_id = parts[4] if len(parts) > 4 else None
+        if parts[3] == "websocket":
+            return self._websocket(handler, session_id)
+        with self.lock:
+            packets = self._sockets.get(session_id)
+            if packets is None:
+                return handler._send("socket.io", 404, "", "text/plain")
+            if "disconnect" in query:
+                del self._sockets[session_id]
+                return handler._send("socket.io", 200, "", "text/plain")
+            if handler.command == "POST":
+                for packet in self._unframe(body.decode("utf-8")):
+                    self._socket_io_packet(packets, packet)
+                return handler._send("socket.io", 200, "1", "text/plain")
+            pending, packets[:] = packets[:], []
+
+        if not pending:
+            pending = ["8::"]  # Noop, closes the poll
+        if len(pending) == 1:
+            text = pending[0]
+        else:
+            text = "".join("%s%d%s%s" % (SOCKET_IO_FRAME, len(p), SOCKET_IO_FRAME, p) for p in pending)
+        return handler._send("socket.io", 200, text, "text/plain; charset=UTF-8")
+
+    def _websocket(self, handler, session_id):
+        """
+        Serve the websocket transport of a Socket.IO session until the client disconnects
+        """
+        with self.lock:
+            packets = self._sockets.get(session_id)
+        if packets is None or "websocket" not in self.transports or \
+                handler.headers.get("Upgrade", "").lower() != "websocket":
+            return handler._send("socket.io", 404, "", "text/plain")
+        key = handler.headers.get("Sec-WebSocket-Key", "")
+        handler.send_response(101)
+        handler.send_header("Upgrade", "websocket")
+        handler.send_header("Connection", "Upgrade")
+        handler.send_header("Sec-WebSocket-Accept", base64.b64encode(
+            hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii"))
+        handler.end_headers()
+        handler.close_connection = True
+        self.stats.add("socket.io", 0, 0)
+        closed = threading.Event()
+
+        def receive():
+            try:
+                while True:
+                    frame = _read_frame(handler.rfile)
+                    if frame is None or frame[0] == 0x8:
+                        return
+                    if frame[0] != 0x1:
+                        continue
+                    for packet in self._unframe(frame[1].decode("utf-8")):
+                        if packet.startswith("0:"):
+                            return
+                        with self.lock:
+                            self._socket_io_packet(packets, packet)
+            except OSError:
+                pass
+            finally:
+                closed.set()
+
+        threading.Thread(target=receive, daemon=True).start()
+        try:
+            while not closed.wait(0.02):
+                with self.lock:
+                    pending, packets[:] = packets[:], []
+                for packet in pending:
+                    handler.wfile.write(_text_frame(packet))
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                self._sockets.pop(session_id, None)
+
+    @staticmethod
+    def _unframe(text):
+        if not text.startswith(SOCKET_IO_FRAME):
+            return [text]
+        parts = text.split(SOCKET_IO_FRAME)
+        return parts[2::2]
+
+    def _socket_io_packet(self, packets, packet):
+        code, packet_id, _, data = (packet.split(":", 3) + ["", "", ""])[:4]
+        if code != "5" or not packet_id:
+            return  # Heartbeats and everything but acknowledged events need no answer
+        event = json.loads(data)
+        if event.get("name") != "joinProject":
+            return
+        project = self.projects.get((event.get("args") or [{}])[0].get("project_id"))
+        if project is None:
+            answer = [{"message": "not authorized"}]
+        else:
+            answer = [None, project.infos(), "owner", 2]
+        packets.append("6:::%s+%s" % (packet_id.rstrip("+"), json.dumps(answer)))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    server = FakeOverleaf(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    server.add_project("demo", {"main.tex": b"\\documentclass{article}\n\\begin{document}\nHello\n\\end{document}\n"})
+    print("Fake Overleaf running on %s, press Ctrl+C to stop" % server.url)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,692 @@
+"""Overleaf Async Client"""
+##################################################
+# MIT License
+##################################################
+# File: olasync.py
+# Description: asyncio Overleaf API Wrapper on aiohttp, with the API of OverleafClient
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+#
+# Needs the optional dependency aiohttp: pip install overleaf-sync[async]
+
+import asyncio
+import contextlib
+import json
+import re
+import tempfile
+import time
+import uuid
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    raise ImportError("AsyncOverleafClient needs aiohttp, install it with: pip install overleaf-sync[async]")
+
+try:
+    # Import for pip installation / wheel
+    from olsync.olclient import OverleafClient, ProjectIndex, extract_projects_meta, SITE_URL, PROJECT_URL, \
+        DOWNLOAD_URL, DOC_DOWNLOAD_URL, FILE_DOWNLOAD_URL, UPLOAD_URL, FOLDER_URL, DELETE_URL, DELETE_FILE_URL, \
+        DELETE_FOLDER_URL, COMPILE_URL, COMPILE_OPTIONS, PATH_SEP, POOL_SIZE, TIMEOUT, CHUNK_SIZE, SPOOL_SIZE, \
+        FILE_SPOOL_SIZE
+    from olsync.olrealtime import ProjectTree, JOIN_TIMEOUT
+    from olsync.olretry import ConcurrencyLimiter, IDEMPOTENT_METHODS, PRESSURE_STATUSES, RetryPolicy
+except ImportError:
+    # Import for development
+    from olclient import OverleafClient, ProjectIndex, extract_projects_meta, SITE_URL, PROJECT_URL, \
+        DOWNLOAD_URL, DOC_DOWNLOAD_URL, FILE_DOWNLOAD_URL, UPLOAD_URL, FOLDER_URL, DELETE_URL, DELETE_FILE_URL, \
+        DELETE_FOLDER_URL, COMPILE_URL, COMPILE_OPTIONS, PATH_SEP, POOL_SIZE, TIMEOUT, CHUNK_SIZE, SPOOL_SIZE, \
+        FILE_SPOOL_SIZE
+    from olrealtime import ProjectTree, JOIN_TIMEOUT
+    from olretry import ConcurrencyLimiter, IDEMPOTENT_METHODS, PRESSURE_STATUSES, RetryPolicy
+
+SOCKET_IO_URL = "/socket.io/1/"  # Socket.IO 0.9 handshake, the transports are below it
+SOCKET_IO_FRAME = "\ufffd"  # Separates the length and the text of Socket.IO 0.9 packets sent in one message
+
+
+def _unframe(text):
+    """
+    Returns: list of the Socket.IO 0.9 packets in a message
+    """
+    if not text.startswith(SOCKET_IO_FRAME):
+        return [text] if text else []
+    return text.split(SOCKET_IO_FRAME)[2::2]
+
+
+class _FilePayload(aiohttp.payload.Payload):
+    """
+    Upload payload reading size bytes of a file from its current position in chunks, off the event loop.
+    Unlike aiohttp's own file payloads, which some aiohttp releases close once they are sent, the file is never
+    closed, so a retried upload can read it again.
+    """
+
+    def __init__(self, file, size, **kwargs):
+        super().__init__(file, **kwargs)
+        self._size = size
+
+    async def write(self, writer):
+        loop = asyncio.get_running_loop()
+        remaining = self._size
+        while remaining > 0:
+            chunk = await loop.run_in_executor(None, self._value.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise IOError("Unexpected end of file, %d bytes missing" % remaining)
+            await writer.write(chunk)
+            remaining -= len(chunk)
+
+    def decode(self, encoding="utf-8", errors="strict"):
+        raise TypeError("The content of an uploaded file is not decoded")
+
+
+class AsyncConcurrencyLimiter(ConcurrencyLimiter):
+    """
+    ConcurrencyLimiter for coroutines of one event loop, acquire and release have to be awaited
+    """
+
+    def __init__(self, limit, min_limit=1):
+        super().__init__(limit, min_limit)
+        # Before Python 3.10 a condition binds to the event loop current when it is created, the client may be
+        # created outside of the loop it is used in
+        self._condition = None
+
+    async def acquire(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            permit = self._admit()
+            while permit is None:
+                await self._condition.wait()
+                permit = self._admit()
+            return permit
+
+    async def release(self, permit, pressure=None):
+        async with self._condition:
+            self._update(permit, pressure)
+            self._condition.notify_all()
+
+
+class _WebSocketTransport(object):
+    def __init__(self, websocket):
+        self._websocket = websocket
+
+    async def receive(self):
+        message = await self._websocket.receive()
+        if message.type == aiohttp.WSMsgType.TEXT:
+            return _unframe(message.data)
+        if message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED,
+                            aiohttp.WSMsgType.ERROR):
+            raise aiohttp.ClientConnectionError("Socket.IO websocket closed")
+        return []
+
+    async def send(self, packet):
+        await self._websocket.send_str(packet)
+
+    async def close(self):
+        await self._websocket.close()
+
+
+class _PollingTransport(object):
+    """
+    xhr-polling transport, for servers (or proxies) which do not offer websockets
+    """
+
+    def __init__(self, http, url):
+        self._http = http
+        self._url = url
+
+    async def receive(self):
+        async with self._http.get(self._url, params={"t": str(int(time.time() * 1000))}) as r:
+            r.raise_for_status()
+            return _unframe(await r.text())
+
+    async def send(self, packet):
+        async with self._http.post(self._url, data=packet.encode("utf-8"),
+                                   headers={"Content-Type": "text/plain;charset=UTF-8"}) as r:
+            r.raise_for_status()
+
+    async def close(self):
+        async with self._http.get(self._url, params={"disconnect": "1"}):
+            pass
+
+
+class AsyncRealtimeSession(ProjectTree):
+    """
+    Socket.IO 0.9 session joined to one project, on the event loop
+    Like RealtimeSession, but the packets are received by a task as they arrive, so tree events are applied
+    without polling. The websocket transport is used if the server offers it, xhr-polling otherwise. A dropped
+    connection is re-established (and the project re-joined) by the next poll().
+    """
+
+    def __init__(self, http, url, project_id):
+        super().__init__(project_id)
+        self._http = http
+        self._url = url
+        self._transport = None
+        self._receiver = None  # Task receiving the packets
+        self._acks = {}  # Message id -> future of the acknowledgement
+        self._message_id = 0
+
+    @property
+    def connected(self):
+        return self._receiver is not None and not self._receiver.done()
+
+    async def connect(self):
+        """
+        Connect to the Socket.IO endpoint and join the project
+        Returns: project details, including the file tree
+        """
+        await self.close()
+
+        async with self._http.get(self._url + SOCKET_IO_URL, params={"t": str(int(time.time()))}) as r:
+            r.raise_for_status()
+            session_id, _, _, transports = (await r.text()).split(":", 3)
+        if "websocket" in transports.split(","):
+            websocket_url = re.sub(r"^http", "ws", self._url) + SOCKET_IO_URL + "websocket/" + session_id
+            self._transport = _WebSocketTransport(await self._http.ws_connect(websocket_url))
+        else:
+            self._transport = _PollingTransport(self._http, self._url + SOCKET_IO_URL + "xhr-polling/" + session_id)
+
+        connected = asyncio.get_running_loop().create_future()
+        self._receiver = asyncio.ensure_future(self._receive(self._transport, connected))
+        try:
+            await asyncio.wait_for(asyncio.shield(connected), JOIN_TIMEOUT)
+            answer = await self._emit('joinProject', {'project_id': self.project_id})
+        except BaseException:
+            await self.close()
+            raise
+        error, project_infos = (answer + [None, None])[:2]
+
+        if error or project_infos is None:
+            await self.close()
+            raise Exception("Could not join project %s: %s" % (self.project_id, error or "no answer"))
+
+        self.joined(project_infos)
+        return project_infos
+
+    async def poll(self):
+        """
+        Returns: project details, including the up to date file tree, reconnecting if the connection was lost
+        """
+        if not self.connected:
+            return await self.connect()
+        await asyncio.sleep(0)  # Let the receiver apply the events which already arrived
+        return self.project_infos
+
+    async def close(self):
+        """
+        Disconnect from the Socket.IO endpoint
+        """
+        transport, self._transport = self._transport, None
+        receiver, self._receiver = self._receiver, None
+        if receiver is not None:
+            receiver.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await receiver
+        if transport is not None:
+            with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
+                await transport.send("0::")
+                await transport.close()
+
+    async def _emit(self, name, *args):
+        """
+        Send an event and wait for its acknowledgement
+        Returns: the list of the arguments of the acknowledgement
+        """
+        self._message_id += 1
+        ack = asyncio.get_running_loop().create_future()
+        self._acks[str(self._message_id)] = ack
+        await self._transport.send("5:%d+::%s" % (self._message_id, json.dumps({"name": name, "args": list(args)})))
+        return await asyncio.wait_for(ack, JOIN_TIMEOUT)
+
+    async def _receive(self, transport, connected):
+        error = aiohttp.ClientConnectionError("Socket.IO connection closed")
+        try:
+            while True:
+                for packet in await transport.receive():
+                    code, _, _, data = (packet.split(":", 3) + ["", "", ""])[:4]
+                    if code == "0":
+                        return
+                    elif code == "1" and not connected.done():
+                        connected.set_result(True)
+                    elif code == "2":
+                        await transport.send("2::")  # Heartbeat
+                    elif code == "5":
+                        event = json.loads(data)
+                        self.apply_event(event.get("name"), event.get("args") or [])
+                    elif code == "6":
+                        message_id, _, args = data.partition("+")
+                        ack = self._acks.pop(message_id, None)
+                        if ack is not None and not ack.done():
+                            ack.set_result(json.loads(args) if args else [])
+                    elif code == "7":
+                        error = aiohttp.ClientConnectionError("Socket.IO error: %s" % data)
+                        return
+        except aiohttp.ClientError as e:
+            error = e
+        finally:
+            for ack in [connected] + list(self._acks.values()):
+                if not ack.done():
+                    ack.set_exception(error)
+            self._acks = {}
+
+
+class AsyncOverleafClient(object):
+    """
+    asyncio Overleaf API Wrapper with the API of OverleafClient, whose methods are coroutines here
+    All requests of one client share an aiohttp connection pool and are retried and limited like the requests of
+    OverleafClient, so one event loop can run many project operations at once. The client has to be used and
+    closed on one event loop, e.g. with "async with AsyncOverleafClient(cookie, csrf) as client".
+    """
+
+    filter_projects = staticmethod(OverleafClient.filter_projects)
+    project_entities = staticmethod(OverleafClient.project_entities)
+    output_url = OverleafClient.output_url
+
+    def __init__(self, cookie=None, csrf=None, pool_size=POOL_SIZE, timeout=TIMEOUT, base_url=SITE_URL,
+                 retry_policy=None, max_concurrency=None):
+        self.base_url = base_url.rstrip("/")  # The Overleaf instance all relative URLs are sent to
+        self._pool_size = pool_size
+        self._timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        if cookie is not None and hasattr(cookie, "get_dict"):
+            cookie = cookie.get_dict()  # RequestsCookieJar, as stored by ols login
+        self._cookie = cookie or {}
+        self._csrf = csrf
+        self._http = None  # aiohttp.ClientSession, created on the event loop by the first request
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._limiter = AsyncConcurrencyLimiter(max_concurrency or pool_size)
+        self._indexes = {}  # Project id -> ProjectIndex of the latest project_infos
+        self._realtime_sessions = {}  # Project id -> AsyncRealtimeSession
+        self._folder_lock = None  # Serializes folder lookup/creation between concurrent uploads
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _session(self):
+        if self._http is None:
+            # Cookies are scoped to the Overleaf instance; unsafe allows instances addressed by IP
+            cookie_jar = aiohttp.CookieJar(unsafe=True)
+            cookie_jar.update_cookies(self._cookie, response_url=URL(self.base_url))
+            headers = {"X-Csrf-Token": self._csrf} if self._csrf else {}
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size), cookie_jar=cookie_jar, headers=headers,
+                timeout=self._timeout)
+            self._folder_lock = asyncio.Lock()
+        return self._http
+
+    async def close(self):
+        """
+        Close all pooled connections and realtime sessions
+        """
+        sessions, self._realtime_sessions = self._realtime_sessions, {}
+        for session in sessions.values():
+            await session.close()
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    @contextlib.asynccontextmanager
+    async def _request(self, method, url, idempotent=None, data_factory=None, **kwargs):
+        """
+        Send a request through the pooled session, retrying it like OverleafClient._request does
+        Use as "async with self._request(...) as r"; the response is released at the end of the block.
+
+        Params: method, url (relative to the base URL if it starts with /), idempotent (whether sending the request
+        twice has the same effect as sending it once, by default true for every method but POST), data_factory
+        (function returning a new body for every attempt) and any keyword argument accepted by aiohttp
+        Yields: aiohttp.ClientResponse, its retries attribute holds the number of retries it took
+        """
+        if url.startswith("/"):
+            url = self.base_url + url
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        http = self._session()
+
+        attempt = 0
+        while True:
+            if data_factory is not None:
+                kwargs["data"] = data_factory()
+            permit = await self._limiter.acquire()
+            try:
+                r = await http.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                await self._limiter.release(permit, True)
+                delay = self._retry_policy.delay(attempt, idempotent, error=e,
+                                                 connected=not isinstance(e, aiohttp.ClientConnectorError))
+                if delay is None:
+                    raise
+            except BaseException:
+                await self._limiter.release(permit)
+                raise
+            else:
+                delay = self._retry_policy.delay(attempt, idempotent, r.status, r.headers)
+                if delay is None:
+                    break
+                r.release()
+                await self._limiter.release(permit, True)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        r.retries = attempt
+        try:
+            yield r
+        finally:
+            r.release()
+            await self._limiter.release(permit, r.status in PRESSURE_STATUSES)
+
+    async def all_projects(self):
+        """
+        Get all of a user's active projects (= not archived and not trashed)
+        Returns: List of project objects
+        """
+        async with self._request("GET", PROJECT_URL) as r:
+            if "login" in str(r.url).lower():
+                raise Exception(f"Authentication failed - redirected to login page: {r.url}")
+            page = await r.read()
+
+        json_content, page = extract_projects_meta([page])
+        if json_content is None:
+            return OverleafClient._parse_projects_page(page)
+        return list(self.filter_projects(OverleafClient._projects_data(json_content)))
+
+    async def get_project(self, project_name):
+        """
+        Get a specific project by project_name
+        Params: project_name, the name of the project
+        Returns: project object
+        """
+        return next((p for p in await self.all_projects() if p.get('name') == project_name), None)
+
+    async def _download(self, url, spool_size=SPOOL_SIZE, byte_range=None, target=None):
+        """
+        Download url in chunks to a spooled temporary file, see OverleafClient._download
+        Returns: file object positioned at the start, the caller has to close it
+        """
+        download = target if target is not None else tempfile.SpooledTemporaryFile(max_size=spool_size)
+        start = download.tell()
+        headers = {}
+        if byte_range is not None:
+            headers["Range"] = "bytes=%d-%d" % (byte_range[0], byte_range[1] - 1)
+        loop = asyncio.get_running_loop()
+        try:
+            attempt = 0
+            while True:
+                async with self._request("GET", url, headers=headers) as r:
+                    r.raise_for_status()
+                    # A server ignoring the range answers with the whole content, do not read it
+                    if byte_range is not None and (r.status != 206 or not r.headers.get(
+                            "Content-Range", "").startswith("bytes %d-%d/" % (byte_range[0], byte_range[1] - 1))):
+                        raise aiohttp.ClientError("Range %d-%d not served" % byte_range)
+                    try:
+                        async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                            # Writing to disk blocks, it must not stall the other projects on the event loop
+                            await loop.run_in_executor(None, download.write, chunk)
+                        break
+                    except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                        # The connection broke off while the content was read, download it again from the start
+                        delay = self._retry_policy.delay(attempt, True, error=e)
+                        if delay is None:
+                            raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                download.seek(start)
+                download.truncate()
+            if byte_range is not None and download.tell() - start != byte_range[1] - byte_range[0]:
+                raise aiohttp.ClientError("Range %d-%d incomplete" % byte_range)
+        except BaseException:
+            if target is None:
+                download.close()
+            raise
+        download.seek(start)
+        return download
+
+    async def download_project(self, project_id):
+        """
+        Download project in zip format
+        Params: project_id, the id of the project
+        Returns: file object (zip file) positioned at the start, the caller has to close it
+        """
+        return await self._download(DOWNLOAD_URL.format(project_id))
+
+    async def download_file(self, project_id, entity_type, entity_id):
+        """
+        Download a single doc ("doc") or binary file ("file") by its id
+        Returns: file object positioned at the start, the caller has to close it
+        """
+        url = DOC_DOWNLOAD_URL if entity_type == "doc" else FILE_DOWNLOAD_URL
+        return await self._download(url.format(project_id, entity_id), FILE_SPOOL_SIZE)
+
+    async def download_files(self, project_id, project_infos, file_names, jobs=POOL_SIZE):
+        """
+        Download several docs and binary files concurrently, using the ids of the project's file tree
+        Returns: dict of file name -> file object positioned at the start, the caller has to close them
+        """
+        index = self.project_index(project_id, project_infos)
+        entities = {}
+        for file_name in file_names:
+            entity = index.entity(file_name)
+            if entity is None:
+                raise aiohttp.ClientError("File not found: %s" % file_name)
+            entities[file_name] = entity
+
+        slots = asyncio.Semaphore(max(1, jobs))
+
+        async def download(entity_type, entity_id):
+            async with slots:
+                return await self.download_file(project_id, entity_type, entity_id)
+
+        results = await asyncio.gather(*(download(entity_type, entity['_id'])
+                                         for entity_type, entity in entities.values()), return_exceptions=True)
+        files = dict(zip(entities, results))
+        error = next((result for result in results if isinstance(result, BaseException)), None)
+        if error is not None:
+            for file in files.values():
+                if not isinstance(file, BaseException):
+                    file.close()
+            raise error
+        return files
+
+    async def create_folder(self, project_id, parent_folder_id, folder_name):
+        """
+        Create a new folder in a project
+        Params: project_id; parent_folder_id, root is the project_id; folder_name
+        Returns: folder or None if it already exists
+        """
+        params = {
+            "parent_folder_id": parent_folder_id,
+            "name": folder_name
+        }
+        async with self._request("POST", FOLDER_URL.format(project_id), json=params) as r:
+            if r.status == 400:
+                # Folder already exists
+                return
+            r.raise_for_status()
+            return json.loads(await r.read())
+
+    async def get_project_infos(self, project_id):
+        """
+        Get detailed project infos about the project
+        The project is joined once per client; afterwards its file tree is kept up to date by the tree events.
+
+        Params:
+        project_id: the id of the project
+
+        Returns: project details
+        """
+        session = self._realtime_sessions.get(project_id)
+        if session is None:
+            session = AsyncRealtimeSession(self._session(), self.base_url, project_id)
+            # Tree events change project_infos in place, the path index has to be rebuilt
+            session.add_listener(lambda: self._indexes.pop(project_id, None))
+            self._realtime_sessions[project_id] = session
+        return await session.poll()
+
+    def project_index(self, project_id, project_infos):
+        """
+        Get the path index of a project's file tree, built once per project_infos
+        Returns: ProjectIndex
+        """
+        index = self._indexes.get(project_id)
+        if index is None or index.project_infos is not project_infos:
+            index = ProjectIndex(project_infos)
+            self._indexes[project_id] = index
+        return index
+
+    async def _ensure_folder(self, project_id, index, folder_path):
+        """
+        Resolve a folder path to its id, creating missing folders level by level
+        Must be called while holding the folder lock.
+        Returns: folder id
+        """
+        folder = index.folder(folder_path)
+        if folder is not None:
+            return folder['_id']
+
+        parent_path, _, folder_name = folder_path.rpartition(PATH_SEP)
+        parent_id = await self._ensure_folder(project_id, index, parent_path)
+        new_folder = await self.create_folder(project_id, parent_id, folder_name)
+        if new_folder is None:
+            raise aiohttp.ClientError("Folder %s already exists on Overleaf but not in the project's file tree" %
+                                      folder_path)
+        index.add_folder(folder_path, new_folder)
+        return new_folder['_id']
+
+    async def create_folders(self, project_id, project_infos, file_names):
+        """
+        Create all folders missing for a batch of files up front, level by level
+        """
+        index = self.project_index(project_id, project_infos)
+        folder_paths = set()
+        for file_name in file_names:
+            parts = file_name.split(PATH_SEP)[:-1]
+            for depth in range(1, len(parts) + 1):
+                folder_paths.add(PATH_SEP.join(parts[:depth]))
+
+        self._session()
+        async with self._folder_lock:
+            for folder_path in sorted(folder_paths, key=lambda path: path.count(PATH_SEP)):
+                await self._ensure_folder(project_id, index, folder_path)
+
+    async def upload_file(self, project_id, project_infos, file_name, file_size, file):
+        """
+        Upload a file to the project
+        The file is read in chunks while it is sent and not closed, see OverleafClient.upload_file
+        Returns: True on success, False on fail
+        """
+        index = self.project_index(project_id, project_infos)
+        folder_path, _, name = file_name.rpartition(PATH_SEP)
+
+        self._session()
+        async with self._folder_lock:
+            folder_id = await self._ensure_folder(project_id, index, folder_path)
+
+        params = {
+            "folder_id": folder_id,
+            "_csrf": self._csrf,
+            "qquuid": str(uuid.uuid4()),
+            "qqfilename": file_name,
+            "qqtotalfilesize": file_size,
+        }
+        file_start = file.tell()
+
+        def form():
+            # A form can only be sent once, every attempt sends a new one from the start of the file
+            file.seek(file_start)
+            data = aiohttp.FormData()
+            data.add_field("qqfile", _FilePayload(file, file_size, content_type="application/octet-stream"),
+                           filename=name)
+            return data
+
+        # Uploading a file again replaces it, so the upload is safe to retry
+        async with self._request("POST", UPLOAD_URL.format(project_id), idempotent=True, params=params,
+                                 data_factory=form) as r:
+            if r.status != 200:
+                return False
+            result = json.loads(await r.read())
+        if result.get("success") and result.get("entity_id"):
+            index.add_entity(file_name, result.get("entity_type", "file"), {'_id': result["entity_id"], 'name': name})
+        return bool(result.get("success"))
+
+    async def delete_file(self, project_id, project_infos, file_name):
+        """
+        Deletes a project's file, both docs and binary files are supported
+        Returns: True on success, False on fail
+        """
+        index = self.project_index(project_id, project_infos)
+        entity = index.entity(file_name)
+
+        # File not found!
+        if entity is None:
+            return False
+
+        entity_type, file = entity
+        url = DELETE_URL if entity_type == "doc" else DELETE_FILE_URL
+        async with self._request("DELETE", url.format(project_id, file['_id']), json={}) as r:
+            # Not found after a retry: an earlier attempt deleted it, but its answer was lost
+            deleted = r.status == 204 or (r.status == 404 and r.retries)
+        if deleted:
+            index.remove_entity(file_name)
+        return bool(deleted)
+
+    async def delete_folder(self, project_id, project_infos, folder_path):
+        """
+        Deletes a folder of a project with everything in it, the root folder cannot be deleted
+        Returns: True on success, False on fail
+        """
+        index = self.project_index(project_id, project_infos)
+        folder = index.folder(folder_path) if folder_path else None
+
+        # Folder not found!
+        if folder is None:
+            return False
+
+        async with self._request("DELETE", DELETE_FOLDER_URL.format(project_id, folder['_id']), json={}) as r:
+            deleted = r.status == 204 or (r.status == 404 and r.retries)
+        if deleted:
+            index.remove_folder(folder_path)
+        return bool(deleted)
+
+    async def group_deletes(self, project_id, project_infos, file_names):
+        """
+        Find the folders whose docs and files are all about to be deleted, see OverleafClient.group_deletes
+        """
+        return self.project_index(project_id, project_infos).group_deletes(file_names)
+
+    async def compile_project(self, project_id):
+        """
+        Compile a project, with PDF caching enabled so the PDF reports its cacheable byte ranges
+        Returns: the compile result, whose outputFiles list the pdf, log and other output files
+        """
+        # Compiling again produces the same output, so the compile is safe to retry
+        async with self._request("POST", COMPILE_URL.format(project_id), idempotent=True,
+                                 json=COMPILE_OPTIONS) as r:
+            r.raise_for_status()
+            compile_result = json.loads(await r.read())
+
+        if compile_result["status"] != "success":
+            raise aiohttp.ClientError("Compile failed: %s" % compile_result["status"])
+
+        return compile_result
+
+    async def download_output(self, compile_result, output_file, byte_range=None, target=None):
+        """
+        Download an output file of a compile, or a byte range of it, see OverleafClient.download_output
+        Returns: target or the temporary file, positioned at the start, the caller has to close it
+        """
+        return await self._download(self.output_url(compile_result, output_file), FILE_SPOOL_SIZE, byte_range,
+                                    target)
+
+    async def download_pdf(self, project_id):
+        """
+        Compiles and returns a project's PDF
+        Returns: PDF file name and content on success
+        """
+        compile_result = await self.compile_project(project_id)
+        pdf_file = next(v for v in compile_result['outputFiles'] if v['type'] == 'pdf')
+
+        with await self.download_output(compile_result, pdf_file) as pdf:
+            return pdf_file['path'], pdf.read()
@@ -14,9 +14,10 @@ from PySide6.QtWidgets import *
 from PySide6.QtWebEngineWidgets import *
 from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEngineSettings, QWebEnginePage
 
-# Where to get the CSRF Token and where to send the login request to
-LOGIN_URL = "https://latex.uitiot.vn/login"
-PROJECT_URL = "https://latex.uitiot.vn/project"  # The dashboard URL
+SITE_URL = "https://latex.uitiot.vn"  # Default URL of the Overleaf instance
+# Where to get the CSRF Token and where to send the login request to, relative to the URL of the instance
+LOGIN_URL = "/login"
+PROJECT_URL = "/project"  # The dashboard URL
 # JS snippet to extract the csrfToken
 JAVASCRIPT_CSRF_EXTRACTOR = "document.getElementsByName('ol-csrfToken')[0].content"
 # Name of the cookies we want to extract
@@ -29,11 +30,12 @@ class OlBrowserLoginWindow(QMainWindow):
     Opens a browser window to securely login the user and returns relevant login data.
     """
 
-    def __init__(self, keep_open=False, *args, **kwargs):
+    def __init__(self, keep_open=False, base_url=SITE_URL, *args, **kwargs):
         super(OlBrowserLoginWindow, self).__init__(*args, **kwargs)
 
         self.webview = QWebEngineView()
         self.keep_open = keep_open
+        self.base_url = base_url.rstrip("/")
 
         self._cookies = {}
         self._csrf = ""
@@ -48,7 +50,7 @@ class OlBrowserLoginWindow(QMainWindow):
 
         webpage = QWebEnginePage(self.profile, self)
         self.webview.setPage(webpage)
-        self.webview.load(QUrl.fromUserInput(LOGIN_URL))
+        self.webview.load(QUrl.fromUserInput(self.base_url + LOGIN_URL))
         self.webview.loadFinished.connect(self.handle_load_finished)
 
         self.setCentralWidget(self.webview)
@@ -68,7 +70,7 @@ class OlBrowserLoginWindow(QMainWindow):
             else:
                 print("Login successful! You can now close the browser window manually or continue browsing.")
 
-        if current_url == PROJECT_URL:
+        if current_url == self.base_url + PROJECT_URL:
             print("✅ On projects page, extracting CSRF token...")
             # Try multiple ways to extract CSRF token
             csrf_script = """
@@ -126,14 +128,14 @@ class OlBrowserLoginWindow(QMainWindow):
         return self._login_success
 
 
-def login(keep_open=False):
+def login(keep_open=False, base_url=SITE_URL):
     from PySide6.QtCore import QLoggingCategory, QTimer
     QLoggingCategory.setFilterRules('''\
     qt.webenginecontext.info=false
     ''')
 
     app = QApplication([])
-    ol_browser_login_window = OlBrowserLoginWindow(keep_open=keep_open)
+    ol_browser_login_window = OlBrowserLoginWindow(keep_open=keep_open, base_url=base_url)
     ol_browser_login_window.show()
     
     if keep_open:
@@ -153,4 +155,5 @@ def login(keep_open=False):
     if not ol_browser_login_window.login_success:
         return None
 
-    return {"cookie": ol_browser_login_window.cookies, "csrf": ol_browser_login_window.csrf}
+    return {"cookie": ol_browser_login_window.cookies, "csrf": ol_browser_login_window.csrf,
+            "base_url": ol_browser_login_window.base_url}
@@ -10,23 +10,357 @@
 ##################################################
 
 import requests as reqs
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+import html
 import json
+import re
 import uuid
-from socketIO_client import SocketIO
+import tempfile
+import threading
 import time
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 
+from urllib3.exceptions import NewConnectionError
+
+try:
+    # Import for pip installation / wheel
+    from olsync.olrealtime import RealtimeSession
+    from olsync.olretry import ConcurrencyLimiter, IDEMPOTENT_METHODS, PRESSURE_STATUSES, RetryPolicy
+except ImportError:
+    # Import for development
+    from olrealtime import RealtimeSession
+    from olretry import ConcurrencyLimiter, IDEMPOTENT_METHODS, PRESSURE_STATUSES, RetryPolicy
+
+SITE_URL = "https://latex.uitiot.vn"  # Default URL of the Overleaf instance, also serving Socket.IO
+# The following URLs are relative to the URL of the Overleaf instance
 # Where to get the CSRF Token and where to send the login request to
-LOGIN_URL = "https://latex.uitiot.vn/login"
-PROJECT_URL = "https://latex.uitiot.vn/project"  # The dashboard URL
+LOGIN_URL = "/login"
+PROJECT_URL = "/project"  # The dashboard URL
 # The URL to download all the files in zip format
-DOWNLOAD_URL = "https://latex.uitiot.vn/project/{}/download/zip"
-UPLOAD_URL = "https://latex.uitiot.vn/project/{}/upload"  # The URL to upload files
-FOLDER_URL = "https://latex.uitiot.vn/project/{}/folder"  # The URL to create folders
-DELETE_URL = "https://latex.uitiot.vn/project/{}/doc/{}"  # The URL to delete files
-COMPILE_URL = "https://latex.uitiot.vn/project/{}/compile?enable_pdf_caching=true"  # The URL to compile the project
-BASE_URL = "https://www.overleaf.com"  # The Overleaf Base URL
+DOWNLOAD_URL = "/project/{}/download/zip"
+DOC_DOWNLOAD_URL = "/project/{}/doc/{}/download"  # The URL to download a single doc
+FILE_DOWNLOAD_URL = "/project/{}/file/{}"  # The URL to download a single binary file
+UPLOAD_URL = "/project/{}/upload"  # The URL to upload files
+FOLDER_URL = "/project/{}/folder"  # The URL to create folders
+DELETE_URL = "/project/{}/doc/{}"  # The URL to delete docs
+DELETE_FILE_URL = "/project/{}/file/{}"  # The URL to delete binary files
+DELETE_FOLDER_URL = "/project/{}/folder/{}"  # The URL to delete folders with everything in them
+COMPILE_URL = "/project/{}/compile?enable_pdf_caching=true"  # The URL to compile the project
+COMPILE_OPTIONS = {  # The body of a compile request
+    "check": "silent",
+    "draft": False,
+    "incrementalCompilesEnabled": True,
+    "rootDoc_id": "",
+    "stopOnFirstError": False
+}
 PATH_SEP = "/"  # Use hardcoded path separator for both windows and posix system
+POOL_SIZE = 10  # Number of keep-alive connections kept open per host
+TIMEOUT = (10, 120)  # Connect and read timeout in seconds for every request
+CHUNK_SIZE = 1024 * 1024  # Size of the chunks in which downloads are written to disk
+SPOOL_SIZE = 16 * 1024 * 1024  # Downloads larger than this are spooled to a temporary file on disk
+FILE_SPOOL_SIZE = 1024 * 1024  # Single files downloaded concurrently are spooled to disk above this size
+PAGE_CHUNK_SIZE = 64 * 1024  # Size of the chunks in which the dashboard page is scanned
+# Name attribute of the meta tags holding the projects, for different Overleaf versions
+PROJECTS_META_NAME = re.compile(rb"""name=["'](?:ol-projects|ol-prefetchedProjectsBlob)["']""")
+META_CONTENT = re.compile(rb"""\scontent=(["'])(.*?)\1""", re.DOTALL)
+TAG_DELIMITER = re.compile(rb"""["'>]""")
+ENTITY_ID = re.compile(r"/[0-9a-f]{24}(?=/|$)")  # Project, doc, file and folder ids in URL paths
+
+
+def extract_projects_meta(chunks):
+    """
+    Find the projects meta tag in the dashboard page without parsing the whole page
+    The chunks are scanned as they arrive and reading stops as soon as the tag is complete.
+
+    Params:
+    chunks: iterable of bytes, the dashboard page
+
+    Returns: tuple of the decoded JSON content of the tag (None if not found) and the bytes read
+    """
+    chunks = iter(chunks)
+    buffer = bytearray()
+    searched = 0  # Offset up to which the buffer was searched for the meta name
+    tag_start = -1
+    scan = 0  # Offset up to which the tag was scanned for its closing '>'
+    quote = None  # Quote character of the attribute value the scan is in
+
+    for chunk in chunks:
+        buffer += chunk
+
+        if tag_start < 0:
+            # The name may be split between chunks, search again from slightly before the last end
+            match = PROJECTS_META_NAME.search(buffer, max(0, searched - 64))
+            searched = len(buffer)
+            if match is None:
+                continue
+            tag_start = buffer.rfind(b'<', 0, match.start())
+            scan = match.end()
+
+        # Find the end of the tag, skipping '>' inside quoted attribute values
+        tag_end = -1
+        while scan < len(buffer):
+            if quote:
+                i = buffer.find(quote, scan)
+                if i < 0:
+                    scan = len(buffer)
+                    break
+                quote = None
+                scan = i + 1
+            else:
+                delimiter = TAG_DELIMITER.search(buffer, scan)
+                if delimiter is None:
+                    scan = len(buffer)
+                    break
+                scan = delimiter.end()
+                if delimiter.group() == b'>':
+                    tag_end = scan
+                    break
+                quote = delimiter.group()
+
+        if tag_end < 0:
+            continue
+
+        content = META_CONTENT.search(buffer, tag_start, tag_end)
+        if content is not None:
+            try:
+                return json.loads(html.unescape(content.group(2).decode('utf-8'))), bytes(buffer)
+            except ValueError:
+                pass
+        # Unexpected tag, read the rest of the page for the full parse
+        for chunk in chunks:
+            buffer += chunk
+        break
+
+    return None, bytes(buffer)
+
+class MultipartStream(object):
+    """
+    multipart/form-data request body with a single file field, read from the file in chunks while it is sent
+    Memory use does not depend on the size of the file. The file is not closed, that is up to its owner.
+    The body can be rewound with seek(0), e.g. to send it again after a redirect.
+    """
+
+    def __init__(self, field_name, file_name, file, file_size):
+        """
+        Params:
+        field_name: the name of the form field
+        file_name: the file name sent along, the folder part is dropped
+        file: binary file object positioned at the start of the content
+        file_size: the number of bytes of file to send
+        """
+        self.boundary = uuid.uuid4().hex
+        self._head = ('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n\r\n' % (
+            self.boundary, field_name, self._quote(file_name.rpartition(PATH_SEP)[2]))).encode('utf-8')
+        self._tail = ('\r\n--%s--\r\n' % self.boundary).encode('utf-8')
+        self._file = file
+        self._file_start = file.tell()
+        self._file_size = file_size
+        self._length = len(self._head) + file_size + len(self._tail)
+        self._position = 0
+
+    @staticmethod
+    def _quote(value):
+        # Same escaping as browsers (and urllib3) use for header parameters
+        return value.replace('\\', '\\\\').replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary=%s" % self.boundary
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(lambda: self.read(CHUNK_SIZE), b'')
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += self._length
+        self._position = max(0, min(offset, self._length))
+        file_offset = min(max(0, self._position - len(self._head)), self._file_size)
+        self._file.seek(self._file_start + file_offset)
+        return self._position
+
+    def _read_part(self, size):
+        file_start = len(self._head)
+        file_end = file_start + self._file_size
+        if self._position < file_start:
+            return self._head[self._position:self._position + size]
+        if self._position < file_end:
+            chunk = self._file.read(min(size, file_end - self._position))
+            if not chunk:
+                raise IOError("File is shorter than %d bytes, it changed while it was sent" % self._file_size)
+            return chunk
+        offset = self._position - file_end
+        return self._tail[offset:offset + size]
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._position
+        chunks = []
+        while size > 0 and self._position < self._length:
+            chunk = self._read_part(size)
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+class ProjectIndex(object):
+    """
+    Index of a project's file tree
+    Maps paths to folders, docs and binary files (fileRefs). Folder names are matched case-insensitively
+    like Overleaf does, file names exactly. The index and the underlying project_infos are kept up to
+    date as folders are created and files are uploaded or deleted.
+    """
+
+    def __init__(self, project_infos):
+        self.project_infos = project_infos
+        self._folders = {"": project_infos['rootFolder'][0]}  # Lower-cased folder path -> folder
+        self._entities = {}  # Lower-cased folder path + file name -> (entity type, entity)
+        self._parents = {}  # Lower-cased folder path + file name -> containing folder
+
+        pending = [("", project_infos['rootFolder'][0])]
+        while pending:
+            folder_path, folder = pending.pop()
+            for entity_type, key in (("doc", 'docs'), ("file", 'fileRefs')):
+                for entity in folder.get(key, []):
+                    self._add(folder_path, folder, entity_type, entity)
+            for sub_folder in folder.get('folders', []):
+                sub_folder_path = self._join(folder_path, sub_folder['name'].lower())
+                self._folders[sub_folder_path] = sub_folder
+                pending.append((sub_folder_path, sub_folder))
+
+    @staticmethod
+    def _join(folder_path, name):
+        return folder_path + PATH_SEP + name if folder_path else name
+
+    @classmethod
+    def key(cls, path):
+        """
+        Returns: the key of the doc or file at path, folder names are lower-cased
+        """
+        folder_path, _, name = path.rpartition(PATH_SEP)
+        return cls._join(folder_path.lower(), name)
+
+    def _add(self, folder_path, folder, entity_type, entity):
+        key = self._join(folder_path, entity['name'])
+        self._entities[key] = (entity_type, entity)
+        self._parents[key] = folder
+
+    def folder(self, path):
+        """
+        Returns: the folder at path ('' is the root folder) or None
+        """
+        return self._folders.get(path.lower())
+
+    def entity(self, path):
+        """
+        Returns: tuple of entity type ('doc' or 'file') and entity at path or None
+        """
+        return self._entities.get(self.key(path))
+
+    def add_folder(self, path, folder):
+        """
+        Register a newly created folder, its parent has to exist
+        """
+        folder.setdefault('folders', [])
+        folder.setdefault('docs', [])
+        folder.setdefault('fileRefs', [])
+        parent_path = path.rpartition(PATH_SEP)[0]
+        self._folders[parent_path.lower()]['folders'].append(folder)
+        self._folders[path.lower()] = folder
+
+    def add_entity(self, path, entity_type, entity):
+        """
+        Register an uploaded doc or file, replacing an existing one with the same path
+        """
+        self.remove_entity(path)
+        folder_path = path.rpartition(PATH_SEP)[0].lower()
+        folder = self._folders[folder_path]
+        folder.setdefault('docs' if entity_type == "doc" else 'fileRefs', []).append(entity)
+        self._add(folder_path, folder, entity_type, entity)
+
+    def remove_entity(self, path):
+        """
+        Unregister a deleted doc or file
+        """
+        key = self.key(path)
+        entry = self._entities.pop(key, None)
+        if entry is None:
+            return
+        entity_type, entity = entry
+        siblings = self._parents.pop(key)['docs' if entity_type == "doc" else 'fileRefs']
+        if entity in siblings:
+            siblings.remove(entity)
+
+    def remove_folder(self, path):
+        """
+        Unregister a deleted folder with all folders, docs and files in it
+        """
+        folder_path = path.lower()
+        folder = self._folders.get(folder_path)
+        if folder is None or not folder_path:
+            return
+        siblings = self._folders[folder_path.rpartition(PATH_SEP)[0]]['folders']
+        if folder in siblings:
+            siblings.remove(folder)
+        prefix = folder_path + PATH_SEP
+        for key in [key for key in self._folders if key == folder_path or key.startswith(prefix)]:
+            del self._folders[key]
+        for key in [key for key in self._entities if key.startswith(prefix)]:
+            del self._entities[key]
+            del self._parents[key]
+
+    def folder_contents(self):
+        """
+        Returns: dict of lower-cased folder path -> set of the keys of all docs and files in the folder or its
+        sub folders, for every folder but the root which contains at least one doc or file
+        """
+        contents = {}
+        for key in self._entities:
+            folder_path = key.rpartition(PATH_SEP)[0]
+            while folder_path:
+                contents.setdefault(folder_path, set()).add(key)
+                folder_path = folder_path.rpartition(PATH_SEP)[0]
+        return contents
+
+    def group_deletes(self, file_names):
+        """
+        Params: file_names, the paths of the docs and files to delete
+        Returns: tuple of the dict of folder path -> the file names inside it, for the topmost folders whose docs
+        and files are all deleted, and the list of the remaining file names, see OverleafClient.group_deletes
+        """
+        keys = {self.key(file_name): file_name for file_name in file_names}
+        contents = self.folder_contents()
+        folder_paths = {path.lower(): path for path, entity_type, _ in
+                        OverleafClient.project_entities(self.project_infos) if entity_type == "folder"}
+
+        deleted = set(keys)
+        folders = {}
+        # Parents sort before their children, so a folder inside a deleted folder is never deleted on its own
+        for folder_key in sorted(contents, key=lambda path: path.count(PATH_SEP)):
+            if contents[folder_key] <= deleted and folder_key in folder_paths:
+                folders[folder_paths[folder_key]] = sorted(keys[key] for key in contents[folder_key])
+                deleted -= contents[folder_key]
+        return folders, [file_name for key, file_name in keys.items() if key in deleted]
+
+
+def _sent(error):
+    """
+    Returns: False if a connection error was raised before the request was sent, True if it may have been processed
+    """
+    if isinstance(error, reqs.ConnectTimeout):
+        return False
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return not isinstance(reason, NewConnectionError)
+
 
 class OverleafClient(object):
     """
@@ -43,9 +377,190 @@ class OverleafClient(object):
                 if all(p.get(k) == v for k, v in more_attrs.items()):
                     yield p
 
-    def __init__(self, cookie=None, csrf=None):
-        self._cookie = cookie  # Store the cookie for authenticated requests
-        self._csrf = csrf  # Store the CSRF token since it is needed for some requests
+    @staticmethod
+    def project_entities(project_infos):
+        """
+        Walk the file tree of a project
+        Params: project_infos, the project details as returned by get_project_infos
+        Returns: generator of (path, entity type, entity), the type being one of 'folder', 'doc' or 'file'
+        """
+        pending = [("", project_infos['rootFolder'][0])]
+        while pending:
+            prefix, folder = pending.pop()
+            for doc in folder.get('docs', []):
+                yield prefix + doc['name'], "doc", doc
+            for file_ref in folder.get('fileRefs', []):
+                yield prefix + file_ref['name'], "file", file_ref
+            for sub_folder in folder.get('folders', []):
+                path = prefix + sub_folder['name']
+                yield path, "folder", sub_folder
+                pending.append((path + PATH_SEP, sub_folder))
+
+    def __init__(self, cookie=None, csrf=None, pool_size=POOL_SIZE, timeout=TIMEOUT, base_url=SITE_URL,
+                 retry_policy=None, max_concurrency=None):
+        self.base_url = base_url.rstrip("/")  # The Overleaf instance all relative URLs are sent to
+        # All requests go through one session so TCP/TLS connections are reused (keep-alive)
+        self._session = reqs.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers["Connection"] = "keep-alive"
+        self._timeout = timeout
+        self._retry_policy = retry_policy or RetryPolicy()
+        # Starts at the pool size and backs off while the server is overloaded
+        self._limiter = ConcurrencyLimiter(max_concurrency or pool_size)
+
+        if cookie is not None:
+            self._session.cookies.update(cookie)
+        self._cookie = self._session.cookies  # Shared cookie jar for authenticated requests
+        self._folder_lock = threading.Lock()  # Serializes folder lookup/creation between concurrent uploads
+        self._indexes = {}  # Project id -> ProjectIndex of the latest project_infos
+        self._realtime_sessions = {}  # Project id -> RealtimeSession
+        self._realtime_lock = threading.Lock()
+        self._request_listeners = []  # Functions called at the start and the end of every request
+        self._csrf = None
+        self._set_csrf(csrf)  # Store the CSRF token since it is needed for some requests
+
+    def _set_csrf(self, csrf):
+        self._csrf = csrf
+        if csrf:
+            self._session.headers["X-Csrf-Token"] = csrf
+        else:
+            self._session.headers.pop("X-Csrf-Token", None)
+
+    def add_request_listener(self, listener):
+        """
+        Register a function called at the start and at the end of every request, from the thread sending it
+
+        listener(event, request) gets the event "start" or "end" and a dict with the method, the endpoint (the URL
+        path with all ids replaced by {}), the attempt (0 unless the request is a retry) and the start time
+        (time.perf_counter). At the end the dict also holds the status code (None if no response was received), the
+        bytes sent and received, the latency in seconds and, if the request failed, the error. Streamed responses end
+        once they are closed.
+        """
+        self._request_listeners.append(listener)
+
+    def _notify(self, event, request):
+        for listener in self._request_listeners:
+            listener(event, request)
+
+    @staticmethod
+    def _endpoint(url):
+        path = urlparse(url).path
+        return ENTITY_ID.sub("/{}", path)
+
+    def _trace(self, method, url, attempt=0):
+        """
+        Notify the request listeners of a request which is about to start
+        Returns: the request dict, to be passed to _trace_end, or None if there are no listeners
+        """
+        if not self._request_listeners:
+            return None
+        request = {"method": method, "endpoint": self._endpoint(url), "attempt": attempt,
+                   "start": time.perf_counter()}
+        self._notify("start", request)
+        return request
+
+    def _trace_end(self, request, response=None, error=None):
+        if request is None:
+            return
+        request["latency"] = time.perf_counter() - request["start"]
+        request["status"] = None if response is None else response.status_code
+        request["sent"] = 0
+        request["received"] = 0
+        if response is not None:
+            request["sent"] = int(response.request.headers.get("Content-Length") or 0)
+            # Bytes pulled over the wire, so a streamed page which was not read to the end only counts what was read
+            tell = getattr(response.raw, "tell", None)
+            request["received"] = tell() if tell is not None else len(response.content)
+        if error is not None:
+            request["error"] = repr(error)
+        self._notify("end", request)
+
+    def _request(self, method, url, idempotent=None, **kwargs):
+        """
+        Send a request through the pooled session, applying the default timeout
+        Requests the server rejected as overloaded (429, 502, 503, 504) or which failed to connect are sent again
+        after a jittered exponential backoff, or as long as the server's Retry-After asks for. Requests which are not
+        idempotent are only sent again if the server certainly did not process them, see RetryPolicy.
+
+        Params: method, url (relative to the base URL if it starts with /), idempotent (whether sending the request
+        twice has the same effect as sending it once, by default true for every method but POST) and any keyword
+        argument accepted by requests
+        Returns: requests.Response, its retries attribute holds the number of retries it took
+        """
+        if url.startswith("/"):
+            url = self.base_url + url
+        kwargs.setdefault("timeout", self._timeout)
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        # Streamed bodies are rewound before they are sent again, bodies which cannot be rewound are sent only once
+        body = kwargs.get("data")
+        rewindable = body is None or isinstance(body, (bytes, str, dict)) or hasattr(body, "seek")
+        body_start = body.tell() if hasattr(body, "seek") else None
+
+        attempt = 0
+        while True:
+            if attempt and body_start is not None:
+                body.seek(body_start)
+            try:
+                r = self._send(method, url, attempt, **kwargs)
+            except (reqs.ConnectionError, reqs.Timeout) as e:
+                delay = self._retry_policy.delay(attempt, idempotent, error=e, connected=_sent(e)) \
+                    if rewindable else None
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_policy.delay(attempt, idempotent, r.status_code, r.headers) if rewindable else None
+                if delay is None:
+                    r.retries = attempt
+                    return r
+                r.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, method, url, attempt, **kwargs):
+        """
+        Send a request once, as soon as the concurrency limiter allows it
+        The limiter's slot is held until the response is read, for streamed responses until they are closed.
+        """
+        permit = self._limiter.acquire()
+        request = self._trace(method, url, attempt)
+        try:
+            r = self._session.request(method, url, **kwargs)
+        except Exception as e:
+            self._limiter.release(permit, isinstance(e, (reqs.ConnectionError, reqs.Timeout)))
+            self._trace_end(request, error=e)
+            raise
+        pressure = r.status_code in PRESSURE_STATUSES
+        if not kwargs.get("stream"):
+            self._limiter.release(permit, pressure)
+            self._trace_end(request, r)
+            return r
+
+        # The body of a streamed response is read by the caller, the request ends once it is closed
+        close = r.close
+        closed = []
+
+        def close_once():
+            if not closed:
+                closed.append(True)
+                self._limiter.release(permit, pressure)
+                self._trace_end(request, r)
+            close()
+
+        r.close = close_once
+        return r
+
+    def close(self):
+        """
+        Close all pooled connections and realtime sessions
+        """
+        with self._realtime_lock:
+            for session in self._realtime_sessions.values():
+                session.close()
+            self._realtime_sessions = {}
+        self._session.close()
 
     def login(self, username, password):
         """
@@ -55,45 +570,51 @@ class OverleafClient(object):
         Returns: Dict of cookie and CSRF
         """
 
-        get_login = reqs.get(LOGIN_URL)
-        self._csrf = BeautifulSoup(get_login.content, 'html.parser').find(
-            'input', {'name': '_csrf'}).get('value')
+        from bs4 import BeautifulSoup
+
+        get_login = self._request("GET", LOGIN_URL)
+        self._set_csrf(BeautifulSoup(get_login.content, 'html.parser').find(
+            'input', {'name': '_csrf'}).get('value'))
         login_json = {
             "_csrf": self._csrf,
             "email": username,
             "password": password
         }
-        post_login = reqs.post(LOGIN_URL, json=login_json,
-                               cookies=get_login.cookies)
+        post_login = self._request("POST", LOGIN_URL, json=login_json)
 
         # On a successful authentication the Overleaf API returns a new authenticated cookie.
         # If the cookie is different than the cookie of the GET request the authentication was successful
+        # (the GCLB cookie of the GET request stays in the shared cookie jar)
         if post_login.status_code == 200 and get_login.cookies["overleaf_session2"] != post_login.cookies[
             "overleaf_session2"]:
-            self._cookie = post_login.cookies
-
-            # Enrich cookie with GCLB cookie from GET request above
-            self._cookie['GCLB'] = get_login.cookies['GCLB']
-
             # CSRF changes after making the login request, new CSRF token will be on the projects page
-            projects_page = reqs.get(PROJECT_URL, cookies=self._cookie)
-            self._csrf = BeautifulSoup(projects_page.content, 'html.parser').find('meta', {'name': 'ol-csrfToken'}) \
-                .get('content')
+            projects_page = self._request("GET", PROJECT_URL)
+            self._set_csrf(BeautifulSoup(projects_page.content, 'html.parser').find('meta', {'name': 'ol-csrfToken'})
+                           .get('content'))
 
             return {"cookie": self._cookie, "csrf": self._csrf}
 
-    def all_projects(self):
+    @staticmethod
+    def _projects_data(json_content):
+        # Handle different data formats
+        if 'projects' in json_content:
+            # ol-prefetchedProjectsBlob format: {"totalSize": N, "projects": [...]}
+            return json_content['projects']
+        # ol-projects format: [project, project, ...]
+        return json_content
+
+    @staticmethod
+    def _parse_projects_page(page):
         """
-        Get all of a user's active projects (= not archived and not trashed)
+        Get the projects from a full parse of the dashboard page
+        Fallback for pages the streaming meta tag extractor does not understand.
+        Params: page, the content of the dashboard page
         Returns: List of project objects
         """
-        projects_page = reqs.get(PROJECT_URL, cookies=self._cookie)
-        
-        # Debug: Check if we're properly authenticated
-        if "login" in projects_page.url.lower():
-            raise Exception(f"Authentication failed - redirected to login page: {projects_page.url}")
-        
-        soup = BeautifulSoup(projects_page.content, 'html.parser')
+        # Only needed for pages the streaming extractor does not understand, bs4 is slow to import
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(page, 'html.parser')
         
         # Try multiple meta tag names for different Overleaf versions
         ol_projects_meta = (
@@ -110,7 +631,6 @@ class OverleafClient(object):
             for script in scripts:
                 if script.string and 'project' in script.string.lower():
                     # Look for JSON data in scripts
-                    import re
                     json_pattern = r'window\.(?:data|projects|state)\s*=\s*(\{.*?\});'
                     matches = re.findall(json_pattern, script.string, re.DOTALL)
                     for match in matches:
@@ -136,16 +656,25 @@ class OverleafClient(object):
             return []
         
         json_content = json.loads(ol_projects_meta.get('content'))
-        
-        # Handle different data formats
-        if 'projects' in json_content:
-            # ol-prefetchedProjectsBlob format: {"totalSize": N, "projects": [...]}
-            projects_data = json_content['projects']
-        else:
-            # ol-projects format: [project, project, ...]
-            projects_data = json_content
-            
-        return list(OverleafClient.filter_projects(projects_data))
+        return list(OverleafClient.filter_projects(OverleafClient._projects_data(json_content)))
+
+    def all_projects(self):
+        """
+        Get all of a user's active projects (= not archived and not trashed)
+        Returns: List of project objects
+        """
+        with self._request("GET", PROJECT_URL, stream=True) as projects_page:
+            # Debug: Check if we're properly authenticated
+            if "login" in projects_page.url.lower():
+                raise Exception(f"Authentication failed - redirected to login page: {projects_page.url}")
+
+            # Stop reading the page as soon as the projects meta tag is complete
+            json_content, page = extract_projects_meta(projects_page.iter_content(chunk_size=PAGE_CHUNK_SIZE))
+
+        if json_content is None:
+            return OverleafClient._parse_projects_page(page)
+
+        return list(OverleafClient.filter_projects(OverleafClient._projects_data(json_content)))
 
     def get_project(self, project_name):
         """
@@ -157,15 +686,115 @@ class OverleafClient(object):
         all_projects = self.all_projects()
         return next((p for p in all_projects if p.get('name') == project_name), None)
 
+    def _download(self, url, spool_size=SPOOL_SIZE, byte_range=None, target=None):
+        """
+        Download url in chunks to a spooled temporary file, so memory use stays bounded regardless of its size
+        Params: byte_range, tuple of the start and end (exclusive) offset to download only part of the content, the
+        server has to answer with exactly that range; target, file object to write to instead of a temporary file
+        Returns: file object positioned at the start, the caller has to close it
+        """
+        download = target if target is not None else tempfile.SpooledTemporaryFile(max_size=spool_size)
+        start = download.tell()
+        headers = {}
+        if byte_range is not None:
+            headers["Range"] = "bytes=%d-%d" % (byte_range[0], byte_range[1] - 1)
+        try:
+            attempt = 0
+            while True:
+                with self._request("GET", url, stream=True, headers=headers) as r:
+                    if not r.ok:
+                        raise reqs.HTTPError(response=r)
+                    # A server ignoring the range answers with the whole content, do not read it
+                    if byte_range is not None and (r.status_code != 206 or not r.headers.get(
+                            "Content-Range", "").startswith("bytes %d-%d/" % (byte_range[0], byte_range[1] - 1))):
+                        raise reqs.HTTPError("Range %d-%d not served" % byte_range, response=r)
+                    try:
+                        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                            download.write(chunk)
+                        break
+                    except (reqs.ConnectionError, reqs.ChunkedEncodingError, reqs.Timeout) as e:
+                        # The connection broke off while the content was read, download it again from the start
+                        delay = self._retry_policy.delay(attempt, True, error=e)
+                        if delay is None:
+                            raise
+                time.sleep(delay)
+                attempt += 1
+                download.seek(start)
+                download.truncate()
+            if byte_range is not None and download.tell() - start != byte_range[1] - byte_range[0]:
+                raise reqs.HTTPError("Range %d-%d incomplete" % byte_range)
+        except:
+            if target is None:
+                download.close()
+            raise
+        download.seek(start)
+        return download
+
     def download_project(self, project_id):
         """
         Download project in zip format
         Params: project_id, the id of the project
-        Returns: bytes string (zip file)
+        Returns: file object (zip file) positioned at the start, the caller has to close it
         """
-        r = reqs.get(DOWNLOAD_URL.format(project_id),
-                     stream=True, cookies=self._cookie)
-        return r.content
+        return self._download(DOWNLOAD_URL.format(project_id))
+
+    def download_file(self, project_id, entity_type, entity_id):
+        """
+        Download a single doc or binary file by its id
+
+        Params:
+        project_id: the id of the project
+        entity_type: "doc" or "file"
+        entity_id: the id of the doc or file
+
+        Returns: file object positioned at the start, the caller has to close it
+        """
+        url = DOC_DOWNLOAD_URL if entity_type == "doc" else FILE_DOWNLOAD_URL
+        return self._download(url.format(project_id, entity_id), FILE_SPOOL_SIZE)
+
+    def download_files(self, project_id, project_infos, file_names, jobs=POOL_SIZE, slots=None):
+        """
+        Download several docs and binary files concurrently, using the ids of the project's file tree
+
+        Params:
+        project_id: the id of the project
+        project_infos: the project details as returned by get_project_infos
+        file_names: the paths of the files to download
+        jobs: the number of concurrent downloads
+        slots: semaphore limiting the number of concurrent downloads further, e.g. shared with other projects
+
+        Returns: dict of file name -> file object positioned at the start, the caller has to close them
+        """
+        index = self.project_index(project_id, project_infos)
+        entities = {}
+        with self._folder_lock:
+            for file_name in file_names:
+                entity = index.entity(file_name)
+                if entity is None:
+                    raise reqs.HTTPError("File not found: %s" % file_name)
+                entities[file_name] = entity
+
+        def download(entity_type, entity_id):
+            if slots is None:
+                return self.download_file(project_id, entity_type, entity_id)
+            with slots:
+                return self.download_file(project_id, entity_type, entity_id)
+
+        files = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(entities)))) as executor:
+            futures = {file_name: executor.submit(download, entity_type, entity['_id'])
+                       for file_name, (entity_type, entity) in entities.items()}
+            error = None
+            for file_name, future in futures.items():
+                try:
+                    files[file_name] = future.result()
+                except Exception as e:
+                    error = error or e
+        if error is not None:
+            for file in files.values():
+                file.close()
+            raise error
+        return files
 
     def create_folder(self, project_id, parent_folder_id, folder_name):
         """
@@ -183,37 +812,17 @@ class OverleafClient(object):
             "parent_folder_id": parent_folder_id,
             "name": folder_name
         }
-        headers = {
-            "X-Csrf-Token": self._csrf
-        }
-        r = reqs.post(FOLDER_URL.format(project_id),
-                      cookies=self._cookie, headers=headers, json=params)
+        r = self._request("POST", FOLDER_URL.format(project_id), json=params)
 
         if r.ok:
             return json.loads(r.content)
-        elif r.status_code == str(400):
+        elif r.status_code == 400:
             # Folder already exists
             return
         else:
-            raise reqs.HTTPError()
-
-    def get_project_infos(self, project_id):
-        """
-        Get detailed project infos about the project
-
-        Params:
-        project_id: the id of the project
-
-        Returns: project details
-        """
-        project_infos = None
-
-        # Callback function for the joinProject emitter
-        def set_project_infos(a, project_infos_dict, c, d):
-            # Set project_infos variable in outer scope
-            nonlocal project_infos
-            project_infos = project_infos_dict
+            raise reqs.HTTPError(response=r)
 
+    def _cookie_header(self):
         # Convert cookie from CookieJar to string
         cookie_parts = []
         
@@ -225,65 +834,130 @@ class OverleafClient(object):
         if "overleaf.sid" in self._cookie:
             cookie_parts.append(f"overleaf.sid={self._cookie['overleaf.sid']}")
             
-        cookie = "; ".join(cookie_parts)
+        return "; ".join(cookie_parts)
 
-        # Connect to Overleaf Socket.IO, send a time parameter and the cookies
-        socket_io = SocketIO(
-            BASE_URL,
-            params={'t': int(time.time())},
-            headers={'Cookie': cookie}
-        )
+    def realtime_session(self, project_id):
+        """
+        Get the long-lived Socket.IO session of a project, creating it on first use
+        The session stays connected until close() is called and keeps the project's file tree up to date.
 
-        # Wait until we connect to the socket
-        socket_io.on('connect', lambda: None)
-        socket_io.wait_for_callbacks()
+        Params:
+        project_id: the id of the project
+
+        Returns: RealtimeSession
+        """
+        with self._realtime_lock:
+            session = self._realtime_sessions.get(project_id)
+            if session is None:
+                session = RealtimeSession(self.base_url, self._cookie_header(), project_id)
+                # Tree events change project_infos in place, the path index has to be rebuilt
+                session.add_listener(lambda: self._forget_index(project_id))
+                self._realtime_sessions[project_id] = session
+            return session
 
-        # Send the joinProject event and receive the project infos
-        socket_io.emit('joinProject', {'project_id': project_id}, set_project_infos)
-        socket_io.wait_for_callbacks()
+    def get_project_infos(self, project_id):
+        """
+        Get detailed project infos about the project
+        The project is joined once per client; later calls only apply the tree events received since.
 
-        # Disconnect from the socket if still connected
-        if socket_io.connected:
-            socket_io.disconnect()
+        Params:
+        project_id: the id of the project
 
+        Returns: project details
+        """
+        session = self.realtime_session(project_id)
+        # Joining takes a few round trips, the following polls only apply the events received meanwhile
+        request = None if session.connected else self._trace("JOIN", self.base_url + "/socket.io/" + project_id)
+        try:
+            project_infos = session.poll()
+        except Exception as e:
+            self._trace_end(request, error=e)
+            raise
+        self._trace_end(request)
         return project_infos
 
+    def project_index(self, project_id, project_infos):
+        """
+        Get the path index of a project's file tree, built once per project_infos
+
+        Params:
+        project_id: the id of the project
+        project_infos: the project details as returned by get_project_infos
+
+        Returns: ProjectIndex
+        """
+        with self._folder_lock:
+            index = self._indexes.get(project_id)
+            if index is None or index.project_infos is not project_infos:
+                index = ProjectIndex(project_infos)
+                self._indexes[project_id] = index
+            return index
+
+    def _forget_index(self, project_id):
+        # Called by the Socket.IO session when a tree event changed the project's file tree
+        with self._folder_lock:
+            self._indexes.pop(project_id, None)
+
+    def _ensure_folder(self, project_id, index, folder_path):
+        """
+        Resolve a folder path to its id, creating missing folders level by level
+        Must be called while holding the folder lock.
+        Returns: folder id
+        """
+        folder = index.folder(folder_path)
+        if folder is not None:
+            return folder['_id']
+
+        parent_path, _, folder_name = folder_path.rpartition(PATH_SEP)
+        parent_id = self._ensure_folder(project_id, index, parent_path)
+        new_folder = self.create_folder(project_id, parent_id, folder_name)
+        if new_folder is None:
+            raise reqs.HTTPError("Folder %s already exists on Overleaf but not in the project's file tree" % folder_path)
+        index.add_folder(folder_path, new_folder)
+        return new_folder['_id']
+
+    def create_folders(self, project_id, project_infos, file_names):
+        """
+        Create all folders missing for a batch of files up front, level by level
+
+        Params:
+        project_id: the id of the project
+        project_infos: the project details as returned by get_project_infos
+        file_names: the paths of the files which are about to be uploaded
+        """
+        index = self.project_index(project_id, project_infos)
+        folder_paths = set()
+        for file_name in file_names:
+            parts = file_name.split(PATH_SEP)[:-1]
+            for depth in range(1, len(parts) + 1):
+                folder_paths.add(PATH_SEP.join(parts[:depth]))
+
+        # Parents always sort before their children
+        with self._folder_lock:
+            for folder_path in sorted(folder_paths, key=lambda path: path.count(PATH_SEP)):
+                self._ensure_folder(project_id, index, folder_path)
+
     def upload_file(self, project_id, project_infos, file_name, file_size, file):
         """
         Upload a file to the project
 
         Params:
         project_id: the id of the project
+        project_infos: the project details as returned by get_project_infos
         file_name: how the file will be named
         file_size: the size of the file in bytes
-        file: the file itself
+        file: the file itself, a binary file object which is read in chunks while it is sent and not closed
 
         Returns: True on success, False on fail
         """
+        index = self.project_index(project_id, project_infos)
+        folder_path, _, name = file_name.rpartition(PATH_SEP)
 
-        # Set the folder_id to the id of the root folder
-        folder_id = project_infos['rootFolder'][0]['_id']
+        # Missing folders are created under a lock so concurrent uploads never create the same folder twice
+        # and a folder always exists before its children are uploaded
+        with self._folder_lock:
+            folder_id = self._ensure_folder(project_id, index, folder_path)
 
-        # The file name contains path separators, check folders
-        if PATH_SEP in file_name:
-            local_folders = file_name.split(PATH_SEP)[:-1]  # Remove last item since this is the file name
-            current_overleaf_folder = project_infos['rootFolder'][0]['folders']  # Set the current remote folder
-
-            for local_folder in local_folders:
-                exists_on_remote = False
-                for remote_folder in current_overleaf_folder:
-                    # Check if the folder exists on remote, continue with the new folder structure
-                    if local_folder.lower() == remote_folder['name'].lower():
-                        exists_on_remote = True
-                        folder_id = remote_folder['_id']
-                        current_overleaf_folder = remote_folder['folders']
-                        break
-                # Create the folder if it doesn't exist
-                if not exists_on_remote:
-                    new_folder = self.create_folder(project_id, folder_id, local_folder)
-                    current_overleaf_folder.append(new_folder)
-                    folder_id = new_folder['_id']
-                    current_overleaf_folder = new_folder['folders']
         params = {
             "folder_id": folder_id,
             "_csrf": self._csrf,
@@ -291,92 +965,155 @@ class OverleafClient(object):
             "qqfilename": file_name,
             "qqtotalfilesize": file_size,
         }
-        files = {
-            "qqfile": file
-        }
+        # The body is streamed from the file, so large files are never held in memory
+        body = MultipartStream("qqfile", file_name, file, file_size)
 
         # Upload the file to the predefined folder
-        r = reqs.post(UPLOAD_URL.format(project_id), cookies=self._cookie, params=params, files=files)
+        # Uploading a file again replaces it, so the upload is safe to retry
+        r = self._request("POST", UPLOAD_URL.format(project_id), idempotent=True, params=params, data=body,
+                          headers={"Content-Type": body.content_type})
 
-        return r.status_code == str(200) and json.loads(r.content)["success"]
+        if r.status_code != 200:
+            return False
+        result = json.loads(r.content)
+        if result.get("success") and result.get("entity_id"):
+            with self._folder_lock:
+                index.add_entity(file_name, result.get("entity_type", "file"),
+                                 {'_id': result["entity_id"], 'name': name})
+        return bool(result.get("success"))
 
     def delete_file(self, project_id, project_infos, file_name):
         """
-        Deletes a project's file
+        Deletes a project's file, both docs and binary files are supported
 
         Params:
         project_id: the id of the project
+        project_infos: the project details as returned by get_project_infos
         file_name: how the file will be named
 
         Returns: True on success, False on fail
         """
+        index = self.project_index(project_id, project_infos)
+        with self._folder_lock:
+            entity = index.entity(file_name)
 
-        file = None
+        # File not found!
+        if entity is None:
+            return False
 
-        # The file name contains path separators, check folders
-        if PATH_SEP in file_name:
-            local_folders = file_name.split(PATH_SEP)[:-1]  # Remove last item since this is the file name
-            current_overleaf_folder = project_infos['rootFolder'][0]['folders']  # Set the current remote folder
+        entity_type, file = entity
+        url = DELETE_URL if entity_type == "doc" else DELETE_FILE_URL
+        r = self._request("DELETE", url.format(project_id, file['_id']), json={})
 
-            for local_folder in local_folders:
-                for remote_folder in current_overleaf_folder:
-                    if local_folder.lower() == remote_folder['name'].lower():
-                        file = next((v for v in remote_folder['docs'] if v['name'] == file_name.split(PATH_SEP)[-1]),
-                                    None)
-                        current_overleaf_folder = remote_folder['folders']
-                        break
-        # File is in root folder
-        else:
-            file = next((v for v in project_infos['rootFolder'][0]['docs'] if v['name'] == file_name), None)
+        # Not found after a retry: an earlier attempt deleted it, but its answer was lost
+        if r.status_code == 204 or (r.status_code == 404 and r.retries):
+            with self._folder_lock:
+                index.remove_entity(file_name)
+            return True
+        return False
 
-        # File not found!
-        if file is None:
-            return False
+    def delete_folder(self, project_id, project_infos, folder_path):
+        """
+        Deletes a folder of a project with everything in it
 
-        headers = {
-            "X-Csrf-Token": self._csrf
-        }
+        Params:
+        project_id: the id of the project
+        project_infos: the project details as returned by get_project_infos
+        folder_path: the path of the folder, the root folder cannot be deleted
+
+        Returns: True on success, False on fail
+        """
+        index = self.project_index(project_id, project_infos)
+        with self._folder_lock:
+            folder = index.folder(folder_path) if folder_path else None
 
-        r = reqs.delete(DELETE_URL.format(project_id, file['_id']), cookies=self._cookie, headers=headers, json={})
+        # Folder not found!
+        if folder is None:
+            return False
 
-        return r.status_code == str(204)
+        r = self._request("DELETE", DELETE_FOLDER_URL.format(project_id, folder['_id']), json={})
 
-    def download_pdf(self, project_id):
+        if r.status_code == 204 or (r.status_code == 404 and r.retries):
+            with self._folder_lock:
+                index.remove_folder(folder_path)
+            return True
+        return False
+
+    def group_deletes(self, project_id, project_infos, file_names):
         """
-        Compiles and returns a project's PDF
+        Find the folders whose docs and files are all about to be deleted, so each of them can be deleted with one
+        request instead of one per file. Only the topmost of nested folders are returned.
 
         Params:
         project_id: the id of the project
+        project_infos: the project details as returned by get_project_infos
+        file_names: the paths of the docs and files to delete
 
-        Returns: PDF file name and content on success
+        Returns: tuple of the dict of folder path -> the file names inside it, and the list of the remaining
+        file names, which have to be deleted one by one
         """
-        headers = {
-            "X-Csrf-Token": self._csrf
-        }
+        index = self.project_index(project_id, project_infos)
+        with self._folder_lock:
+            return index.group_deletes(file_names)
 
-        body = {
-            "check": "silent",
-            "draft": False,
-            "incrementalCompilesEnabled": True,
-            "rootDoc_id": "",
-            "stopOnFirstError": False
-        }
+    def compile_project(self, project_id):
+        """
+        Compile a project, with PDF caching enabled so the PDF reports its cacheable byte ranges
 
-        r = reqs.post(COMPILE_URL.format(project_id), cookies=self._cookie, headers=headers, json=body)
+        Params:
+        project_id: the id of the project
+
+        Returns: the compile result, whose outputFiles list the pdf, log and other output files
+        """
+        # Compiling again produces the same output, so the compile is safe to retry
+        r = self._request("POST", COMPILE_URL.format(project_id), idempotent=True, json=COMPILE_OPTIONS)
 
         if not r.ok:
-            raise reqs.HTTPError()
+            raise reqs.HTTPError(response=r)
 
         compile_result = json.loads(r.content)
 
         if compile_result["status"] != "success":
-            raise reqs.HTTPError()
+            raise reqs.HTTPError("Compile failed: %s" % compile_result["status"])
 
-        pdf_file = next(v for v in compile_result['outputFiles'] if v['type'] == 'pdf')
+        return compile_result
 
-        download_req = reqs.get(BASE_URL + pdf_file['url'], cookies=self._cookie, headers=headers)
+    def output_url(self, compile_result, output_file):
+        """
+        Returns: the URL to download an output file of a compile from
+        """
+        # Overleaf.com serves the output files from a separate domain, self-hosted instances from the site itself
+        url = (compile_result.get("pdfDownloadDomain") or self.base_url) + output_file['url']
+        if compile_result.get("clsiServerId"):
+            # Route the download to the compile server holding the output
+            url += ("&" if "?" in url else "?") + "clsiserverid=" + compile_result["clsiServerId"]
+        return url
 
-        if download_req.ok:
-            return pdf_file['path'], download_req.content
+    def download_output(self, compile_result, output_file, byte_range=None, target=None):
+        """
+        Download an output file of a compile, or a byte range of it
+
+        Params:
+        compile_result: the result of compile_project
+        output_file: the entry of the output file in the compile result's outputFiles
+        byte_range: tuple of the start and end (exclusive) offset to download only part of the file
+        target: binary file object to write the content to, a spooled temporary file is used if omitted
+
+        Returns: target or the temporary file, positioned at the start, the caller has to close it
+        """
+        return self._download(self.output_url(compile_result, output_file), FILE_SPOOL_SIZE, byte_range, target)
+
+    def download_pdf(self, project_id):
+        """
+        Compiles and returns a project's PDF
+
+        Params:
+        project_id: the id of the project
+
+        Returns: PDF file name and content on success
+        """
+        compile_result = self.compile_project(project_id)
+        pdf_file = next(v for v in compile_result['outputFiles'] if v['type'] == 'pdf')
 
-        return None
+        with self.download_output(compile_result, pdf_file) as pdf:
+            return pdf_file['path'], pdf.read()
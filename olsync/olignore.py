@@ -0,0 +1,184 @@
+"""Overleaf Sync Ignore Rules"""
+##################################################
+# MIT License
+##################################################
+# File: olignore.py
+# Description: .olignore matching and project tree scanning
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+
+import os
+import re
+
+PATH_SEP = "/"  # Paths are always matched with posix separators
+
+
+def _translate(pattern):
+    """
+    Translate a gitignore-style glob (without negation and trailing slash) into a regular expression
+    `*` and `?` never match a path separator, `**` matches across folders.
+    """
+    anchored = PATH_SEP in pattern
+    pattern = pattern.lstrip(PATH_SEP)
+
+    i, n = 0, len(pattern)
+    res = []
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == PATH_SEP):
+            res.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i) and i + 2 == n and (i == 0 or pattern[i - 1] == PATH_SEP):
+            res.append(".*")
+            i += 2
+            continue
+        i += 1
+        if c == "*":
+            res.append("[^/]*")
+        elif c == "?":
+            res.append("[^/]")
+        elif c == "\\" and i < n:
+            res.append(re.escape(pattern[i]))
+            i += 1
+        elif c == "[":
+            j = i
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                res.append("\\[")
+            else:
+                stuff = pattern[i:j].replace("\\", "\\\\")
+                if stuff[0] in "!^":
+                    stuff = "^" + stuff[1:]
+                res.append("[%s]" % stuff)
+                i = j + 1
+        else:
+            res.append(re.escape(c))
+
+    regex = "".join(res)
+    # Patterns without a separator match the name at any depth, all others are relative to the root
+    return regex if anchored else "(?:.*/)?" + regex
+
+
+class OlIgnore(object):
+    """
+    Compiled .olignore rules, using gitignore semantics:
+    blank lines and lines starting with # are skipped, a leading ! re-includes a path,
+    a trailing / only matches folders, patterns containing a / are relative to the sync path
+    and the last matching rule wins.
+    """
+
+    def __init__(self, patterns):
+        self._rules = []  # List of (compiled regex, negated, folders only)
+
+        for line in patterns:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            elif line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            dir_only = line.endswith(PATH_SEP)
+            line = line.rstrip(PATH_SEP)
+            if not line:
+                continue
+            self._rules.append((re.compile(_translate(line)), negated, dir_only))
+        self._compile()
+
+    def _compile(self):
+        # One alternation of all rules quickly rejects paths no rule matches at all
+        self._any = re.compile("|".join("(?:%s)" % regex.pattern for regex, _, _ in self._rules)) \
+            if self._rules else None
+
+    def exclude(self, paths):
+        """
+        Ignore exact files, after all other rules so they cannot be re-included
+        Params: paths, iterable of posix paths relative to the sync path
+        """
+        self._rules.extend((re.compile(re.escape(path)), False, False) for path in paths)
+        self._compile()
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load the rules of an .olignore file
+        Params: path, the path of the .olignore file
+        Returns: OlIgnore or None if the file does not exist
+        """
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'r') as f:
+            return cls(f.read().splitlines())
+
+    def match(self, path, is_dir=False):
+        """
+        Check a single path against the rules, ignoring its parent folders
+        Params: path, posix path relative to the sync path; is_dir, whether the path is a folder
+        Returns: True if the path is ignored
+        """
+        if self._any is None or self._any.fullmatch(path) is None:
+            return False
+        for regex, negated, dir_only in reversed(self._rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(path):
+                return not negated
+        return False
+
+    def ignores(self, path, is_dir=False):
+        """
+        Check whether a path or one of its parent folders is ignored
+        Params: path, posix path relative to the sync path; is_dir, whether the path is a folder
+        Returns: True if the path is ignored
+        """
+        parts = path.split(PATH_SEP)
+        for i in range(1, len(parts)):
+            if self.match(PATH_SEP.join(parts[:i]), True):
+                return True
+        return self.match(path, is_dir)
+
+
+def scan_tree(root=".", olignore=None):
+    """
+    Walk the sync path with os.scandir, never descending into ignored folders.
+    Hidden files and folders (e.g. .git, .olauth, .olsync) are skipped.
+
+    Params:
+    root: the folder to scan
+    olignore: OlIgnore rules to apply, or None to keep every file
+
+    Returns: dict of posix path relative to root -> os.stat_result, in walk order
+    """
+    files = {}
+    pending = [""]
+    while pending:
+        prefix = pending.pop()
+        with os.scandir(os.path.join(root, prefix) if prefix else root) as it:
+            entries = sorted(it, key=lambda e: e.name)
+
+        folders = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            path = prefix + entry.name
+            try:
+                if entry.is_dir():
+                    if olignore is None or not olignore.match(path, True):
+                        folders.append(path + PATH_SEP)
+                elif olignore is None or not olignore.match(path):
+                    files[path] = entry.stat()
+            except OSError:
+                # Broken symlinks and files removed while scanning
+                continue
+        # Folders are pushed in reverse so they are popped in order
+        pending.extend(reversed(folders))
+    return files
@@ -0,0 +1,251 @@
+"""Overleaf Compile Output Download"""
+##################################################
+# MIT License
+##################################################
+# File: olpdf.py
+# Description: Concurrent compile output downloads, PDFs reuse the unchanged byte ranges of the previous PDF
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # Import for pip installation / wheel
+    from olsync.olclient import POOL_SIZE
+    from olsync.olremote import REQUEST_COST
+except ImportError:
+    # Import for development
+    from olclient import POOL_SIZE
+    from olremote import REQUEST_COST
+
+CHUNK_SIZE = 1024 * 1024  # Copy and hash PDFs in chunks of 1 MiB
+PART_SUFFIX = ".part"  # The PDF is assembled next to its target and only replaces it once it is complete
+
+
+def _copy(source, target, length):
+    """
+    Copy exactly length bytes from the current position of source to target
+    """
+    while length > 0:
+        chunk = source.read(min(CHUNK_SIZE, length))
+        if not chunk:
+            raise IOError("Unexpected end of file, %d bytes missing" % length)
+        target.write(chunk)
+        length -= len(chunk)
+
+
+def _range_hash(file, start, end):
+    file.seek(start)
+    digest = hashlib.sha256()
+    length = end - start
+    while length > 0:
+        chunk = file.read(min(CHUNK_SIZE, length))
+        if not chunk:
+            return None
+        digest.update(chunk)
+        length -= len(chunk)
+    return digest.hexdigest()
+
+
+def verified_ranges(path, ranges):
+    """
+    Check the cacheable byte ranges a compile reported against the content of the downloaded PDF. Overleaf hashes
+    each range with SHA-256; only ranges whose content matches their hash are reused by later downloads.
+    Params: path, the downloaded PDF; ranges, list of dicts with start, end (exclusive) and hash
+    Returns: list of the verified ranges
+    """
+    with open(path, 'rb') as f:
+        return [r for r in ranges if _range_hash(f, r["start"], r["end"]) == r["hash"]]
+
+
+def plan_pdf(pdf_file, previous, jobs=1):
+    """
+    Decide which parts of a new PDF are copied from the previous one and which are downloaded with range requests.
+    Ranges whose hash is a verified range of the previous PDF are copied, everything else is downloaded, adjacent
+    parts with one request. Each request is costed as its size plus the latency of a request (spread over the
+    concurrent jobs), like plan_downloads does for project files.
+
+    Params:
+    pdf_file: the pdf entry of the compile result's outputFiles, with its size and ranges
+    previous: the PdfState entry of the previous PDF
+    jobs: the number of concurrent range requests
+
+    Returns: list of (offset in the previous PDF or None to download, start, end) covering the new PDF in order, or
+    None if downloading the whole PDF is cheaper
+    """
+    size = pdf_file.get("size")
+    ranges = pdf_file.get("ranges")
+    if previous is None or not size or not ranges:
+        return None
+    known = {r["hash"]: r["start"] for r in previous["ranges"]}
+    request_cost = REQUEST_COST / max(1, jobs)
+
+    segments = []
+
+    def add(offset, start, end):
+        if start == end:
+            return
+        if offset is None and segments and segments[-1][0] is None:
+            segments[-1] = (None, segments[-1][1], end)
+        elif offset is None and len(segments) > 1 and segments[-2][0] is None and \
+                segments[-1][2] - segments[-1][1] < request_cost:
+            # Downloading a small copied range along with its neighbours is cheaper than another request
+            segments[-2:] = [(None, segments[-2][1], end)]
+        else:
+            segments.append((offset, start, end))
+
+    position = 0
+    for r in sorted(ranges, key=lambda r: r["start"]):
+        if r["start"] < position or r["end"] > size:
+            return None  # Overlapping or invalid ranges, do not guess
+        add(None, position, r["start"])
+        add(known.get(r["hash"]), r["start"], r["end"])
+        position = r["end"]
+    add(None, position, size)
+
+    downloads = [end - start for offset, start, end in segments if offset is None]
+    if segments == [(None, 0, size)] or sum(downloads) + len(downloads) * request_cost >= size + request_cost:
+        return None
+    return segments
+
+
+def _assemble(overleaf_client, compile_result, pdf_file, segments, previous_path, part_path, jobs):
+    downloads = [(start, end) for offset, start, end in segments if offset is None]
+    parts = {}
+    error = None
+    if downloads:
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(downloads)))) as executor:
+            futures = {byte_range: executor.submit(overleaf_client.download_output, compile_result, pdf_file,
+                                                   byte_range)
+                       for byte_range in downloads}
+            for byte_range, future in futures.items():
+                try:
+                    parts[byte_range] = future.result()
+                except Exception as e:
+                    error = error or e
+    try:
+        if error is not None:
+            raise error
+        with open(previous_path, 'rb') as previous, open(part_path, 'wb') as part:
+            for offset, start, end in segments:
+                if offset is None:
+                    _copy(parts[(start, end)], part, end - start)
+                else:
+                    previous.seek(offset)
+                    _copy(previous, part, end - start)
+            if part.tell() != pdf_file["size"]:
+                raise IOError("Assembled PDF has %d instead of %d bytes" % (part.tell(), pdf_file["size"]))
+    finally:
+        for file in parts.values():
+            file.close()
+    return sum(end - start for start, end in downloads)
+
+
+def download_pdf(overleaf_client, compile_result, pdf_file, path, previous=None, previous_path=None,
+                 jobs=POOL_SIZE):
+    """
+    Download the PDF of a compile to path, streamed to disk. If the previous PDF is given, only the parts which
+    changed are downloaded and the unchanged ranges are copied from it. If that fails for any reason, e.g. the
+    server does not support range requests, the whole PDF is downloaded instead.
+
+    Params:
+    overleaf_client: the OverleafClient to download with
+    compile_result: the result of OverleafClient.compile_project
+    pdf_file: the pdf entry of the compile result's outputFiles
+    path: where to write the PDF, it is only replaced once the new PDF is complete
+    previous: the PdfState entry of the previous PDF, None to download the whole PDF
+    previous_path: the path of the previous PDF
+    jobs: the number of concurrent range requests
+
+    Returns: tuple of the number of bytes downloaded and the verified cacheable ranges of the new PDF
+    """
+    part_path = path + PART_SUFFIX
+    segments = plan_pdf(pdf_file, previous, jobs) if previous is not None and previous_path else None
+    downloaded = None
+    try:
+        if segments is not None:
+            try:
+                downloaded = _assemble(overleaf_client, compile_result, pdf_file, segments, previous_path, part_path,
+                                       jobs)
+            except Exception:
+                downloaded = None
+        if downloaded is None:
+            with open(part_path, 'wb') as part:
+                overleaf_client.download_output(compile_result, pdf_file, target=part)
+            downloaded = os.path.getsize(part_path)
+        ranges = verified_ranges(part_path, pdf_file.get("ranges") or [])
+        os.replace(part_path, path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return downloaded, ranges
+
+
+def select_outputs(compile_result, outputs):
+    """
+    Params: compile_result, the result of OverleafClient.compile_project; outputs, iterable of output types such as
+    "pdf", "log", "synctex.gz" or "bbl", matched against the end of the output file paths
+    Returns: list of the entries of the compile result's outputFiles of the selected types, in the order of outputs
+    """
+    selected = []
+    for output in outputs:
+        suffix = "." + output.lstrip(".")
+        for output_file in compile_result['outputFiles']:
+            if output_file['path'].endswith(suffix) and output_file not in selected:
+                selected.append(output_file)
+    return selected
+
+
+def _download_output(overleaf_client, compile_result, output_file, path):
+    part_path = path + PART_SUFFIX
+    try:
+        with open(part_path, 'wb') as part:
+            overleaf_client.download_output(compile_result, output_file, target=part)
+        os.replace(part_path, path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return os.path.getsize(path), []
+
+
+def download_outputs(overleaf_client, compile_result, output_files, download_path, previous=None,
+                     jobs=POOL_SIZE):
+    """
+    Download the output files of a compile concurrently, each streamed to disk and only replacing the file of the
+    same name once it is complete. The PDF is downloaded with download_pdf, reusing the previous PDF.
+
+    Params:
+    overleaf_client: the OverleafClient to download with
+    compile_result: the result of OverleafClient.compile_project
+    output_files: the entries of the compile result's outputFiles to download, see select_outputs
+    download_path: the folder to download to, output paths are relative to it
+    previous: the PdfState entry of the previous PDF in download_path, None to download the whole PDF
+    jobs: the number of concurrent downloads
+
+    Returns: dict of output path -> tuple of the number of bytes downloaded and the verified cacheable ranges
+    (only reported for PDFs)
+    """
+    def download(output_file):
+        path = os.path.join(download_path, output_file['path'])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if output_file['type'] == 'pdf':
+            previous_path = os.path.join(download_path, previous["name"]) if previous is not None else None
+            return download_pdf(overleaf_client, compile_result, output_file, path, previous, previous_path, jobs)
+        return _download_output(overleaf_client, compile_result, output_file, path)
+
+    results = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(output_files)))) as executor:
+        futures = {output_file['path']: executor.submit(download, output_file) for output_file in output_files}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                error = error or e
+    if error is not None:
+        raise error
+    return results
@@ -0,0 +1,144 @@
+"""Overleaf Sync Profiler"""
+##################################################
+# MIT License
+##################################################
+# File: olprofile.py
+# Description: Collects the timings of a run: steps, sync phases and requests
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+
+import json
+import threading
+import time
+
+
+class Profiler(object):
+    """
+    Collects how long the steps (execute_action / execute_stages), the sync phases with their files and the
+    requests of one run took. Steps and phases may be recorded from several threads at once.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._context = threading.local()
+        self.steps = []
+        self.phases = []
+        self.requests = []
+
+    def set_project(self, project):
+        """
+        Label the steps and phases recorded by the current thread with a project, e.g. in sync-all
+        """
+        self._context.project = project
+
+    def _entry(self, **values):
+        project = getattr(self._context, "project", None)
+        if project is not None:
+            values["project"] = project
+        return values
+
+    def record_step(self, name, elapsed, ok, stages=None):
+        """
+        Params: name, the progress message of the step; elapsed, seconds; ok, whether the step succeeded;
+        stages, list of (stage name, seconds or None if it failed) of steps running stages concurrently
+        """
+        entry = self._entry(name=name, elapsed=elapsed, ok=ok)
+        if stages is not None:
+            entry["stages"] = [{"name": stage, "elapsed": stage_elapsed} for stage, stage_elapsed in stages]
+        with self._lock:
+            self.steps.append(entry)
+
+    def record_phase(self, name, elapsed, files):
+        """
+        Params: name, the name of the phase; elapsed, seconds; files, list of (file name, seconds, ok)
+        """
+        entry = self._entry(name=name, elapsed=elapsed,
+                            files=[{"name": file, "elapsed": file_elapsed, "ok": ok}
+                                   for file, file_elapsed, ok in files])
+        with self._lock:
+            self.phases.append(entry)
+
+    def on_request(self, event, request):
+        """
+        Request listener, see OverleafClient.add_request_listener
+        """
+        if event != "end":
+            return
+        entry = dict(request)
+        entry["start"] = entry["start"] - self._start
+        with self._lock:
+            self.requests.append(entry)
+
+    def endpoints(self):
+        """
+        Returns: dict of "METHOD endpoint" -> count, errors, retries, bytes sent and received, total and maximum
+        latency
+        """
+        with self._lock:
+            requests = list(self.requests)
+        return self._endpoints(requests)
+
+    @staticmethod
+    def _endpoints(requests):
+        endpoints = {}
+        for request in requests:
+            totals = endpoints.setdefault("%s %s" % (request["method"], request["endpoint"]), {
+                "count": 0, "errors": 0, "retries": 0, "sent": 0, "received": 0, "latency": 0.0, "max_latency": 0.0})
+            totals["count"] += 1
+            if request.get("error") or (request["status"] is not None and request["status"] >= 400):
+                totals["errors"] += 1
+            if request.get("attempt"):
+                totals["retries"] += 1
+            totals["sent"] += request["sent"]
+            totals["received"] += request["received"]
+            totals["latency"] += request["latency"]
+            totals["max_latency"] = max(totals["max_latency"], request["latency"])
+        return endpoints
+
+    def report(self):
+        """
+        Returns: the machine-readable report of the run, a JSON serializable dict
+        """
+        with self._lock:
+            report = {
+                "total": time.perf_counter() - self._start,
+                "steps": list(self.steps),
+                "phases": list(self.phases),
+                "requests": list(self.requests),
+            }
+        report["endpoints"] = self._endpoints(report["requests"])
+        return report
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self):
+        """
+        Returns: list of lines summarizing the report for the terminal
+        """
+        report = self.report()
+        lines = ["Timings", "=" * 40]
+
+        def label(entry):
+            return "[%s] %s" % (entry["project"], entry["name"]) if "project" in entry else entry["name"]
+
+        for step in report["steps"]:
+            lines.append("  %-50s %8.2fs%s" % (label(step)[:50], step["elapsed"], "" if step["ok"] else " (failed)"))
+        for phase in report["phases"]:
+            slowest = max(phase["files"], key=lambda file: file["elapsed"], default=None)
+            lines.append("  %-50s %8.2fs  %d file(s)%s" % (
+                label(phase)[:50], phase["elapsed"], len(phase["files"]),
+                ", slowest %s %.2fs" % (slowest["name"], slowest["elapsed"]) if slowest else ""))
+        if report["endpoints"]:
+            lines.append("  %-50s %6s %7s %10s %10s %9s %9s" % ("Requests", "count", "retries", "sent KiB",
+                                                                "recv KiB", "total s", "max s"))
+            for endpoint, totals in sorted(report["endpoints"].items()):
+                lines.append("  %-50s %6d %7d %10.1f %10.1f %9.2f %9.2f" % (
+                    endpoint[:50], totals["count"], totals["retries"], totals["sent"] / 1024,
+                    totals["received"] / 1024, totals["latency"], totals["max_latency"]))
+        lines.append("  %-50s %8.2fs" % ("Total", report["total"]))
+        return lines
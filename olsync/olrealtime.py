@@ -0,0 +1,246 @@
+"""Overleaf Realtime Session"""
+##################################################
+# MIT License
+##################################################
+# File: olrealtime.py
+# Description: Long-lived Overleaf Socket.IO session
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+
+import threading
+import time
+
+JOIN_TIMEOUT = 30  # Seconds to wait for the joinProject answer
+POLL_INTERVAL = 0.05  # Seconds to wait for pending events when refreshing the file tree
+
+# Tree events broadcast by the Overleaf real-time service (the typos are Overleaf's)
+NEW_DOC_EVENT = "reciveNewDoc"
+NEW_FILE_EVENT = "reciveNewFile"
+NEW_FOLDER_EVENT = "reciveNewFolder"
+REMOVE_EVENT = "removeEntity"
+RENAME_EVENT = "reciveEntityRename"
+MOVE_EVENT = "reciveEntityMove"
+TREE_EVENTS = (NEW_DOC_EVENT, NEW_FILE_EVENT, NEW_FOLDER_EVENT, REMOVE_EVENT, RENAME_EVENT, MOVE_EVENT)
+
+
+class ProjectTree(object):
+    """
+    Local copy of a joined project's file tree
+    The tree events the server broadcasts (new docs, files and folders, removals, renames and moves) are applied
+    to it, so it never has to be fetched again.
+    """
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.project_infos = None
+        self.revision = 0  # Incremented every time the file tree changes
+        self._parents = {}  # Entity id -> (containing folder, list key in the folder)
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def add_listener(self, listener):
+        """
+        Register a callback called (without arguments) after every change of the file tree
+        """
+        self._listeners.append(listener)
+
+    def joined(self, project_infos):
+        """
+        Replace the file tree with the one of the joinProject answer
+        """
+        with self._lock:
+            self.project_infos = project_infos
+            self._index_tree()
+            self._changed()
+
+    def apply_event(self, name, args):
+        """
+        Apply a tree event, other events are ignored
+        Params: name, the name of the event; args, the list of its arguments
+        """
+        if name == NEW_DOC_EVENT:
+            self._add(args[0], args[1], 'docs')
+        elif name == NEW_FILE_EVENT:
+            self._add(args[0], args[1], 'fileRefs')
+        elif name == NEW_FOLDER_EVENT:
+            self._add(args[0], args[1], 'folders')
+        elif name == REMOVE_EVENT:
+            self._remove(args[0])
+        elif name == RENAME_EVENT:
+            self._rename(args[0], args[1])
+        elif name == MOVE_EVENT:
+            self._move(args[0], args[1])
+
+    def _changed(self):
+        self.revision += 1
+        for listener in self._listeners:
+            listener()
+
+    def _index_tree(self):
+        self._parents = {}
+        pending = [self.project_infos['rootFolder'][0]]
+        while pending:
+            folder = pending.pop()
+            for key in ('docs', 'fileRefs', 'folders'):
+                for entity in folder.setdefault(key, []):
+                    self._parents[entity['_id']] = (folder, key)
+            pending.extend(folder['folders'])
+
+    def _folder(self, folder_id):
+        root = self.project_infos['rootFolder'][0]
+        if folder_id == root['_id']:
+            return root
+        entry = self._find(folder_id)
+        if entry is None:
+            return None
+        folder, key = entry
+        return next((f for f in folder[key] if f['_id'] == folder_id), None)
+
+    def _find(self, entity_id):
+        entry = self._parents.get(entity_id)
+        if entry is None or not any(e['_id'] == entity_id for e in entry[0][entry[1]]):
+            # The tree may have been changed outside of this session (e.g. by our own uploads)
+            self._index_tree()
+            entry = self._parents.get(entity_id)
+        return entry
+
+    def _add(self, folder_id, entity, key):
+        with self._lock:
+            folder = self._folder(folder_id)
+            if folder is None:
+                return
+            if key == 'folders':
+                entity.setdefault('docs', [])
+                entity.setdefault('fileRefs', [])
+                entity.setdefault('folders', [])
+            # Our own uploads may already be in the tree, replace them with the full entity
+            folder[key][:] = [e for e in folder[key] if e['_id'] != entity['_id'] and e['name'] != entity['name']]
+            folder[key].append(entity)
+            self._parents[entity['_id']] = (folder, key)
+            self._changed()
+
+    def _remove(self, entity_id):
+        with self._lock:
+            entry = self._find(entity_id)
+            if entry is None:
+                return
+            folder, key = entry
+            folder[key][:] = [e for e in folder[key] if e['_id'] != entity_id]
+            del self._parents[entity_id]
+            self._changed()
+
+    def _rename(self, entity_id, name):
+        with self._lock:
+            entry = self._find(entity_id)
+            if entry is None:
+                return
+            folder, key = entry
+            for entity in folder[key]:
+                if entity['_id'] == entity_id:
+                    entity['name'] = name
+            self._changed()
+
+    def _move(self, entity_id, folder_id):
+        with self._lock:
+            entry = self._find(entity_id)
+            target = self._folder(folder_id)
+            if entry is None or target is None:
+                return
+            folder, key = entry
+            entity = next(e for e in folder[key] if e['_id'] == entity_id)
+            folder[key][:] = [e for e in folder[key] if e['_id'] != entity_id]
+            target[key].append(entity)
+            self._parents[entity_id] = (target, key)
+            self._changed()
+
+
+class RealtimeSession(ProjectTree):
+    """
+    Long-lived Socket.IO session joined to one project
+    The project is joined once; afterwards the tree events the server broadcasts are applied to the
+    local copy of the file tree, see ProjectTree. Events are processed whenever poll() is called; a
+    dropped connection is re-established (and the project re-joined) by the next poll().
+    """
+
+    def __init__(self, url, cookie, project_id):
+        super().__init__(project_id)
+        self._url = url
+        self._cookie = cookie
+        self._socket_io = None
+
+    @property
+    def connected(self):
+        return self._socket_io is not None and self._socket_io.connected
+
+    def connect(self):
+        """
+        Connect to the Socket.IO endpoint and join the project
+        Returns: project details, including the file tree
+        """
+        # Only loaded once a project is joined, syncs of unchanged projects never need it
+        from socketIO_client import SocketIO
+
+        with self._lock:
+            self.close()
+
+            # Connect to Overleaf Socket.IO, send a time parameter and the cookies
+            self._socket_io = SocketIO(
+                self._url,
+                params={'t': int(time.time())},
+                headers={'Cookie': self._cookie}
+            )
+
+            # Wait until we connect to the socket
+            self._socket_io.on('connect', lambda: None)
+            self._socket_io.wait_for_callbacks(seconds=JOIN_TIMEOUT)
+
+            for event in TREE_EVENTS:
+                self._socket_io.on(event, lambda *args, event=event: self.apply_event(event, args))
+
+            project_infos = None
+            error = None
+
+            # Callback function for the joinProject emitter
+            def set_project_infos(join_error=None, project_infos_dict=None, *args):
+                nonlocal project_infos, error
+                error = join_error
+                project_infos = project_infos_dict
+
+            # Send the joinProject event and receive the project infos
+            self._socket_io.emit('joinProject', {'project_id': self.project_id}, set_project_infos)
+            self._socket_io.wait_for_callbacks(seconds=JOIN_TIMEOUT)
+
+            if error or project_infos is None:
+                self.close()
+                raise Exception("Could not join project %s: %s" % (self.project_id, error or "no answer"))
+
+            self.joined(project_infos)
+            return project_infos
+
+    def poll(self, seconds=POLL_INTERVAL):
+        """
+        Apply the tree events received since the last call, reconnecting if the connection was lost
+        Returns: project details, including the up to date file tree
+        """
+        with self._lock:
+            if not self.connected:
+                return self.connect()
+            # Waiting also sends the heartbeats which keep the connection open
+            self._socket_io.wait(seconds=seconds)
+            if not self.connected:
+                return self.connect()
+            return self.project_infos
+
+    def close(self):
+        """
+        Disconnect from the Socket.IO endpoint
+        """
+        with self._lock:
+            socket_io, self._socket_io = self._socket_io, None
+            if socket_io is not None:
+                if socket_io.connected:
+                    socket_io.disconnect()
+                # SocketIO.__del__ disconnects once more, which first reconnects a closed transport
+                socket_io.disconnect = lambda path='': None
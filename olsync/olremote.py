@@ -0,0 +1,198 @@
+"""Overleaf Remote Snapshot"""
+##################################################
+# MIT License
+##################################################
+# File: olremote.py
+# Description: The remote project files as seen by one sync
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+
+import calendar
+import os
+import threading
+import zlib
+
+try:
+    # Import for pip installation / wheel
+    from olsync.olclient import OverleafClient
+except ImportError:
+    # Import for development
+    from olclient import OverleafClient
+
+CHUNK_SIZE = 1024 * 1024  # Compare and hash files in chunks of 1 MiB
+REQUEST_COST = 256 * 1024  # Cost of one request (its latency) in bytes which could be transferred meanwhile
+UNKNOWN_SIZE = 64 * 1024  # Assumed size of files not in the manifest if no file is recorded at all
+ZIP_TIME_RESOLUTION = 2  # Zip entries store their modification time in steps of 2 seconds
+
+
+def _crc32(file):
+    crc = 0
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        crc = zlib.crc32(chunk, crc)
+    file.seek(0)
+    return crc
+
+
+def zip_timestamps(zip_file):
+    """
+    Params: zip_file, a zipfile.ZipFile
+    Returns: dict of member name -> modification time (POSIX time stamp) of its files. Zip entries have no time zone,
+    the times are taken as UTC like Overleaf's servers write them; the DOS epoch (1980) means no time was stored.
+    """
+    return {info.filename: calendar.timegm(info.date_time + (0, 0, 0)) for info in zip_file.infolist()
+            if not info.is_dir() and info.date_time[0] > 1980}
+
+
+def _streams_equal(local, remote):
+    while True:
+        local_chunk = local.read(CHUNK_SIZE)
+        # Zip members may return short reads, fill the chunk up to the local chunk size
+        remote_chunk = remote.read(len(local_chunk))
+        while len(remote_chunk) < len(local_chunk):
+            more = remote.read(len(local_chunk) - len(remote_chunk))
+            if not more:
+                break
+            remote_chunk += more
+        if local_chunk != remote_chunk:
+            return False
+        if not local_chunk:
+            # Both are exhausted only if the remote has no more content either
+            return not remote.read(1)
+
+
+class _Member(object):
+    """
+    Context manager handing out a downloaded file without closing it, it is closed with the snapshot
+    """
+
+    def __init__(self, file):
+        self._file = file
+
+    def __enter__(self):
+        self._file.seek(0)
+        return self._file
+
+    def __exit__(self, *args):
+        return False
+
+
+class RemoteSnapshot(object):
+    """
+    The remote project files as seen by one sync: the version (CRC-32) of every file and access to their content.
+    The content comes from the project zip, from files downloaded one by one, or, if the project did not change
+    since the last sync, is not downloaded at all. Content which is missing is taken from the project zip,
+    which is only downloaded on first use. The zip also tells when each of its files was last modified.
+    """
+
+    def __init__(self, versions, files=None, zip_file=None, load_zip=None):
+        """
+        Params:
+        versions: dict of file name -> version of the files whose content is not downloaded
+        files: dict of file name -> file object of the files downloaded one by one, versioned by their content
+        zip_file: the downloaded project zip (zipfile.ZipFile), versioned by the CRC-32 of its members
+        load_zip: function downloading the project zip if the content of another file is needed
+        """
+        self.versions = dict(versions)
+        self._files = dict(files or {})
+        self._zip_file = zip_file
+        self._load_zip = load_zip
+        self._lock = threading.Lock()
+        self.timestamps = {}  # File name -> modification time as stored in the project zip
+
+        for name, file in self._files.items():
+            self.versions[name] = _crc32(file)
+        if zip_file is not None:
+            self.versions.update((info.filename, info.CRC) for info in zip_file.infolist() if not info.is_dir())
+            self.timestamps.update(zip_timestamps(zip_file))
+
+    def __contains__(self, name):
+        return name in self.versions
+
+    def __iter__(self):
+        return iter(self.versions)
+
+    def available(self, name):
+        """
+        Returns: True if the content of the file can be read without downloading anything
+        """
+        return name in self._files or self._zip_file is not None
+
+    def _zip(self):
+        with self._lock:
+            if self._zip_file is None:
+                if self._load_zip is None:
+                    raise KeyError("The content of the remote files is not available")
+                self._zip_file = self._load_zip()
+                self.timestamps.update(zip_timestamps(self._zip_file))
+            return self._zip_file
+
+    def open(self, name):
+        """
+        Open the content of a remote file
+        Returns: context manager providing a readable binary file object
+        """
+        if name in self._files:
+            return _Member(self._files[name])
+        return self._zip().open(name)
+
+    def equals(self, path, name):
+        """
+        Compare a local file with a remote file chunk by chunk, without loading either into memory
+        """
+        if name not in self._files:
+            info = self._zip().getinfo(name)
+            if os.path.getsize(path) != info.file_size:
+                return False
+        with open(path, 'rb') as local, self.open(name) as remote:
+            return _streams_equal(local, remote)
+
+    def close(self):
+        for file in self._files.values():
+            file.close()
+        if self._zip_file is not None:
+            # ZipFile does not close the file object it was opened from, close the downloaded archive too
+            archive = self._zip_file.fp
+            self._zip_file.close()
+            archive.close()
+
+
+def plan_downloads(state, project_infos, jobs=1):
+    """
+    Decide whether to download the files which may have changed one by one or the whole project zip.
+    Docs keep their id when edited, so every doc may have changed; a replaced binary file gets a new id,
+    so binary files whose id is the recorded one are unchanged. Each download is costed as its size plus
+    the latency of a request (spread over the concurrent jobs), using the sizes recorded at the last sync.
+
+    Params:
+    state: the SyncState of the last sync
+    project_infos: the project details as returned by OverleafClient.get_project_infos
+    jobs: the number of concurrent downloads
+
+    Returns: tuple of the dict of file name -> recorded version of the unchanged files and the list of files
+    to download, or None if downloading the project zip is cheaper
+    """
+    entries = [state.get(name) for name in state.names()]
+    average_size = sum(entry["size"] for entry in entries) / len(entries) if entries else UNKNOWN_SIZE
+
+    unchanged, changed = {}, []
+    total_size, changed_size = 0, 0
+    for path, entity_type, entity in OverleafClient.project_entities(project_infos):
+        if entity_type == "folder":
+            continue
+        entry = state.get(path)
+        size = entry["size"] if entry is not None else average_size
+        total_size += size
+        if entity_type == "file" and entry is not None and entry["remote_id"] == entity['_id']:
+            unchanged[path] = entry["remote_version"]
+        else:
+            changed.append(path)
+            changed_size += size
+
+    files_cost = changed_size + len(changed) * REQUEST_COST / max(1, jobs)
+    zip_cost = total_size + REQUEST_COST
+    if files_cost >= zip_cost:
+        return None
+    return unchanged, changed
@@ -0,0 +1,148 @@
+"""Overleaf Request Retries"""
+##################################################
+# MIT License
+##################################################
+# File: olretry.py
+# Description: Retry policy with jittered exponential backoff and an adaptive limit on concurrent requests
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+
+import email.utils
+import random
+import threading
+import time
+
+RETRIES = 5  # Number of times a failed request is sent again
+BACKOFF_BASE = 0.5  # Seconds waited before the first retry, doubled for every further one
+BACKOFF_MAX = 30  # Upper bound of the backoff in seconds
+RETRY_AFTER_MAX = 120  # Longer Retry-After times are not waited for, the request fails instead
+# The server is overloaded or a proxy in front of it could not reach it
+PRESSURE_STATUSES = frozenset((429, 502, 503, 504))
+# The request was rejected before it was processed, so even requests which are not idempotent can be sent again
+REJECTED_STATUSES = frozenset((429, 503))
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+
+def retry_after(headers):
+    """
+    Params: headers, the headers of a response
+    Returns: the seconds to wait the Retry-After header asks for, or None
+    """
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is sent again and how long to wait before
+    Requests which are not idempotent are only retried if the server certainly did not process them: the connection
+    could not be established or the server rejected them as overloaded (429, 503).
+    """
+
+    def __init__(self, retries=RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 retry_after_max=RETRY_AFTER_MAX):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+
+    def backoff(self, attempt):
+        """
+        Full jitter: a random time up to the exponential backoff, so concurrent requests failing together do not
+        retry together
+        Params: attempt, the number of the failed attempt starting with 0
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def delay(self, attempt, idempotent, status=None, headers=None, error=None, connected=True):
+        """
+        Params:
+        attempt: the number of the failed attempt starting with 0
+        idempotent: whether sending the request twice has the same effect as sending it once
+        status, headers: the status code and the headers of the response of the failed attempt
+        error: the exception the failed attempt raised instead of responding
+        connected: False if error was raised before the request was sent
+
+        Returns: the seconds to wait before sending the request again, or None if it must not be retried
+        """
+        if attempt >= self.retries:
+            return None
+        if status is not None:
+            if status not in PRESSURE_STATUSES:
+                return None
+            if not idempotent and status not in REJECTED_STATUSES:
+                return None
+            wait = retry_after(headers or {})
+            if wait is not None:
+                return wait if wait <= self.retry_after_max else None
+        elif error is None or not (idempotent or not connected):
+            return None
+        return self.backoff(attempt)
+
+
+class ConcurrencyLimiter(object):
+    """
+    Limits the number of requests sent at the same time, adapting the limit to the server (AIMD)
+    Every successful request raises the limit by 1 / limit, i.e. by one per round of requests, up to the maximum.
+    A request answered with a sign of overload halves it, at most once per round: requests which were already on
+    their way when the limit was lowered do not lower it again.
+    """
+
+    def __init__(self, limit, min_limit=1):
+        self.max_limit = max(1, limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self._in_flight = 0
+        self._decreased = 0  # Number of the last permit handed out when the limit was lowered
+        self._issued = 0  # Number of permits handed out
+        self._condition = threading.Condition()
+
+    def _admit(self):
+        if self._in_flight >= int(self.limit):
+            return None
+        self._in_flight += 1
+        self._issued += 1
+        return self._issued
+
+    def _update(self, permit, pressure):
+        self._in_flight -= 1
+        if pressure:
+            if permit > self._decreased:
+                self.limit = max(float(self.min_limit), self.limit / 2)
+                self._decreased = self._issued
+        elif pressure is not None:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def acquire(self):
+        """
+        Wait until another request may be sent
+        Returns: the permit, to be passed to release
+        """
+        with self._condition:
+            permit = self._admit()
+            while permit is None:
+                self._condition.wait()
+                permit = self._admit()
+            return permit
+
+    def release(self, permit, pressure=None):
+        """
+        Params: permit, as returned by acquire; pressure, True if the server showed signs of overload, False if the
+        request succeeded and None if its outcome says nothing about the server's load
+        """
+        with self._condition:
+            self._update(permit, pressure)
+            self._condition.notify_all()
+
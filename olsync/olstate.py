@@ -0,0 +1,329 @@
+"""Overleaf Sync State"""
+##################################################
+# MIT License
+##################################################
+# File: olstate.py
+# Description: Persistent local sync state
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+STATE_DIR = ".olsync"  # Folder inside the sync path holding the sync state, never synced
+STATE_PATH = os.path.join(STATE_DIR, "state")  # The manifest of the last successful sync
+PDF_STATE_PATH = os.path.join(STATE_DIR, "pdf")  # The PDFs downloaded into a folder by `ols download`
+STATE_VERSION = 1  # Bump when the manifest format changes, older manifests are discarded
+CHUNK_SIZE = 1024 * 1024  # Read files in chunks of 1 MiB when hashing
+PROJECT_CACHE_SUFFIX = ".projects"  # The project cache is stored next to the cookie file, e.g. .olauth.projects
+PROJECT_CACHE_TTL = 24 * 60 * 60  # Seconds after which the cached project names and ids are queried again
+
+
+def hash_file(path):
+    """
+    Hash a file without loading it into memory
+    Params: path, the path of the file
+    Returns: tuple of the SHA-1 hex digest and the CRC-32 (as stored in zip archives) of the content
+    """
+    sha1 = hashlib.sha1()
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha1.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+    return sha1.hexdigest(), crc
+
+
+class SyncState(object):
+    """
+    Manifest of all files as they were after the last successful sync.
+    For every path the size, mtime and content hash of the local copy and the id and version of the
+    remote entity are recorded, so files which did not change on either side are detected with a
+    single stat call instead of a byte-by-byte comparison.
+    The remote version is the CRC-32 of the file content, which is what the project zip reports.
+    After a complete sync the project id and the lastUpdated time stamp of the dashboard are recorded
+    too, so an unchanged remote project is detected without downloading it.
+    All file names are relative to root, the sync path.
+    """
+
+    def __init__(self, root=".", path=STATE_PATH):
+        self._root = root
+        self._path = os.path.join(root, path)
+        self._files = {}
+        self._project = None
+        self._lock = threading.Lock()  # Files are recorded from the sync worker threads
+
+        if os.path.isfile(self._path):
+            try:
+                with open(self._path, 'r') as f:
+                    content = json.load(f)
+                if content.get("version") == STATE_VERSION:
+                    self._files = content["files"]
+                    self._project = content.get("project")
+            except (ValueError, KeyError):
+                # A corrupt manifest only costs us a full comparison
+                self._files = {}
+                self._project = None
+
+    def save(self):
+        """
+        Write the manifest atomically to disk
+        """
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp_path = self._path + ".tmp"
+        with self._lock:
+            content = {"version": STATE_VERSION, "files": self._files, "project": self._project}
+            with open(tmp_path, 'w') as f:
+                json.dump(content, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._path)
+
+    def get(self, name):
+        """
+        Get the recorded entry of a file
+        Params: name, the path of the file relative to the sync path
+        Returns: dict with size, mtime, hash, remote_id and remote_version or None
+        """
+        return self._files.get(name)
+
+    def names(self):
+        """
+        Returns: list of the paths of all recorded files
+        """
+        with self._lock:
+            return list(self._files)
+
+    def synced_project(self):
+        """
+        Returns: dict with the id and lastUpdated time stamp of the project at the last complete sync or None
+        """
+        return self._project
+
+    def record_project(self, project_id, last_updated):
+        """
+        Record the project after a sync which left every file identical on both sides
+        Params: project_id, the id of the project; last_updated, its lastUpdated time stamp before the sync
+        """
+        self._project = {"id": project_id, "lastUpdated": last_updated}
+
+    def forget_project(self):
+        """
+        Drop the recorded project, e.g. after files were skipped, so the next sync compares the remote again
+        """
+        self._project = None
+
+    def local_unchanged(self, name, stat=None):
+        """
+        Check whether the local file is still the one recorded at the last sync, using its stat only
+        Params: name, the path of the file; stat, an already collected os.stat_result (optional)
+        Returns: True if size and mtime did not change
+        """
+        entry = self._files.get(name)
+        if entry is None:
+            return False
+        if stat is None:
+            try:
+                stat = os.stat(os.path.join(self._root, name))
+            except OSError:
+                return False
+        return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns
+
+    def remote_unchanged(self, name, remote_version):
+        """
+        Check whether the remote file is still the one recorded at the last sync
+        Params: name, the path of the file; remote_version, the current CRC-32 of the remote file
+        Returns: True if the remote version did not change
+        """
+        entry = self._files.get(name)
+        return entry is not None and entry["remote_version"] == remote_version
+
+    def unchanged(self, name, remote_version, stat=None):
+        """
+        Check whether a file did not change on either side since the last sync
+        Returns: True if both copies are still identical to the recorded one
+        """
+        return self.remote_unchanged(name, remote_version) and self.local_unchanged(name, stat)
+
+    def record(self, name, remote_version=None, remote_id=None):
+        """
+        Record a file whose local and remote copies are identical
+
+        Params:
+        name: the path of the file relative to the sync path
+        remote_version: the CRC-32 reported by the remote, computed from the local content if omitted
+        remote_id: the id of the remote doc or file entity, the recorded id is kept if omitted
+        """
+        path = os.path.join(self._root, name)
+        stat = os.stat(path)
+        content_hash, crc = hash_file(path)
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": content_hash,
+            "remote_id": remote_id,
+            "remote_version": crc if remote_version is None else remote_version,
+        }
+        with self._lock:
+            if remote_id is None and name in self._files:
+                entry["remote_id"] = self._files[name]["remote_id"]
+            self._files[name] = entry
+
+    def update_remote_ids(self, remote_ids):
+        """
+        Refresh the remote entity ids of all recorded files
+        Params: remote_ids, dict of path -> remote entity id
+        """
+        with self._lock:
+            for name, entry in self._files.items():
+                if name in remote_ids:
+                    entry["remote_id"] = remote_ids[name]
+
+    def forget(self, name):
+        """
+        Remove a file from the manifest, e.g. after it was deleted
+        """
+        with self._lock:
+            self._files.pop(name, None)
+
+
+class PdfState(object):
+    """
+    The PDFs downloaded into a folder, per project: the file name, the build it was downloaded from, the lastUpdated
+    time stamp of the project when it was compiled, the size, mtime and hash of the file, the cacheable byte
+    ranges the compile reported and the other output files (log, synctex, ...) downloaded with it. An unchanged
+    project or build is not downloaded again, and the byte ranges of the previous PDF are reused when only part
+    of it changed.
+    """
+
+    def __init__(self, root=".", path=PDF_STATE_PATH):
+        self._root = root
+        self._path = os.path.join(root, path)
+        self._pdfs = {}
+
+        if os.path.isfile(self._path):
+            try:
+                with open(self._path, 'r') as f:
+                    content = json.load(f)
+                if content.get("version") == STATE_VERSION:
+                    self._pdfs = content["pdfs"]
+            except (ValueError, KeyError):
+                self._pdfs = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": STATE_VERSION, "pdfs": self._pdfs}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._path)
+
+    def has_pdfs(self):
+        """
+        Returns: True if a PDF was downloaded into the folder before
+        """
+        return bool(self._pdfs)
+
+    def files(self):
+        """
+        Returns: list of the paths of all downloaded PDFs and of the output files downloaded with them
+        """
+        return sorted({path for entry in self._pdfs.values() for path in [entry["name"]] + entry["outputs"]})
+
+    def get(self, project_id):
+        """
+        Get the PDF downloaded last, if the file was not changed or removed since
+        Params: project_id, the id of the project
+        Returns: dict with name, build, lastUpdated, size, mtime, hash and ranges or None
+        """
+        entry = self._pdfs.get(project_id)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(os.path.join(self._root, entry["name"]))
+        except OSError:
+            return None
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+            return None
+        return entry
+
+    def record(self, project_id, name, build, last_updated, ranges, outputs=()):
+        """
+        Record a downloaded PDF
+
+        Params:
+        project_id: the id of the project
+        name: the path of the PDF relative to the download folder
+        build: the id of the build it was downloaded from
+        last_updated: the lastUpdated time stamp of the project before it was compiled, None if unknown
+        ranges: the cacheable byte ranges of the PDF as reported by the compile
+        outputs: the paths of the other output files of the same build downloaded along with the PDF
+        """
+        path = os.path.join(self._root, name)
+        stat = os.stat(path)
+        self._pdfs[project_id] = {
+            "name": name,
+            "build": build,
+            "lastUpdated": last_updated,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": hash_file(path)[0],
+            "ranges": [{"start": r["start"], "end": r["end"], "hash": r["hash"]} for r in ranges],
+            "outputs": sorted(outputs),
+        }
+
+
+class ProjectCache(object):
+    """
+    On-disk cache mapping project names to project ids, stored next to the persisted cookie
+    so the dashboard does not have to be fetched and parsed on every run.
+    """
+
+    def __init__(self, cookie_path, ttl=PROJECT_CACHE_TTL):
+        self._path = os.path.abspath(cookie_path) + PROJECT_CACHE_SUFFIX
+        self._ttl = ttl
+        self._projects = {}
+
+        if os.path.isfile(self._path):
+            try:
+                with open(self._path, 'r') as f:
+                    content = json.load(f)
+                if content.get("version") == STATE_VERSION and time.time() - content["updated"] < ttl:
+                    self._projects = content["projects"]
+            except (ValueError, KeyError):
+                self._projects = {}
+
+    def get(self, project_name):
+        """
+        Get a cached project by name
+        Params: project_name, the name of the project
+        Returns: project object (id, name and lastUpdated at caching time) or None
+        """
+        return self._projects.get(project_name)
+
+    def update(self, projects):
+        """
+        Replace the cache with a fresh list of projects and persist it
+        Params: projects, list of project objects as returned by OverleafClient.all_projects
+        """
+        self._projects = {}
+        for p in projects:
+            # Keep the first project of a name, the same one OverleafClient.get_project returns
+            self._projects.setdefault(p['name'], {k: p.get(k) for k in ("id", "name", "lastUpdated")})
+        self._save(time.time())
+
+    def invalidate(self, project_name):
+        """
+        Drop a project whose cached id is not valid anymore
+        """
+        if self._projects.pop(project_name, None) is not None:
+            self._save(0)  # Force a refresh of all other entries on the next lookup as well
+
+    def _save(self, updated):
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": STATE_VERSION, "updated": updated, "projects": self._projects}, f)
+        os.replace(tmp_path, self._path)
@@ -11,24 +11,48 @@
 
 import click
 import os
+import sys
 from yaspin import yaspin
 import pickle
+import json
 import zipfile
-import io
+import shutil
 import dateutil.parser
-import glob
-import fnmatch
+import requests as reqs
+import threading
+import time
 import traceback
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
     # Import for pip installation / wheel
-    from olsync.olclient import OverleafClient
-    import olsync.olbrowserlogin as olbrowserlogin
+    from olsync.olclient import OverleafClient, PATH_SEP, POOL_SIZE, SITE_URL
+    from olsync.olstate import SyncState, PdfState, ProjectCache, hash_file, CHUNK_SIZE
+    from olsync.olignore import OlIgnore, scan_tree
+    from olsync.olremote import RemoteSnapshot, plan_downloads, ZIP_TIME_RESOLUTION
+    from olsync.olwatch import create_watcher, PollingWatcher, DEBOUNCE
+    from olsync.olprofile import Profiler
+    import olsync.olpdf as olpdf
 except ImportError:
     # Import for development
-    from olclient import OverleafClient
-    import olbrowserlogin
+    from olclient import OverleafClient, PATH_SEP, POOL_SIZE, SITE_URL
+    from olstate import SyncState, PdfState, ProjectCache, hash_file, CHUNK_SIZE
+    from olignore import OlIgnore, scan_tree
+    from olremote import RemoteSnapshot, plan_downloads, ZIP_TIME_RESOLUTION
+    from olwatch import create_watcher, PollingWatcher, DEBOUNCE
+    from olprofile import Profiler
+    import olpdf
+
+CHECK_DIRTY_EXIT_CODE = 3  # Exit code of --check if either side changed, 1 is used for errors
+SYNC_RESULT_KEYS = ("new", "restored", "updated", "deleted", "synced", "skipped")  # The file lists of a sync result
+ASK = "ask"
+# How conflicts and deleted files are resolved: ask, keep the newer copy, prefer one side or leave them unsynced
+SYNC_POLICIES = (ASK, "newer-wins", "local-wins", "remote-wins", "skip")
+
+# Output of the project synced by the current thread in sync-all, printed as one block instead of interleaved
+_project_output = threading.local()
+_output_lock = threading.RLock()  # Projects synced concurrently print their blocks and ask one after another
+_profiler = None  # Profiler of the current run with --timings / --profile-json
 
 
 @click.group(invoke_without_command=True)
@@ -37,123 +61,277 @@ except ImportError:
               help="Sync remote project files from Overleaf to local file system only.")
 @click.option('-n', '--name', 'project_name', default="",
               help="Specify the Overleaf project name instead of the default name of the sync directory.")
+@click.option('--project-id', 'project_id', default="",
+              help="Specify the Overleaf project id, skips looking up the project by name.")
 @click.option('--store-path', 'cookie_path', default=".olauth", type=click.Path(exists=False),
               help="Relative path to load the persisted Overleaf cookie.")
+@click.option('--base-url', 'base_url', default=None, envvar='OLSYNC_BASE_URL',
+              help="URL of the Overleaf instance, defaults to the one logged in to (or $OLSYNC_BASE_URL).")
 @click.option('-p', '--path', 'sync_path', default=".", type=click.Path(exists=True),
               help="Path of the project to sync.")
 @click.option('-i', '--olignore', 'olignore_path', default=".olignore", type=click.Path(exists=False),
-              help="Path to the .olignore file relative to sync path (ignored if syncing from remote to local). See "
-                   "fnmatch / unix filename pattern matching for information on how to use it.")
+              help="Path to the .olignore file relative to sync path (ignored if syncing from remote to local). Uses "
+                   "the same pattern syntax as .gitignore.")
+@click.option('-j', '--jobs', 'jobs', default=1, type=click.IntRange(min=1),
+              help="Number of files to upload, download or delete concurrently.")
+@click.option('--check', 'check', is_flag=True,
+              help="Only report whether the local or remote files changed since the last sync, exits with code %d "
+                   "if either side did." % CHECK_DIRTY_EXIT_CODE)
+@click.option('--on-conflict', 'on_conflict', default=ASK, type=click.Choice(SYNC_POLICIES), show_default=True,
+              help="How to resolve files changed on both sides since the last sync: ask, keep the newer copy, prefer "
+                   "the local or remote copy, or skip them.")
+@click.option('--on-delete', 'on_delete', default=ASK, type=click.Choice(SYNC_POLICIES), show_default=True,
+              help="How to resolve files deleted on one side with -l / -r: ask, delete them unless the remaining "
+                   "copy changed since the last sync (newer-wins), follow the local or remote side, or skip them.")
+@click.option('--timings', 'timings', is_flag=True, help="Print how long each step, sync phase and request took.")
+@click.option('--profile-json', 'profile_path', default=None, type=click.Path(dir_okay=False),
+              help="Write the timings of every step, sync phase, file and request to this JSON file.")
 @click.option('-v', '--verbose', 'verbose', is_flag=True, help="Enable extended error logging.")
 @click.version_option(package_name='overleaf-sync')
 @click.pass_context
-def main(ctx, local, remote, project_name, cookie_path, sync_path, olignore_path, verbose):
+def main(ctx, local, remote, project_name, project_id, cookie_path, base_url, sync_path, olignore_path, jobs, check,
+         on_conflict, on_delete, timings, profile_path, verbose):
     if ctx.invoked_subcommand is None:
-        if not os.path.isfile(cookie_path):
-            raise click.ClickException(
-                "Persisted Overleaf cookie not found. Please login or check store path.")
+        overleaf_client = load_client(cookie_path, base_url, pool_size=max(jobs, POOL_SIZE))
+        project_cache = ProjectCache(cookie_path)
+        start_profiling(overleaf_client, timings, profile_path)
 
-        with open(cookie_path, 'rb') as f:
-            store = pickle.load(f)
-
-        overleaf_client = OverleafClient(store["cookie"], store["csrf"])
-
-        # Change the current directory to the specified sync path
-        os.chdir(sync_path)
-
-        project_name = project_name or os.path.basename(os.getcwd())
-        project = execute_action(
-            lambda: overleaf_client.get_project(project_name),
-            "Querying project",
-            "Project queried successfully.",
-            "Project could not be queried.",
-            verbose)
-
-        project_infos = execute_action(
-            lambda: overleaf_client.get_project_infos(project["id"]),
-            "Querying project details",
-            "Project details queried successfully.",
-            "Project details could not be queried.",
-            verbose)
-
-        zip_file = execute_action(
-            lambda: zipfile.ZipFile(io.BytesIO(
-                overleaf_client.download_project(project["id"]))),
-            "Downloading project",
-            "Project downloaded successfully.",
-            "Project could not be downloaded.",
-            verbose)
+        try:
+            result = sync_project(overleaf_client, project_cache, sync_path, project_name, project_id,
+                                  olignore_path=olignore_path, local=local, remote=remote, jobs=jobs, check=check,
+                                  verbose=verbose, on_conflict=on_conflict, on_delete=on_delete)
+        finally:
+            overleaf_client.close()
+            finish_profiling(timings, profile_path)
 
-        sync = not (local or remote)
+            if verbose:
+                report_memory_usage()
 
-        if remote or sync:
-            sync_func(
-                files_from=zip_file.namelist(),
-                deleted_files=[f for f in olignore_keep_list(olignore_path) if f not in zip_file.namelist() and not sync],
-                create_file_at_to=lambda name: write_file(name, zip_file.read(name)),
-                delete_file_at_to=lambda name: delete_file(name),
-                create_file_at_from=lambda name: overleaf_client.upload_file(
-                    project["id"], project_infos, name, os.path.getsize(name), open(name, 'rb')),
-                from_exists_in_to=lambda name: os.path.isfile(name),
-                from_equal_to_to=lambda name: open(name, 'rb').read() == zip_file.read(name),
-                from_newer_than_to=lambda name: dateutil.parser.isoparse(project["lastUpdated"]).timestamp() >
-                                                os.path.getmtime(name),
-                from_name="remote",
-                to_name="local",
-                verbose=verbose)
-        if local or sync:
-            sync_func(
-                files_from=olignore_keep_list(olignore_path),
-                deleted_files=[f for f in zip_file.namelist() if f not in olignore_keep_list(olignore_path) and not sync],
-                create_file_at_to=lambda name: overleaf_client.upload_file(
-                    project["id"], project_infos, name, os.path.getsize(name), open(name, 'rb')),
-                delete_file_at_to=lambda name: overleaf_client.delete_file(project["id"], project_infos, name),
-                create_file_at_from=lambda name: write_file(name, zip_file.read(name)),
-                from_exists_in_to=lambda name: name in zip_file.namelist(),
-                from_equal_to_to=lambda name: open(name, 'rb').read() == zip_file.read(name),
-                from_newer_than_to=lambda name: os.path.getmtime(name) > dateutil.parser.isoparse(
-                    project["lastUpdated"]).timestamp(),
-                from_name="local",
-                to_name="remote",
-                verbose=verbose)
+        if check:
+            ctx.exit(result)
 
 
 @main.command()
 @click.option('--path', 'cookie_path', default=".olauth", type=click.Path(exists=False),
               help="Path to store the persisted Overleaf cookie.")
 @click.option('--keep-browser', 'keep_browser', is_flag=True, help="Keep browser window open after successful login.")
+@click.option('--base-url', 'base_url', default=SITE_URL, envvar='OLSYNC_BASE_URL', show_default=True,
+              help="URL of the Overleaf instance to log in to (or $OLSYNC_BASE_URL).")
 @click.option('-v', '--verbose', 'verbose', is_flag=True, help="Enable extended error logging.")
-def login(cookie_path, keep_browser, verbose):
+def login(cookie_path, keep_browser, base_url, verbose):
     if os.path.isfile(cookie_path) and not click.confirm(
             'Persisted Overleaf cookie already exist. Do you want to override it?'):
         return
     click.clear()
-    execute_action(lambda: login_handler(cookie_path, keep_browser), "Login",
+    execute_action(lambda: login_handler(cookie_path, keep_browser, base_url), "Login",
                    "Login successful. Cookie persisted as `" + click.format_filename(
                        cookie_path) + "`. You may now sync your project.",
                    "Login failed. Please try again.", verbose)
 
 
+@main.command()
+@click.option('-n', '--name', 'project_name', default="",
+              help="Specify the Overleaf project name instead of the default name of the sync directory.")
+@click.option('--project-id', 'project_id', default="",
+              help="Specify the Overleaf project id, skips looking up the project by name.")
+@click.option('--store-path', 'cookie_path', default=".olauth", type=click.Path(exists=False),
+              help="Relative path to load the persisted Overleaf cookie.")
+@click.option('--base-url', 'base_url', default=None, envvar='OLSYNC_BASE_URL',
+              help="URL of the Overleaf instance, defaults to the one logged in to (or $OLSYNC_BASE_URL).")
+@click.option('-p', '--path', 'sync_path', default=".", type=click.Path(exists=True),
+              help="Path of the project to watch.")
+@click.option('-i', '--olignore', 'olignore_path', default=".olignore", type=click.Path(exists=False),
+              help="Path to the .olignore file relative to sync path. Uses the same pattern syntax as .gitignore.")
+@click.option('--debounce', 'debounce', default=DEBOUNCE, type=click.FloatRange(min=0),
+              help="Seconds without further changes before a batch of changes is pushed.")
+@click.option('--poll', 'polling', is_flag=True, help="Poll for changes instead of using inotify.")
+@click.option('-j', '--jobs', 'jobs', default=1, type=click.IntRange(min=1),
+              help="Number of files to upload or delete concurrently.")
+@click.option('-v', '--verbose', 'verbose', is_flag=True, help="Enable extended error logging.")
+def watch(project_name, project_id, cookie_path, base_url, sync_path, olignore_path, debounce, polling, jobs,
+          verbose):
+    """
+    Watch the sync path and push local changes to Overleaf as they happen.
+    Run a normal sync first, only changes made while watching are pushed.
+    """
+    overleaf_client = load_client(cookie_path, base_url, pool_size=max(jobs, POOL_SIZE))
+    project_cache = ProjectCache(cookie_path)
+
+    # Change the current directory to the specified sync path
+    os.chdir(sync_path)
+
+    project_name = project_name or os.path.basename(os.getcwd())
+    project_cached = False
+
+    def lookup_project():
+        nonlocal project_cached
+        found, project_cached = query_project(overleaf_client, project_cache, project_name, project_id)
+        return found
+
+    project = execute_action(
+        lookup_project,
+        "Querying project",
+        "Project queried successfully.",
+        "Project could not be queried.",
+        verbose)
+
+    def join_project():
+        nonlocal project
+        # A stale cached id is looked up again, all pushes then go to the project found on the dashboard
+        joined_infos, project = call_with_project(
+            lambda p: overleaf_client.get_project_infos(p["id"]),
+            overleaf_client, project_cache, project, project_cached, any_error=True)
+        return joined_infos
+
+    execute_action(
+        join_project,
+        "Joining project",
+        "Project joined successfully.",
+        "Project could not be joined.",
+        verbose)
+
+    olignore = load_olignore(olignore_path)
+    state = SyncState()
+    watcher = create_watcher(".", olignore, polling)
+    click.echo("\nWatching %s for changes (%s). Press Ctrl+C to stop." % (
+        os.getcwd(), "polling" if isinstance(watcher, PollingWatcher) else "inotify"))
+
+    def upload(name):
+        with open(name, 'rb') as f:
+            if not overleaf_client.upload_file(project["id"], project_infos, name, os.fstat(f.fileno()).st_size, f):
+                raise reqs.HTTPError("File %s could not be uploaded" % name)
+        state.record(name)
+
+    def delete(name):
+        if not overleaf_client.delete_file(project["id"], project_infos, name):
+            raise reqs.HTTPError("File %s could not be deleted" % name)
+        state.forget(name)
+
+    try:
+        for paths, rescan in watcher.batches(debounce):
+            # Apply the remote tree events received meanwhile, this also keeps the connection alive
+            project_infos = overleaf_client.get_project_infos(project["id"])
+            if not paths and not rescan:
+                continue
+
+            start = time.perf_counter()
+            local_files = scan_tree(".", olignore) if rescan else {}
+            if rescan:
+                paths = set(local_files) | set(state.names())
+
+            uploads, deletes = [], []
+            for name in sorted(paths):
+                if os.path.isfile(name) and (not rescan or name in local_files):
+                    # Saving without changes (or touching a file) does not need an upload
+                    if not state.local_unchanged(name, local_files.get(name)):
+                        uploads.append(name)
+                elif state.get(name) is not None:
+                    deletes.append(name)
+            if not uploads and not deletes:
+                continue
+
+            click.echo("\n[%s] Pushing %d change(s)" % (time.strftime("%H:%M:%S"), len(uploads) + len(deletes)))
+            try:
+                if uploads:
+                    overleaf_client.create_folders(project["id"], project_infos, uploads)
+                    run_phase(uploads, upload, "An error occurred while uploading file(s)", jobs, verbose)
+                if deletes:
+                    run_phase(deletes, delete, "An error occurred while deleting file(s)", jobs, verbose)
+            except click.ClickException as e:
+                # Keep watching, the files are pushed again with their next change
+                e.show()
+            except:
+                if verbose:
+                    click.echo(traceback.format_exc())
+                click.echo("[ERROR] An error occurred while pushing the changes")
+            finally:
+                state.save()
+            click.echo("Pushed in %.2fs" % (time.perf_counter() - start))
+    except KeyboardInterrupt:
+        click.echo("\nStopped watching.")
+    finally:
+        watcher.close()
+        overleaf_client.close()
+
+
+@main.command(name='sync-all')
+@click.argument('manifest_path', type=click.Path(exists=True))
+@click.option('-l', '--local-only', 'local', is_flag=True, help="Sync local project files to Overleaf only.")
+@click.option('-r', '--remote-only', 'remote', is_flag=True,
+              help="Sync remote project files from Overleaf to local file system only.")
+@click.option('--store-path', 'cookie_path', default=".olauth", type=click.Path(exists=False),
+              help="Relative path to load the persisted Overleaf cookie.")
+@click.option('--base-url', 'base_url', default=None, envvar='OLSYNC_BASE_URL',
+              help="URL of the Overleaf instance, defaults to the one logged in to (or $OLSYNC_BASE_URL).")
+@click.option('-j', '--jobs', 'jobs', default=4, type=click.IntRange(min=1),
+              help="Maximum number of projects synced and of files transferred at the same time, over all projects.")
+@click.option('--on-conflict', 'on_conflict', default=ASK, type=click.Choice(SYNC_POLICIES), show_default=True,
+              help="How to resolve files changed on both sides since the last sync: ask, keep the newer copy, prefer "
+                   "the local or remote copy, or skip them.")
+@click.option('--on-delete', 'on_delete', default=ASK, type=click.Choice(SYNC_POLICIES), show_default=True,
+              help="How to resolve files deleted on one side with -l / -r: ask, delete them unless the remaining "
+                   "copy changed since the last sync (newer-wins), follow the local or remote side, or skip them.")
+@click.option('--timings', 'timings', is_flag=True, help="Print how long each step, sync phase and request took.")
+@click.option('--profile-json', 'profile_path', default=None, type=click.Path(dir_okay=False),
+              help="Write the timings of every step, sync phase, file and request to this JSON file.")
+@click.option('-v', '--verbose', 'verbose', is_flag=True,
+              help="Print the full output of every project and enable extended error logging.")
+def sync_all(manifest_path, local, remote, cookie_path, base_url, jobs, on_conflict, on_delete, timings, profile_path,
+             verbose):
+    """
+    Sync several projects at once. MANIFEST_PATH is a JSON file mapping project names or ids to local
+    paths, relative to the manifest. The dashboard is fetched once and all projects share one client.
+    """
+    manifest = load_manifest(manifest_path)
+    overleaf_client = load_client(cookie_path, base_url, pool_size=max(jobs, POOL_SIZE))
+    project_cache = ProjectCache(cookie_path)
+    start_profiling(overleaf_client, timings, profile_path)
+
+    # Limits the file transfers of all projects together, the projects themselves run on a pool of the same size
+    transfer_slots = threading.BoundedSemaphore(jobs)
+
+    try:
+        summaries = run_projects(overleaf_client, project_cache, manifest, jobs, verbose, lambda path, project:
+                                 sync_project(overleaf_client, project_cache, path, project["name"], project=project,
+                                              local=local, remote=remote, jobs=jobs, verbose=verbose,
+                                              transfer_slots=transfer_slots, on_conflict=on_conflict,
+                                              on_delete=on_delete))
+    finally:
+        overleaf_client.close()
+        finish_profiling(timings, profile_path)
+
+    click.echo("\n" + "=" * 40)
+    failed = 0
+    for key, result, error, elapsed in summaries:
+        if error is not None:
+            failed += 1
+            click.echo("💥  %s: %s (%.1fs)" % (key, error, elapsed))
+        else:
+            click.echo("✅  %s: %d new, %d updated, %d deleted, %d skipped, %d up to date (%.1fs)" % (
+                key, len(result["new"]) + len(result["restored"]), len(result["updated"]), len(result["deleted"]),
+                len(result["skipped"]), len(result["synced"]), elapsed))
+
+    if failed:
+        raise click.ClickException("%d of %d project(s) could not be synced." % (failed, len(summaries)))
+
+
 @main.command(name='list')
 @click.option('--store-path', 'cookie_path', default=".olauth", type=click.Path(exists=False),
               help="Relative path to load the persisted Overleaf cookie.")
+@click.option('--base-url', 'base_url', default=None, envvar='OLSYNC_BASE_URL',
+              help="URL of the Overleaf instance, defaults to the one logged in to (or $OLSYNC_BASE_URL).")
 @click.option('-v', '--verbose', 'verbose', is_flag=True, help="Enable extended error logging.")
-def list_projects(cookie_path, verbose):
+def list_projects(cookie_path, base_url, verbose):
     def query_projects():
-        for index, p in enumerate(sorted(overleaf_client.all_projects(), key=lambda x: x['lastUpdated'], reverse=True)):
+        projects = overleaf_client.all_projects()
+        ProjectCache(cookie_path).update(projects)
+        for index, p in enumerate(sorted(projects, key=lambda x: x['lastUpdated'], reverse=True)):
             if not index:
                 click.echo("\n")
             click.echo(f"{dateutil.parser.isoparse(p['lastUpdated']).strftime('%m/%d/%Y, %H:%M:%S')} - {p['name']}")
         return True
 
-    if not os.path.isfile(cookie_path):
-        raise click.ClickException(
-            "Persisted Overleaf cookie not found. Please login or check store path.")
-
-    with open(cookie_path, 'rb') as f:
-        store = pickle.load(f)
-
-    overleaf_client = OverleafClient(store["cookie"], store["csrf"])
+    overleaf_client = load_client(cookie_path, base_url)
 
     click.clear()
     execute_action(query_projects, "Querying all projects",
@@ -164,30 +342,629 @@ def list_projects(cookie_path, verbose):
 @main.command(name='download')
 @click.option('-n', '--name', 'project_name', default="",
               help="Specify the Overleaf project name instead of the default name of the sync directory.")
+@click.option('--project-id', 'project_id', default="",
+              help="Specify the Overleaf project id, skips looking up the project by name.")
 @click.option('--download-path', 'download_path', default=".", type=click.Path(exists=True))
+@click.option('-o', '--output', 'outputs', multiple=True,
+              help="Also download this output file of the compile, e.g. log, synctex.gz or bbl. Can be repeated.")
 @click.option('--store-path', 'cookie_path', default=".olauth", type=click.Path(exists=False),
               help="Relative path to load the persisted Overleaf cookie.")
+@click.option('--base-url', 'base_url', default=None, envvar='OLSYNC_BASE_URL',
+              help="URL of the Overleaf instance, defaults to the one logged in to (or $OLSYNC_BASE_URL).")
+@click.option('--force', 'force', is_flag=True,
+              help="Compile and download the whole PDF even if the project did not change since the last download.")
 @click.option('-v', '--verbose', 'verbose', is_flag=True, help="Enable extended error logging.")
-def download_pdf(project_name, download_path, cookie_path, verbose):
-    def download_project_pdf():
-        nonlocal project_name
-        project_name = project_name or os.path.basename(os.getcwd())
+def download_pdf(project_name, project_id, download_path, outputs, cookie_path, base_url, force, verbose):
+    overleaf_client = load_client(cookie_path, base_url)
+    project_cache = ProjectCache(cookie_path)
+
+    click.clear()
+
+    try:
+        execute_action(lambda: download_project_outputs(overleaf_client, project_cache, download_path,
+                                                        project_name or os.path.basename(os.getcwd()), project_id,
+                                                        outputs=outputs, force=force, verbose=verbose),
+                       "Downloading project's PDF",
+                       "Downloading project's PDF successful.",
+                       "Downloading project's PDF failed. Please try again.", verbose)
+    finally:
+        overleaf_client.close()
+
+
+@main.command(name='compile-all')
+@click.argument('manifest_path', type=click.Path(exists=True))
+@click.option('-o', '--output', 'outputs', multiple=True,
+              help="Also download this output file of the compile, e.g. log, synctex.gz or bbl. Can be repeated.")
+@click.option('--store-path', 'cookie_path', default=".olauth", type=click.Path(exists=False),
+              help="Relative path to load the persisted Overleaf cookie.")
+@click.option('--base-url', 'base_url', default=None, envvar='OLSYNC_BASE_URL',
+              help="URL of the Overleaf instance, defaults to the one logged in to (or $OLSYNC_BASE_URL).")
+@click.option('-j', '--jobs', 'jobs', default=4, type=click.IntRange(min=1),
+              help="Maximum number of projects compiled at the same time.")
+@click.option('--force', 'force', is_flag=True,
+              help="Compile and download the whole PDFs even if the projects did not change since the last download.")
+@click.option('--timings', 'timings', is_flag=True, help="Print how long each step and request took.")
+@click.option('--profile-json', 'profile_path', default=None, type=click.Path(dir_okay=False),
+              help="Write the timings of every step and request to this JSON file.")
+@click.option('-v', '--verbose', 'verbose', is_flag=True,
+              help="Print the full output of every project and enable extended error logging.")
+def compile_all(manifest_path, outputs, cookie_path, base_url, jobs, force, timings, profile_path, verbose):
+    """
+    Compile several projects at once and download their PDFs. MANIFEST_PATH is the same JSON file as for
+    sync-all; the outputs of every project are downloaded into its path.
+    """
+    manifest = load_manifest(manifest_path)
+    overleaf_client = load_client(cookie_path, base_url, pool_size=max(jobs, POOL_SIZE))
+    project_cache = ProjectCache(cookie_path)
+    start_profiling(overleaf_client, timings, profile_path)
+
+    try:
+        summaries = run_projects(overleaf_client, project_cache, manifest, jobs, verbose, lambda path, project:
+                                 download_project_outputs(overleaf_client, project_cache, path, project=project,
+                                                          outputs=outputs, force=force, verbose=verbose))
+    finally:
+        overleaf_client.close()
+        finish_profiling(timings, profile_path)
+
+    click.echo("\n" + "=" * 40)
+    failed = 0
+    for key, result, error, elapsed in summaries:
+        if error is not None:
+            failed += 1
+            click.echo("💥  %s: %s (%.1fs)" % (key, error, elapsed))
+        elif result["downloaded"] is None:
+            click.echo("✅  %s: %s is up to date (%.1fs)" % (key, result["pdf"], elapsed))
+        else:
+            click.echo("✅  %s: %s, downloaded %.1f KiB (%.1fs)" % (
+                key, ", ".join(result["files"]), result["downloaded"] / 1024, elapsed))
+
+    if failed:
+        raise click.ClickException("%d of %d project(s) could not be compiled." % (failed, len(summaries)))
+
+
+def run_projects(overleaf_client, project_cache, manifest, jobs, verbose, action):
+    """
+    Run an action for every project of a manifest, at most `jobs` projects at the same time.
+    The dashboard is fetched once for all projects. The output of every project is buffered and only printed,
+    as one block, with verbose or if the project failed.
+
+    Params:
+    overleaf_client, project_cache: shared by all projects
+    manifest: list of (project name or id, local path) as returned by load_manifest
+    jobs: the number of projects run concurrently
+    verbose: print the output of every project and extended error logs
+    action: function(path, project) running one project and returning its result
+
+    Returns: list of (project name or id, result, error message or None, seconds), in the order of the manifest
+    """
+    def query_projects():
+        projects = overleaf_client.all_projects()
+        project_cache.update(projects)
+        return projects
+
+    def run(key, path, project):
+        _project_output.lines = []
+        _project_output.title = key
+        if _profiler is not None:
+            _profiler.set_project(key)
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            if project is None:
+                raise click.ClickException("Project not found.")
+            if not os.path.isdir(path):
+                raise click.ClickException("Path %s does not exist." % path)
+            result = action(path, project)
+        except click.ClickException as e:
+            error = e.format_message().strip()
+        except:
+            if verbose:
+                echo(traceback.format_exc())
+            error = "An unexpected error occurred."
+        finally:
+            if verbose or error is not None:
+                flush_output()
+            _project_output.lines = None
+        return key, result, error, time.perf_counter() - start
+
+    projects = execute_action(query_projects, "Querying all projects",
+                              "Querying all projects successful.",
+                              "Querying all projects failed. Please try again.", verbose)
+    by_id = {p['id']: p for p in projects}
+    by_name = {}
+    for p in projects:
+        by_name.setdefault(p['name'], p)
+
+    with ThreadPoolExecutor(max_workers=min(jobs, len(manifest))) as executor:
+        futures = [executor.submit(run, key, path, by_id.get(key) or by_name.get(key)) for key, path in manifest]
+        return [future.result() for future in futures]
+
+
+def download_project_outputs(overleaf_client, project_cache, download_path=".", project_name="", project_id="",
+                             project=None, outputs=(), force=False, verbose=False):
+    """
+    Compile a project and download its PDF and the selected other output files into a folder, all at the same
+    time. Nothing is compiled if the project did not change since the last download, and only the changed parts
+    of the PDF are downloaded.
+
+    Params:
+    overleaf_client: the OverleafClient to use, it is not closed
+    project_cache: the ProjectCache to resolve the project name with
+    download_path: the folder to download to
+    project_name, project_id: the project, see query_project
+    project: the project object if it was already looked up on the dashboard
+    outputs: the types of the other output files to download, e.g. "log", "synctex.gz" or "bbl"
+    force: compile and download the whole PDF even if nothing changed
+    verbose: enable extended error logging
+
+    Returns: dict with the name of the PDF, the downloaded files and bytes (None if everything was up to date)
+    """
+    project_cached = False
+    pdf_state = PdfState(download_path)
+
+    def lookup_project():
+        nonlocal project_cached
+        # Skipping the compile needs an up to date time stamp, bypass the cache once a PDF was downloaded
+        found, project_cached = query_project(overleaf_client, project_cache, project_name, project_id,
+                                              use_cache=not pdf_state.has_pdfs())
+        return found
+
+    if project is None:
         project = execute_action(
-            lambda: overleaf_client.get_project(project_name),
+            lookup_project,
             "Querying project",
             "Project queried successfully.",
             "Project could not be queried.",
             verbose)
 
-        file_name, content = overleaf_client.download_pdf(project["id"])
+    # The previous PDF, unless it was changed or removed since it was downloaded
+    previous = None if force else pdf_state.get(project["id"])
+    last_updated = None if project_cached else project.get("lastUpdated")
+
+    def downloaded_before(output):
+        # Output type (e.g. "log") of a file downloaded with the previous PDF, which is still there
+        return any(path.endswith("." + output.lstrip(".")) and os.path.isfile(os.path.join(download_path, path))
+                   for path in previous["outputs"])
+
+    if previous is not None and last_updated and previous["lastUpdated"] == last_updated and \
+            all(downloaded_before(output) for output in outputs):
+        echo("\nProject did not change since the last download, %s is up to date." % previous["name"])
+        return {"pdf": previous["name"], "files": [], "downloaded": None}
+
+    if project_cached:
+        # A cached project has no current time stamp, fetch it from the dashboard while the project compiles, so
+        # the next download can skip the compile
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            dashboard = executor.submit(overleaf_client.all_projects)
+            compile_result, project = call_with_project(
+                lambda p: overleaf_client.compile_project(p["id"]),
+                overleaf_client, project_cache, project, project_cached)
+            try:
+                last_updated = next((p.get("lastUpdated") for p in dashboard.result() if p["id"] == project["id"]),
+                                    None)
+            except Exception:
+                if verbose:
+                    echo(traceback.format_exc())
+    else:
+        compile_result, project = call_with_project(
+            lambda p: overleaf_client.compile_project(p["id"]),
+            overleaf_client, project_cache, project, project_cached)
+    output_files = olpdf.select_outputs(compile_result, ("pdf",) + tuple(outputs))
+    pdf_file = next((f for f in output_files if f['type'] == 'pdf'), None)
+    if pdf_file is None:
+        raise click.ClickException("The compile did not produce a PDF.")
+
+    kept = []
+    same_build = previous is not None and pdf_file.get("build") and previous["build"] == pdf_file["build"]
+    if same_build:
+        # The PDF and the output files downloaded with it did not change, only download missing outputs
+        echo("\nThe compile did not produce a new PDF, %s is up to date." % previous["name"])
+        kept = [path for path in previous["outputs"] if os.path.isfile(os.path.join(download_path, path))]
+        output_files = [f for f in output_files if f is not pdf_file and f['path'] not in kept]
+
+    results = olpdf.download_outputs(overleaf_client, compile_result, output_files, download_path, previous)
+    for path, (downloaded, _) in sorted(results.items()):
+        size = os.path.getsize(os.path.join(download_path, path))
+        echo("\nDownloaded %.1f of %.1f KiB of %s" % (downloaded / 1024, size / 1024, path))
+
+    ranges = previous["ranges"] if same_build else results[pdf_file['path']][1]
+    pdf_state.record(project["id"], pdf_file['path'], pdf_file.get("build"), last_updated, ranges,
+                     kept + [f['path'] for f in output_files if f is not pdf_file])
+    pdf_state.save()
+
+    return {"pdf": pdf_file['path'], "files": sorted(results),
+            "downloaded": sum(downloaded for downloaded, _ in results.values())}
+
+
+def sync_project(overleaf_client, project_cache, sync_path=".", project_name="", project_id="", project=None,
+                 olignore_path=".olignore", local=False, remote=False, jobs=1, check=False, verbose=False,
+                 transfer_slots=None, on_conflict=ASK, on_delete=ASK):
+    """
+    Sync one project with a local folder. All local paths are relative to sync_path, the current directory
+    is never changed, so several projects can be synced at the same time.
+
+    Params:
+    overleaf_client: the OverleafClient to use, it is not closed
+    project_cache: the ProjectCache to resolve the project name with
+    sync_path: the local folder of the project
+    project_name: the name of the project, defaults to the name of sync_path
+    project_id: the id of the project, skips looking up the project by name
+    project: the project object if it was already looked up on the dashboard
+    olignore_path: path of the .olignore file relative to sync_path
+    local, remote: only sync local files to Overleaf or remote files to the local folder
+    jobs: the number of files to transfer concurrently
+    check: only report whether either side changed since the last sync
+    verbose: enable extended error logging
+    transfer_slots: semaphore shared by all projects limiting the number of concurrent file transfers
+    on_conflict, on_delete: how files changed on both sides and files deleted on one side are resolved, one of
+    SYNC_POLICIES (see sync_func)
+
+    Returns: dict with the lists of new, restored, updated, deleted, up to date and skipped files, or with
+    check the exit code of report_changes
+    """
+    def local_path(name):
+        return os.path.join(sync_path, name)
+
+    project_name = project_name or os.path.basename(os.path.abspath(sync_path))
+    project_cached = False
 
-        if file_name and content:
-            # Change the current directory to the specified sync path
-            os.chdir(download_path)
-            open(file_name, 'wb').write(content)
+    # Manifest of the last successful sync, files unchanged on both sides are skipped with a stat
+    state = SyncState(sync_path)
+    synced_project = state.synced_project()
 
-        return True
+    def lookup_project():
+        nonlocal project_cached
+        # Skipping the remote needs an up to date time stamp, bypass the cache once the project was synced
+        found, project_cached = query_project(overleaf_client, project_cache, project_name, project_id,
+                                              use_cache=synced_project is None)
+        return found
+
+    if project is None:
+        project = execute_action(
+            lookup_project,
+            "Querying project",
+            "Project queried successfully.",
+            "Project could not be queried.",
+            verbose)
+
+    # The dashboard time stamp is unknown for --project-id and may be outdated when the project was cached
+    remote_changed = not (synced_project and project.get("lastUpdated") and not project_cached and
+                          synced_project == {"id": project["id"], "lastUpdated": project["lastUpdated"]})
+
+    olignore = load_olignore(local_path(olignore_path), sync_path)
+
+    if check:
+        local_files, = execute_stages(
+            [("Scanning local files", lambda: scan_tree(sync_path, olignore))],
+            "Scanning local files",
+            "Local files scanned successfully.",
+            "Local files could not be scanned.",
+            verbose)
+        return report_changes(state, local_files, remote_changed, sync_path)
+
+    def download_zip():
+        return zipfile.ZipFile(overleaf_client.download_project(project["id"]))
+
+    if remote_changed and (project_cached or not state.names()):
+        # Only the project id is shared between the following stages, so they run concurrently
+        project_refreshed = threading.Event()  # Set once the zip download confirmed or refreshed the project id
+
+        def download_project_zip():
+            nonlocal project
+            try:
+                archive, project = call_with_project(
+                    lambda p: overleaf_client.download_project(p["id"]),
+                    overleaf_client, project_cache, project, project_cached)
+            finally:
+                project_refreshed.set()
+            return zipfile.ZipFile(archive)
+
+        def query_project_infos():
+            project_id = project["id"]
+            try:
+                project_infos = overleaf_client.get_project_infos(project_id)
+                if project_infos is not None:
+                    return project_infos
+            except:
+                if not project_cached:
+                    raise
+            # A stale cached id is looked up again by the zip download, retry with the new id
+            project_refreshed.wait()
+            if project["id"] == project_id:
+                return None
+            return overleaf_client.get_project_infos(project["id"])
+
+        fetched_infos, fetched_zip, local_files = execute_stages(
+            [("Querying project details", query_project_infos),
+             ("Downloading project", download_project_zip),
+             ("Scanning local files", lambda: scan_tree(sync_path, olignore))],
+            "Querying project details, downloading project and scanning local files",
+            "Project details, project and local files fetched successfully.",
+            "Project could not be fetched.",
+            verbose)
+        project_infos = LazyValue.ready(fetched_infos)
+        remote_files = RemoteSnapshot({}, zip_file=fetched_zip)
+    elif remote_changed:
+        # The file tree tells which files may have changed since the last sync
+        fetched_infos, local_files = execute_stages(
+            [("Querying project details", lambda: overleaf_client.get_project_infos(project["id"])),
+             ("Scanning local files", lambda: scan_tree(sync_path, olignore))],
+            "Querying project details and scanning local files",
+            "Project details and local files fetched successfully.",
+            "Project could not be fetched.",
+            verbose)
+        project_infos = LazyValue.ready(fetched_infos)
+
+        plan = plan_downloads(state, fetched_infos, jobs)
+        if plan is None:
+            fetched_zip, = execute_stages(
+                [("Downloading project", download_zip)],
+                "Downloading project",
+                "Project downloaded successfully.",
+                "Project could not be downloaded.",
+                verbose)
+            remote_files = RemoteSnapshot({}, zip_file=fetched_zip)
+        else:
+            unchanged, changed = plan
+            fetched_files = {}
+            if changed:
+                fetched_files, = execute_stages(
+                    [("Downloading %d file(s)" % len(changed),
+                      lambda: overleaf_client.download_files(project["id"], fetched_infos, changed, jobs,
+                                                             transfer_slots))],
+                    "Downloading changed files",
+                    "Changed files downloaded successfully.",
+                    "Changed files could not be downloaded.",
+                    verbose)
+            remote_files = RemoteSnapshot(unchanged, fetched_files, load_zip=download_zip)
+    else:
+        echo("\nProject did not change on Overleaf since the last sync, skipping the download.")
+        local_files, = execute_stages(
+            [("Scanning local files", lambda: scan_tree(sync_path, olignore))],
+            "Scanning local files",
+            "Local files scanned successfully.",
+            "Local files could not be scanned.",
+            verbose)
+
+        # The remote files are the recorded ones, the project is only joined or downloaded when needed
+        project_infos = LazyValue(lambda: overleaf_client.get_project_infos(project["id"]))
+        remote_files = RemoteSnapshot({name: state.get(name)["remote_version"] for name in state.names()},
+                                      load_zip=download_zip)
+
+    if remote_changed:
+        # Files gone on both sides are not part of the remote snapshot anymore
+        for name in state.names():
+            if name not in remote_files and name not in local_files:
+                state.forget(name)
+
+    # Time of the last change anywhere in the project, trusted to compare files against only if it is current
+    project_timestamp = None
+    if project.get("lastUpdated"):
+        project_timestamp = dateutil.parser.isoparse(project["lastUpdated"]).timestamp()
+    remote_timestamp = project_timestamp if not project_cached else None
+    # Binary files are replaced on every upload, they were last edited when they were created
+    tree_timestamps = LazyValue(lambda: {path: dateutil.parser.isoparse(entity["created"]).timestamp()
+                                         for path, entity_type, entity in
+                                         OverleafClient.project_entities(project_infos.get())
+                                         if entity_type == "file" and entity.get("created")})
+
+    def remote_time(name, local_time):
+        """
+        Params: name, the path of the file; local_time, the last-edit time of the local copy it is compared with
+        Returns: the last-edit time of a remote file, the project's if the file has no time of its own, or None
+        """
+        timestamp = remote_files.timestamps.get(name)
+        # A file cannot change after its project did, later zip times are the time the zip was created. Zip times
+        # are rounded down, they cannot tell which copy is newer if the local one is as old as the rounding.
+        if timestamp is not None and (project_timestamp is None or
+                                      timestamp > project_timestamp + ZIP_TIME_RESOLUTION or
+                                      timestamp <= local_time < timestamp + ZIP_TIME_RESOLUTION):
+            timestamp = None
+        # The file tree is not fetched for this, only used if the sync needed it anyway
+        if timestamp is None and project_infos.loaded and project_infos.get() is not None:
+            timestamp = tree_timestamps.get().get(name)
+        return timestamp if timestamp is not None else remote_timestamp
+
+    def local_unchanged(name):
+        return state.local_unchanged(name, local_files.get(name))
+
+    def remote_unchanged(name):
+        return state.remote_unchanged(name, remote_files.versions[name])
+
+    def conflicting(name):
+        # Both copies changed since the last sync, or the file was never synced
+        return not local_unchanged(name) and not remote_unchanged(name)
+
+    def remote_newer(name):
+        # The manifest tells which side changed since the last sync
+        if local_unchanged(name):
+            return True
+        if remote_unchanged(name):
+            return False
+        # Without a trustworthy remote time stamp ask before overwriting
+        local_time = os.path.getmtime(local_path(name))
+        timestamp = remote_time(name, local_time)
+        return timestamp is not None and timestamp > local_time
+
+    def local_newer(name):
+        if remote_unchanged(name):
+            return True
+        if local_unchanged(name):
+            return False
+        local_time = os.path.getmtime(local_path(name))
+        timestamp = remote_time(name, local_time)
+        return timestamp is not None and local_time > timestamp
+
+    def files_equal(name):
+        remote_version = remote_files.versions[name]
+        if state.unchanged(name, remote_version, local_files.get(name)):
+            return True
+        if remote_files.available(name) or not state.remote_unchanged(name, remote_version):
+            equal = remote_files.equals(local_path(name), name)
+        else:
+            # The remote copy is still the recorded one, compare the hashes instead of downloading it
+            equal = hash_file(local_path(name))[0] == state.get(name)["hash"]
+        if equal:
+            state.record(name, remote_version)
+        return equal
+
+    def write_remote_file(name):
+        with remote_files.open(name) as member:
+            write_file(local_path(name), member)
+        state.record(name, remote_files.versions[name])
+
+    def create_remote_folders(names):
+        overleaf_client.create_folders(project["id"], project_infos.get(), names)
+
+    def upload_local_file(name):
+        with open(local_path(name), 'rb') as f:
+            if not overleaf_client.upload_file(project["id"], project_infos.get(), name, os.fstat(f.fileno()).st_size,
+                                               f):
+                raise reqs.HTTPError("File %s could not be uploaded" % name)
+        state.record(name)
+
+    def delete_local_file(name):
+        delete_file(local_path(name))
+        state.forget(name)
+
+    # Folders about to be deleted with one request -> the files inside them
+    remote_folder_deletes = {}
+
+    def group_remote_deletes(names):
+        folders, files = overleaf_client.group_deletes(project["id"], project_infos.get(), names)
+        remote_folder_deletes.update(folders)
+        return [folder + PATH_SEP for folder in sorted(folders)] + files
+
+    def delete_remote_file(name):
+        if name.endswith(PATH_SEP):
+            if not overleaf_client.delete_folder(project["id"], project_infos.get(), name[:-len(PATH_SEP)]):
+                raise reqs.HTTPError("Folder %s could not be deleted" % name)
+            for file_name in remote_folder_deletes[name[:-len(PATH_SEP)]]:
+                state.forget(file_name)
+            return
+        if not overleaf_client.delete_file(project["id"], project_infos.get(), name):
+            raise reqs.HTTPError("File %s could not be deleted" % name)
+        state.forget(name)
+
+    sync = not (local or remote)
+    results = []
+    complete = False
+
+    try:
+        if remote or sync:
+            results.append(sync_func(
+                files_from=list(remote_files),
+                deleted_files=[f for f in local_files if f not in remote_files and not sync],
+                create_file_at_to=write_remote_file,
+                delete_file_at_to=delete_local_file,
+                create_file_at_from=upload_local_file,
+                prepare_create_at_from=create_remote_folders,
+                from_exists_in_to=lambda name: os.path.isfile(local_path(name)),
+                from_equal_to_to=files_equal,
+                from_newer_than_to=remote_newer,
+                from_conflicts_with_to=conflicting,
+                to_unchanged=local_unchanged,
+                from_name="remote",
+                to_name="local",
+                on_conflict=on_conflict,
+                on_delete=on_delete,
+                jobs=jobs,
+                verbose=verbose,
+                transfer_slots=transfer_slots))
+        if local or sync:
+            results.append(sync_func(
+                files_from=list(local_files),
+                deleted_files=[f for f in remote_files if f not in local_files and not sync],
+                create_file_at_to=upload_local_file,
+                prepare_create_at_to=create_remote_folders,
+                delete_file_at_to=delete_remote_file,
+                group_delete_at_to=group_remote_deletes,
+                create_file_at_from=write_remote_file,
+                from_exists_in_to=lambda name: name in remote_files,
+                from_equal_to_to=files_equal,
+                from_newer_than_to=local_newer,
+                from_conflicts_with_to=conflicting,
+                to_unchanged=remote_unchanged,
+                from_name="local",
+                to_name="remote",
+                on_conflict=on_conflict,
+                on_delete=on_delete,
+                jobs=jobs,
+                verbose=verbose,
+                transfer_slots=transfer_slots))
+        # A conflict kept in one direction is resolved if the other direction updated the file
+        updated = {name for result in results for name in result["updated"]}
+        for result in results:
+            result["skipped"] = [name for name in result["skipped"] if name not in updated]
+        complete = not any(result["skipped"] for result in results)
+    finally:
+        # Every recorded file is identical on both sides, even if the sync stopped half-way
+        if project_infos.loaded:
+            state.update_remote_ids({path: entity['_id'] for path, entity_type, entity in
+                                     OverleafClient.project_entities(project_infos.get())
+                                     if entity_type != "folder"})
+        # Our own uploads change the time stamp as well, the next sync then compares the files once more
+        if complete and project.get("lastUpdated") and not project_cached:
+            state.record_project(project["id"], project["lastUpdated"])
+        else:
+            state.forget_project()
+        state.save()
+        remote_files.close()
+
+    # A file up to date in both directions is counted once
+    return {key: list(dict.fromkeys(name for result in results for name in result[key])) for key in SYNC_RESULT_KEYS}
+
+
+def query_project(overleaf_client, project_cache, project_name, project_id=None, use_cache=True):
+    """
+    Find a project by id or name. Names are resolved through the on-disk project cache first,
+    the dashboard is only fetched (and the cache refreshed) if the name is not cached.
+    Returns: tuple of project object (None if not found) and whether it was taken from the cache
+    """
+    if project_id:
+        return {"id": project_id, "name": project_name, "lastUpdated": None}, False
+
+    if use_cache:
+        project = project_cache.get(project_name)
+        if project is not None:
+            return project, True
+
+    projects = overleaf_client.all_projects()
+    project_cache.update(projects)
+    return next((p for p in projects if p.get('name') == project_name), None), False
 
+
+def call_with_project(action, overleaf_client, project_cache, project, project_cached, any_error=False):
+    """
+    Run action(project). If the project was taken from the cache and its id returns 404, the id is stale
+    (e.g. the project was deleted and recreated): the cache entry is dropped, the project is looked up
+    on the dashboard again and the action is retried once.
+    With any_error every error of the action may mean a stale id (joining an unknown project fails without a
+    status code), the action is only retried if the dashboard has another id for the project.
+    Returns: tuple of the action's result and the project it was run with
+    """
+    try:
+        return action(project), project
+    except Exception as e:
+        if not project_cached:
+            raise
+        if not any_error and (not isinstance(e, reqs.HTTPError) or e.response is None or
+                              e.response.status_code != 404):
+            raise
+        project_cache.invalidate(project["name"])
+        found, _ = query_project(overleaf_client, project_cache, project["name"], use_cache=False)
+        if found is None or found["id"] == project["id"]:
+            raise
+        return action(found), found
+
+
+def load_client(cookie_path, base_url=None, **kwargs):
+    """
+    Create an OverleafClient with the persisted cookie
+    Params: cookie_path, the path of the cookie file; base_url, the URL of the Overleaf instance, defaults to the
+    one the cookie was created for; kwargs, passed on to OverleafClient
+    Returns: OverleafClient
+    """
     if not os.path.isfile(cookie_path):
         raise click.ClickException(
             "Persisted Overleaf cookie not found. Please login or check store path.")
@@ -195,17 +972,69 @@ def download_pdf(project_name, download_path, cookie_path, verbose):
     with open(cookie_path, 'rb') as f:
         store = pickle.load(f)
 
-    overleaf_client = OverleafClient(store["cookie"], store["csrf"])
+    # Cookie files created before the URL was stored belong to the default instance
+    base_url = base_url or store.get("base_url") or SITE_URL
+    return OverleafClient(store["cookie"], store["csrf"], base_url=base_url, **kwargs)
 
-    click.clear()
 
-    execute_action(download_project_pdf, "Downloading project's PDF",
-                   "Downloading project's PDF successful.",
-                   "Downloading project's PDF failed. Please try again.", verbose)
+def load_manifest(manifest_path):
+    """
+    Load the projects of sync-all
+    Params: manifest_path, path of a JSON file with an object mapping project names or ids to local paths
+    Returns: list of (project name or id, path), the paths made relative to the manifest's folder
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except ValueError as e:
+        raise click.ClickException("Manifest %s is not valid JSON: %s" % (manifest_path, e))
+    if not isinstance(manifest, dict) or not manifest or \
+            not all(isinstance(path, str) for path in manifest.values()):
+        raise click.ClickException("Manifest %s has to map project names or ids to paths." % manifest_path)
+
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    return [(key, os.path.join(base, os.path.expanduser(path))) for key, path in manifest.items()]
 
 
-def login_handler(path, keep_browser=False):
-    store = olbrowserlogin.login(keep_open=keep_browser)
+def start_profiling(overleaf_client, timings=False, profile_path=None):
+    """
+    Collect the timings of the steps, sync phases and requests of this run if they are reported at its end
+    Params: overleaf_client, the client whose requests are timed; timings, profile_path: the --timings and
+    --profile-json options
+    """
+    global _profiler
+    if timings or profile_path:
+        _profiler = Profiler()
+        overleaf_client.add_request_listener(_profiler.on_request)
+
+
+def finish_profiling(timings=False, profile_path=None):
+    """
+    Print and / or write the timings collected since start_profiling
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return
+    if timings:
+        click.echo("\n" + "\n".join(profiler.summary()))
+    if profile_path:
+        profiler.write(profile_path)
+        click.echo("Timings written to %s" % click.format_filename(profile_path))
+
+
+def login_handler(path, keep_browser=False, base_url=SITE_URL):
+    # The login window needs PySide6 and QtWebEngine, which every other command does without
+    try:
+        # Import for pip installation / wheel
+        import olsync.olbrowserlogin as olbrowserlogin
+    except ImportError as e:
+        if (e.name or "").startswith("PySide6"):
+            raise click.ClickException("Logging in needs PySide6, install it with: pip install PySide6 (%s)" % e)
+        # Import for development
+        import olbrowserlogin
+
+    store = olbrowserlogin.login(keep_open=keep_browser, base_url=base_url)
     if store is None:
         return False
     with open(path, 'wb+') as f:
@@ -225,23 +1054,213 @@ def delete_file(path):
 
 
 def write_file(path, content):
+    """
+    Write bytes or the content of a file object (copied in chunks) to path, creating parent folders
+    """
     _dir = os.path.dirname(path)
     if _dir == path:
         return
 
     # path is a file
-    if _dir != '' and not os.path.exists(_dir):
-        os.makedirs(_dir)
+    if _dir != '':
+        os.makedirs(_dir, exist_ok=True)
 
     with open(path, 'wb+') as f:
-        f.write(content)
+        if hasattr(content, 'read'):
+            shutil.copyfileobj(content, f, CHUNK_SIZE)
+        else:
+            f.write(content)
+
+
+def report_changes(state, local_files, remote_changed, sync_path="."):
+    """
+    Print which side changed since the last sync, without downloading anything
+    Params: state, the SyncState of the sync path; local_files, dict of path -> os.stat_result of the local files;
+    remote_changed, whether the project changed on Overleaf; sync_path, the local folder of the project
+    Returns: exit code, 0 if both sides are unchanged and CHECK_DIRTY_EXIT_CODE otherwise
+    """
+    changes = []
+    for name, stat in local_files.items():
+        entry = state.get(name)
+        if entry is None:
+            changes.append((name, "new"))
+        elif not state.local_unchanged(name, stat) and hash_file(os.path.join(sync_path, name))[0] != entry["hash"]:
+            changes.append((name, "modified"))
+    for name in state.names():
+        if name not in local_files and not os.path.isfile(os.path.join(sync_path, name)):
+            changes.append((name, "deleted"))
+
+    if changes:
+        echo("\n[LOCAL] %d file(s) changed since the last sync" % len(changes))
+        for name, change in sorted(changes):
+            echo("\t%s (%s)" % (name, change))
+    else:
+        echo("\n[LOCAL] No changes since the last sync")
+    if remote_changed:
+        echo("[REMOTE] Changed since the last sync")
+    else:
+        echo("[REMOTE] No changes since the last sync")
+
+    return CHECK_DIRTY_EXIT_CODE if changes or remote_changed else 0
+
+
+class LazyValue(object):
+    """
+    Value which is only computed on first use, once, even if several worker threads need it at the same time
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    @classmethod
+    def ready(cls, value):
+        """
+        Wrap an already computed value
+        """
+        lazy = cls(None)
+        lazy._value = value
+        lazy.loaded = True
+        return lazy
+
+    def get(self):
+        with self._lock:
+            if not self.loaded:
+                self._value = self._factory()
+                self.loaded = True
+            return self._value
+
+
+class _PlainProgress(object):
+    """
+    Stand-in for the yaspin spinner while the output is buffered, spinners of concurrent projects would garble
+    the terminal
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def write(self, message):
+        echo(message)
+
+    def ok(self, symbol):
+        echo("%s %s" % (symbol, self.text))
+
+    def fail(self, symbol):
+        echo("%s %s" % (symbol, self.text))
+
+
+def progress(text):
+    """
+    Returns: spinner context manager showing text, plain output if the current thread's output is buffered
+    """
+    if getattr(_project_output, "lines", None) is None:
+        return yaspin(text=text, color="green")
+    return _PlainProgress(text)
+
+
+def echo(message=""):
+    """
+    Print a message, or buffer it if the current thread syncs one of several projects
+    """
+    lines = getattr(_project_output, "lines", None)
+    if lines is None:
+        click.echo(message)
+    else:
+        lines.append(str(message))
+
+
+def flush_output():
+    """
+    Print the buffered output of the current thread's project as one block
+    """
+    lines = getattr(_project_output, "lines", None)
+    if lines:
+        with _output_lock:
+            click.echo("\n".join(["", "[%s]" % _project_output.title] + lines))
+        del lines[:]
+
+
+def confirm(message):
+    # The question needs the output leading to it, and only one project may ask at a time
+    with _output_lock:
+        flush_output()
+        return click.confirm(message)
+
+
+def prompt(message, **kwargs):
+    with _output_lock:
+        flush_output()
+        return click.prompt(message, **kwargs)
+
+
+def report_memory_usage():
+    """
+    Print the peak memory usage of the process (not available on Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else
+    peak_mib = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    click.echo("Peak memory usage: %.1f MiB" % peak_mib)
 
 
 def sync_func(files_from, deleted_files, create_file_at_to, delete_file_at_to, create_file_at_from, from_exists_in_to,
               from_equal_to_to, from_newer_than_to, from_name,
-              to_name, verbose=False):
-    click.echo("\nSyncing files from [%s] to [%s]" % (from_name, to_name))
-    click.echo('=' * 40)
+              to_name, prepare_create_at_to=None, prepare_create_at_from=None, group_delete_at_to=None, jobs=1,
+              verbose=False, transfer_slots=None, from_conflicts_with_to=None, to_unchanged=None, on_conflict=ASK,
+              on_delete=ASK):
+    """
+    Sync the files of one side (from) to the other (to). Conflicts and deleted files are resolved by the policies,
+    one of SYNC_POLICIES, instead of asking:
+    on_conflict: a file which differs on both sides and changed on both since the last sync (or was never synced)
+    is overwritten if from is newer (newer-wins, ask asks otherwise), if from is the winning side (local-wins,
+    remote-wins), or kept (skip). A file which only changed on one side always replaces the other copy.
+    on_delete: a file which only exists at to anymore is deleted if the side it was deleted on wins, restored if
+    the side it still exists on wins, or ignored (skip). With newer-wins it is deleted if its copy at to did not
+    change since the last sync, otherwise the edit is kept and the file ignored.
+
+    from_conflicts_with_to, to_unchanged: functions telling whether both copies of a file, or the copy at to,
+    changed since the last sync; all files are taken as conflicting and changed if omitted
+    """
+    echo("\nSyncing files from [%s] to [%s]" % (from_name, to_name))
+    echo('=' * 40)
+
+    def overwrite(name):
+        if on_conflict in (from_name + "-wins", to_name + "-wins", "skip") and \
+                (from_conflicts_with_to is None or from_conflicts_with_to(name)):
+            return on_conflict == from_name + "-wins"
+        if from_newer_than_to(name):
+            return True
+        return on_conflict == ASK and confirm(
+            '\n-> Warning: last-edit time stamp of file <%s> from [%s] is older than [%s].\nContinue to '
+            'overwrite with an older version?' % (name, from_name, to_name))
+
+    def delete_choice(name):
+        if on_delete == ASK:
+            return prompt(
+                '\n-> Warning: file <%s> does not exist on [%s] anymore (but it still exists on [%s]).'
+                '\nShould the file be [d]eleted, [r]estored or [i]gnored?' % (name, from_name, to_name),
+                default="i",
+                type=click.Choice(['d', 'r', 'i']))
+        if on_delete == from_name + "-wins":
+            return "d"
+        if on_delete == to_name + "-wins":
+            return "r"
+        if on_delete == "newer-wins" and to_unchanged is not None and to_unchanged(name):
+            return "d"
+        return "i"
 
     newly_add_list = []
     update_list = []
@@ -254,9 +1273,7 @@ def sync_func(files_from, deleted_files, create_file_at_to, delete_file_at_to, c
     for name in files_from:
         if from_exists_in_to(name):
             if not from_equal_to_to(name):
-                if not from_newer_than_to(name) and not click.confirm(
-                        '\n-> Warning: last-edit time stamp of file <%s> from [%s] is older than [%s].\nContinue to '
-                        'overwrite with an older version?' % (name, from_name, to_name)):
+                if not overwrite(name):
                     not_sync_list.append(name)
                     continue
 
@@ -267,90 +1284,198 @@ def sync_func(files_from, deleted_files, create_file_at_to, delete_file_at_to, c
             newly_add_list.append(name)
 
     for name in deleted_files:
-        delete_choice = click.prompt(
-            '\n-> Warning: file <%s> does not exist on [%s] anymore (but it still exists on [%s]).'
-            '\nShould the file be [d]eleted, [r]estored or [i]gnored?' % (name, from_name, to_name),
-            default="i",
-            type=click.Choice(['d', 'r', 'i']))
-        if delete_choice == "d":
+        choice = delete_choice(name)
+        if choice == "d":
             delete_list.append(name)
-        elif delete_choice == "r":
+        elif choice == "r":
             restore_list.append(name)
-        elif delete_choice == "i":
+        elif choice == "i":
             not_restored_list.append(name)
 
-    click.echo(
+    # Let the targets prepare a batch before files are created one by one (e.g. create remote folders)
+    try:
+        if prepare_create_at_to and (newly_add_list or update_list):
+            prepare_create_at_to(newly_add_list + update_list)
+        if prepare_create_at_from and restore_list:
+            prepare_create_at_from(restore_list)
+    except:
+        if verbose:
+            echo(traceback.format_exc())
+        raise click.ClickException("\n[ERROR] An error occurred while preparing to create file(s)")
+
+    echo(
         "\n[NEW] Following new file(s) created on [%s]" % to_name)
-    for name in newly_add_list:
-        click.echo("\t%s" % name)
-        try:
-            create_file_at_to(name)
-        except:
-            if verbose:
-                print(traceback.format_exc())
-            raise click.ClickException("\n[ERROR] An error occurred while creating new file(s) on [%s]" % to_name)
+    run_phase(newly_add_list, create_file_at_to,
+              "An error occurred while creating new file(s) on [%s]" % to_name, jobs, verbose, transfer_slots,
+              "Create new file(s) on [%s]" % to_name)
 
-    click.echo(
+    echo(
         "\n[NEW] Following new file(s) created on [%s]" % from_name)
-    for name in restore_list:
-        click.echo("\t%s" % name)
-        try:
-            create_file_at_from(name)
-        except:
-            if verbose:
-                print(traceback.format_exc())
-            raise click.ClickException("\n[ERROR] An error occurred while creating new file(s) on [%s]" % from_name)
+    run_phase(restore_list, create_file_at_from,
+              "An error occurred while creating new file(s) on [%s]" % from_name, jobs, verbose, transfer_slots,
+              "Restore file(s) on [%s]" % from_name)
 
-    click.echo(
+    echo(
         "\n[UPDATE] Following file(s) updated on [%s]" % to_name)
-    for name in update_list:
-        click.echo("\t%s" % name)
+    run_phase(update_list, create_file_at_to,
+              "An error occurred while updating file(s) on [%s]" % to_name, jobs, verbose, transfer_slots,
+              "Update file(s) on [%s]" % to_name)
+
+    # The target may delete whole folders at once, delete_file_at_to is then called with them as well
+    deletes = delete_list
+    if group_delete_at_to and delete_list:
         try:
-            create_file_at_to(name)
+            deletes = group_delete_at_to(delete_list)
         except:
             if verbose:
-                print(traceback.format_exc())
-            raise click.ClickException("\n[ERROR] An error occurred while updating file(s) on [%s]" % to_name)
+                echo(traceback.format_exc())
+            raise click.ClickException("\n[ERROR] An error occurred while preparing to delete file(s)")
 
-    click.echo(
+    echo(
         "\n[DELETE] Following file(s) deleted on [%s]" % to_name)
-    for name in delete_list:
-        click.echo("\t%s" % name)
-        try:
-            delete_file_at_to(name)
-        except:
-            if verbose:
-                print(traceback.format_exc())
-            raise click.ClickException("\n[ERROR] An error occurred while creating new file(s) on [%s]" % to_name)
+    run_phase(deletes, delete_file_at_to,
+              "An error occurred while deleting file(s) on [%s]" % to_name, jobs, verbose, transfer_slots,
+              "Delete file(s) on [%s]" % to_name)
 
-    click.echo(
+    echo(
         "\n[SYNC] Following file(s) are up to date")
     for name in synced_list:
-        click.echo("\t%s" % name)
+        echo("\t%s" % name)
 
-    click.echo(
+    echo(
         "\n[SKIP] Following file(s) on [%s] have not been synced to [%s]" % (from_name, to_name))
     for name in not_sync_list:
-        click.echo("\t%s" % name)
+        echo("\t%s" % name)
 
-    click.echo(
+    echo(
         "\n[SKIP] Following file(s) on [%s] have not been synced to [%s]" % (to_name, from_name))
     for name in not_restored_list:
-        click.echo("\t%s" % name)
+        echo("\t%s" % name)
+
+    echo("")
+    echo("✅  Synced files from [%s] to [%s]" % (from_name, to_name))
+    echo("")
 
-    click.echo("")
-    click.echo("✅  Synced files from [%s] to [%s]" % (from_name, to_name))
-    click.echo("")
+    # Skipped files differ on both sides, the sync is only complete without them
+    return {"new": newly_add_list, "restored": restore_list, "updated": update_list, "deleted": delete_list,
+            "synced": synced_list, "skipped": not_sync_list + not_restored_list}
+
+
+def run_phase(names, action, error_message, jobs=1, verbose=False, transfer_slots=None, phase=None):
+    """
+    Run action for every name, on a pool of at most `jobs` worker threads.
+    A failing file does not stop the others; all failures are reported once the phase is done.
+    If given, transfer_slots (a semaphore shared by several phases) limits the number of actions running at once.
+    With --timings / --profile-json the phase is recorded as `phase` (defaults to error_message), with every file.
+    """
+    failures = []
+    timings = []
+
+    def timed(name):
+        start = time.perf_counter()
+        try:
+            action(name)
+        finally:
+            timings.append((name, time.perf_counter() - start))
+
+    def run(name):
+        try:
+            if transfer_slots is None:
+                timed(name)
+            else:
+                with transfer_slots:
+                    timed(name)
+        except:
+            return traceback.format_exc()
+
+    start = time.perf_counter()
+    if jobs <= 1:
+        results = ((name, run(name)) for name in names)
+    else:
+        executor = ThreadPoolExecutor(max_workers=jobs)
+        futures = {executor.submit(run, name): name for name in names}
+        results = ((futures[future], future.result()) for future in as_completed(futures))
+
+    try:
+        for name, error in results:
+            if error is None:
+                echo("\t%s" % name)
+            else:
+                echo("\t%s (failed)" % name)
+                failures.append((name, error))
+    finally:
+        if jobs > 1:
+            executor.shutdown()
+        if _profiler is not None and names:
+            failed = set(name for name, _ in failures)
+            _profiler.record_phase(phase or error_message, time.perf_counter() - start,
+                                   [(name, elapsed, name not in failed) for name, elapsed in timings])
+
+    if failures:
+        if verbose:
+            for name, error in failures:
+                echo(error)
+        raise click.ClickException("\n[ERROR] %s: %s" % (error_message, ", ".join(name for name, _ in failures)))
+
+
+def execute_stages(stages, progress_message, success_message, fail_message, verbose_error_logging=False):
+    """
+    Run independent stages concurrently under one spinner and report how long each of them took;
+    the slowest stage is the critical path of the whole step.
+    Params: stages, list of (name, action) tuples; the other parameters as in execute_action
+    Returns: list of the results of all actions, in the order of stages
+    """
+    def timed(action):
+        start = time.perf_counter()
+        result = action()
+        return result, time.perf_counter() - start
+
+    with progress(progress_message) as spinner:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+            futures = [executor.submit(timed, action) for _, action in stages]
+            results, timings, failed = [], [], []
+            for (name, _), future in zip(stages, futures):
+                try:
+                    result, elapsed = future.result()
+                except:
+                    if verbose_error_logging:
+                        echo(traceback.format_exc())
+                    result, elapsed = None, None
+                # An empty result (e.g. an empty file list) is valid, None is not
+                if result is None:
+                    failed.append(name)
+                results.append(result)
+                timings.append((name, elapsed))
+        total = time.perf_counter() - start
+        if _profiler is not None:
+            _profiler.record_step(progress_message, total, not failed, timings)
+
+        if failed:
+            spinner.fail("💥 ")
+            raise click.ClickException("%s (%s)" % (fail_message, ", ".join(failed)))
+
+        spinner.write(success_message)
+        critical_path = max(timings, key=lambda timing: timing[1])[0]
+        for name, elapsed in timings:
+            spinner.write("  %-30s %6.2fs%s" % (name, elapsed, " (critical path)" if name == critical_path else ""))
+        spinner.write("  %-30s %6.2fs" % ("Total", total))
+        spinner.ok("✅ ")
+
+        return results
 
 
 def execute_action(action, progress_message, success_message, fail_message, verbose_error_logging=False):
-    with yaspin(text=progress_message, color="green") as spinner:
+    with progress(progress_message) as spinner:
+        start = time.perf_counter()
         try:
             success = action()
         except:
             if verbose_error_logging:
-                print(traceback.format_exc())
+                echo(traceback.format_exc())
             success = False
+        if _profiler is not None:
+            _profiler.record_step(progress_message, time.perf_counter() - start, bool(success))
 
         if success:
             spinner.write(success_message)
@@ -362,28 +1487,25 @@ def execute_action(action, progress_message, success_message, fail_message, verb
         return success
 
 
-def olignore_keep_list(olignore_path):
+def load_olignore(olignore_path, sync_path="."):
     """
-    The list of files to keep synced, with support for sub-folders.
-    Should only be called when syncing from local to remote.
+    Load the .olignore rules, announcing whether a .olignore file is used. The PDFs and other compile outputs
+    `ols download` and `ols compile-all` wrote into sync_path are never synced, they are ignored as well.
+    Returns: OlIgnore or None if every file should be synced
     """
-    # get list of files recursively (ignore .* files)
-    files = glob.glob('**', recursive=True)
-
-    click.echo("="*40)
-    if not os.path.isfile(olignore_path):
-        click.echo("\nNotice: .olignore file does not exist, will sync all items.")
-        keep_list = files
+    echo("="*40)
+    olignore = OlIgnore.from_file(olignore_path)
+    if olignore is None:
+        echo("\nNotice: .olignore file does not exist, will sync all items.")
     else:
-        click.echo("\n.olignore: using %s to filter items" % olignore_path)
-        with open(olignore_path, 'r') as f:
-            ignore_pattern = f.read().splitlines()
-
-        keep_list = [f for f in files if not any(
-            fnmatch.fnmatch(f, ignore) for ignore in ignore_pattern)]
-
-    keep_list = [Path(item).as_posix() for item in keep_list if not os.path.isdir(item)]
-    return keep_list
+        echo("\n.olignore: using %s to filter items" % olignore_path)
+
+    outputs = PdfState(sync_path).files()
+    if outputs:
+        echo("Skipping downloaded compile output(s): %s" % ", ".join(outputs))
+        olignore = olignore or OlIgnore([])
+        olignore.exclude(outputs)
+    return olignore
 
 
 if __name__ == "__main__":
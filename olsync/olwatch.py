@@ -0,0 +1,234 @@
+"""Overleaf Sync File Watcher"""
+##################################################
+# MIT License
+##################################################
+# File: olwatch.py
+# Description: Watches the sync path for changes (inotify with polling fallback)
+# Author: Moritz Glöckl
+# License: MIT
+# Version: 1.2.0
+##################################################
+
+import abc
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+try:
+    # Import for pip installation / wheel
+    from olsync.olignore import scan_tree, PATH_SEP
+except ImportError:
+    # Import for development
+    from olignore import scan_tree, PATH_SEP
+
+DEBOUNCE = 0.2  # Seconds without further changes after which a batch of changes is pushed
+MAX_DELAY = 2.0  # Seconds after which a batch is pushed even if files keep changing
+IDLE_TIMEOUT = 20.0  # Seconds after which an empty batch is yielded, e.g. to keep connections alive
+POLL_INTERVAL = 0.5  # Seconds between two scans of the polling watcher
+
+# inotify event masks, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _hidden(path):
+    return any(part.startswith(".") for part in path.split(PATH_SEP))
+
+
+class Watcher(abc.ABC):
+    """
+    Base class of the file watchers
+    Subclasses implement wait(timeout), returning the changed paths or RESCAN.
+    """
+    RESCAN = None  # Returned when the changes are not known per file, e.g. after a folder was moved
+
+    def __init__(self, root=".", olignore=None):
+        self.root = root
+        self.olignore = olignore
+
+    def keep(self, path, is_dir=False):
+        """
+        Returns: True if changes of the path should be synced
+        """
+        return not _hidden(path) and (self.olignore is None or not self.olignore.ignores(path, is_dir))
+
+    @abc.abstractmethod
+    def wait(self, timeout):
+        """
+        Block until files changed or timeout seconds passed
+        Returns: set of the changed paths (empty after the timeout) or RESCAN
+        """
+
+    def batches(self, debounce=DEBOUNCE, max_delay=MAX_DELAY, idle_timeout=IDLE_TIMEOUT):
+        """
+        Merge bursts of changes (e.g. several saves of an editor) into debounced batches
+        Blocks without using the CPU until the first change arrives.
+        Returns: generator of (set of changed paths, whether a full rescan is needed); an empty
+        batch is yielded after idle_timeout seconds without changes
+        """
+        while True:
+            changes = self.wait(idle_timeout)
+            if changes is not self.RESCAN and not changes:
+                yield set(), False
+                continue
+
+            paths, rescan = set(), False
+            deadline = time.monotonic() + max_delay
+            while True:
+                if changes is self.RESCAN:
+                    rescan = True
+                else:
+                    paths.update(changes)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                changes = self.wait(min(debounce, remaining))
+                if changes is not self.RESCAN and not changes:
+                    break
+            yield paths, rescan
+
+    def close(self):
+        pass
+
+
+class PollingWatcher(Watcher):
+    """
+    Portable watcher comparing the size and mtime of all files every POLL_INTERVAL seconds
+    """
+
+    def __init__(self, root=".", olignore=None, interval=POLL_INTERVAL):
+        super(PollingWatcher, self).__init__(root, olignore)
+        self._interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        return {path: (stat.st_size, stat.st_mtime_ns) for path, stat in scan_tree(self.root, self.olignore).items()}
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changes = {path for path in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                return changes
+            time.sleep(min(self._interval, remaining))
+
+
+class InotifyWatcher(Watcher):
+    """
+    Linux watcher using inotify, idle until the kernel reports a change
+    Every folder of the sync path which is not ignored gets a watch.
+    """
+
+    def __init__(self, root=".", olignore=None):
+        super(InotifyWatcher, self).__init__(root, olignore)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._folders = {}  # Watch descriptor -> folder path relative to root ('' is the root)
+        self._add_watches("")
+
+    @staticmethod
+    def available():
+        """
+        Returns: True if inotify can be used on this system
+        """
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+            return hasattr(libc, "inotify_init1")
+        except OSError:
+            return False
+
+    def _add_watches(self, folder):
+        pending = [folder]
+        while pending:
+            folder = pending.pop()
+            path = os.path.join(self.root, folder) if folder else self.root
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                continue  # Removed in the meantime
+            self._folders[wd] = folder
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        sub_folder = folder + PATH_SEP + entry.name if folder else entry.name
+                        if entry.is_dir(follow_symlinks=False) and self.keep(sub_folder, True):
+                            pending.append(sub_folder)
+            except OSError:
+                continue
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        data = os.read(self._fd, 64 * 1024)
+        changes, rescan = set(), False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            if mask & IN_IGNORED:
+                self._folders.pop(wd, None)
+                continue
+            folder = self._folders.get(wd)
+            if folder is None or not name:
+                continue
+            name = os.fsdecode(name)
+            path = folder + PATH_SEP + name if folder else name
+
+            if mask & IN_ISDIR:
+                if not self.keep(path, True):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_watches(path)
+                # The files inside a created, moved or deleted folder are not reported one by one
+                rescan = True
+            elif self.keep(path):
+                changes.add(path)
+
+        return self.RESCAN if rescan else changes
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(root=".", olignore=None, polling=False):
+    """
+    Create the best watcher available on this system
+    Params: root, the folder to watch; olignore, OlIgnore rules to apply; polling, force the polling watcher
+    Returns: Watcher
+    """
+    if not polling and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(root, olignore)
+        except OSError:
+            pass
+    return PollingWatcher(root, olignore)
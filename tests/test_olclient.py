@@ -0,0 +1,74 @@
+"""Tests of the project file tree index"""
+##################################################
+# MIT License
+##################################################
+# File: test_olclient.py
+# Description: Grouping of deletes into folder deletes by ProjectIndex
+# License: MIT
+##################################################
+
+import itertools
+
+from olsync.olclient import ProjectIndex
+
+_ids = itertools.count()
+
+
+def _folder(name, docs=(), files=(), folders=()):
+    return {"_id": "folder%d" % next(_ids), "name": name,
+            "docs": [{"_id": "doc%d" % next(_ids), "name": doc} for doc in docs],
+            "fileRefs": [{"_id": "file%d" % next(_ids), "name": file} for file in files],
+            "folders": list(folders)}
+
+
+def _index():
+    return ProjectIndex({"rootFolder": [_folder("rootFolder", docs=["main.tex"], folders=[
+        _folder("chapters", docs=["intro.tex", "outro.tex"], folders=[
+            _folder("Figures", files=["a.png", "b.png"]),
+        ]),
+        _folder("img", files=["logo.png"]),
+        _folder("empty"),
+    ])]})
+
+
+def test_folder_is_deleted_when_all_its_files_are():
+    folders, files = _index().group_deletes(["img/logo.png", "main.tex"])
+    assert folders == {"img": ["img/logo.png"]}
+    assert files == ["main.tex"]
+
+
+def test_only_the_topmost_folder_is_deleted():
+    folders, files = _index().group_deletes(
+        ["chapters/intro.tex", "chapters/outro.tex", "chapters/Figures/a.png", "chapters/Figures/b.png"])
+    assert folders == {"chapters": ["chapters/Figures/a.png", "chapters/Figures/b.png", "chapters/intro.tex",
+                                    "chapters/outro.tex"]}
+    assert files == []
+
+
+def test_sub_folder_is_deleted_when_its_parent_keeps_files():
+    folders, files = _index().group_deletes(["chapters/Figures/a.png", "chapters/Figures/b.png",
+                                             "chapters/intro.tex"])
+    assert folders == {"chapters/Figures": ["chapters/Figures/a.png", "chapters/Figures/b.png"]}
+    assert files == ["chapters/intro.tex"]
+
+
+def test_partially_deleted_folder_is_kept():
+    folders, files = _index().group_deletes(["chapters/Figures/a.png"])
+    assert folders == {}
+    assert files == ["chapters/Figures/a.png"]
+
+
+def test_folder_names_are_matched_case_insensitively():
+    folders, files = _index().group_deletes(["chapters/figures/a.png", "chapters/figures/b.png"])
+    # The folder is reported with its name in the project, the files as they were given
+    assert folders == {"chapters/Figures": ["chapters/figures/a.png", "chapters/figures/b.png"]}
+    assert files == []
+
+
+def test_root_folder_is_never_deleted():
+    index = _index()
+    everything = ["main.tex", "chapters/intro.tex", "chapters/outro.tex", "chapters/Figures/a.png",
+                  "chapters/Figures/b.png", "img/logo.png"]
+    folders, files = index.group_deletes(everything)
+    assert sorted(folders) == ["chapters", "img"]
+    assert files == ["main.tex"]
@@ -0,0 +1,114 @@
+"""Tests of the .olignore rules and the project tree scan"""
+##################################################
+# MIT License
+##################################################
+# File: test_olignore.py
+# Description: gitignore semantics of OlIgnore and pruning of ignored folders in scan_tree
+# License: MIT
+##################################################
+
+import os
+
+from olsync.olignore import OlIgnore, scan_tree
+
+
+def _touch(root, *paths):
+    for path in paths:
+        full_path = os.path.join(root, *path.split("/"))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(path)
+
+
+def test_trailing_slash_matches_folders_at_any_depth():
+    olignore = OlIgnore(["out/"])
+    assert olignore.ignores("out/main.pdf")
+    assert olignore.ignores("chapters/out/main.pdf")
+    # Only folders are matched, not a file of the same name
+    assert not olignore.ignores("out")
+    assert not olignore.ignores("chapters/out")
+
+
+def test_leading_slash_is_anchored_to_the_sync_path():
+    olignore = OlIgnore(["/out"])
+    assert olignore.ignores("out")
+    assert olignore.ignores("out/main.pdf")
+    assert not olignore.ignores("chapters/out/main.pdf")
+
+
+def test_negation_re_includes_a_file():
+    olignore = OlIgnore(["*.log", "!keep.log"])
+    assert olignore.ignores("main.log")
+    assert olignore.ignores("build/main.log")
+    assert not olignore.ignores("keep.log")
+    assert not olignore.ignores("build/keep.log")
+
+
+def test_last_matching_rule_wins():
+    olignore = OlIgnore(["!keep.log", "*.log"])
+    assert olignore.ignores("keep.log")
+
+
+def test_double_star_matches_any_number_of_folders():
+    olignore = OlIgnore(["a/**/b"])
+    assert olignore.ignores("a/b")
+    assert olignore.ignores("a/x/b")
+    assert olignore.ignores("a/x/y/b/file.tex")
+    assert not olignore.ignores("x/a/b")
+    assert not olignore.ignores("a/bc")
+
+
+def test_single_star_does_not_cross_folders():
+    olignore = OlIgnore(["/*.tex"])
+    assert olignore.ignores("main.tex")
+    assert not olignore.ignores("chapters/intro.tex")
+
+
+def test_comments_blank_lines_and_escapes():
+    olignore = OlIgnore(["# comment", "", "   ", "\\#hash.tex", "\\!bang.tex"])
+    assert olignore.ignores("#hash.tex")
+    assert olignore.ignores("!bang.tex")
+    assert not olignore.ignores("comment")
+
+
+def test_old_folder_contents_pattern_still_works():
+    # .olignore files written for the former fnmatch rules exclude a folder's content with folder/*
+    olignore = OlIgnore(["out/*", "*.aux"])
+    assert olignore.ignores("out/main.pdf")
+    assert olignore.ignores("out/sub/main.pdf")
+    assert olignore.ignores("main.aux")
+    assert olignore.ignores("chapters/intro.aux")
+    assert not olignore.ignores("main.tex")
+
+
+def test_excluded_paths_cannot_be_re_included():
+    olignore = OlIgnore(["!output.pdf"])
+    olignore.exclude(["output.pdf", "build/output[1].log"])
+    assert olignore.ignores("output.pdf")
+    assert olignore.ignores("build/output[1].log")
+    assert not olignore.ignores("build/output1.log")
+
+
+def test_scan_tree_prunes_ignored_folders(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    _touch(root, "main.tex", "main.log", "keep.log", "out/main.pdf", "chapters/intro.tex", "chapters/out/x.pdf",
+           ".git/config", "node_modules/pkg/index.js")
+    scanned = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        scanned.append(os.path.relpath(path, root).replace(os.sep, "/"))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+    files = scan_tree(root, OlIgnore(["out/", "*.log", "!keep.log", "node_modules/"]))
+
+    assert sorted(files) == ["chapters/intro.tex", "keep.log", "main.tex"]
+    # Ignored and hidden folders are never entered
+    assert sorted(scanned) == [".", "chapters"]
+
+
+def test_scan_tree_without_rules_keeps_every_visible_file(tmp_path):
+    root = str(tmp_path)
+    _touch(root, "main.tex", "out/main.pdf", ".olsync/state")
+    assert sorted(scan_tree(root)) == ["main.tex", "out/main.pdf"]
@@ -0,0 +1,60 @@
+"""Tests of the PDF download planning"""
+##################################################
+# MIT License
+##################################################
+# File: test_olpdf.py
+# Description: Which parts of a new PDF plan_pdf copies from the previous one and which it downloads
+# License: MIT
+##################################################
+
+from olsync.olpdf import plan_pdf
+from olsync.olremote import REQUEST_COST
+
+SIZE = 10 * REQUEST_COST
+
+
+def _range(name, start, end):
+    return {"hash": name, "start": start, "end": end}
+
+
+def test_without_previous_pdf_or_ranges_the_whole_pdf_is_downloaded():
+    pdf_file = {"size": SIZE, "ranges": [_range("a", 0, SIZE // 2)]}
+    assert plan_pdf(pdf_file, None) is None
+    assert plan_pdf({"size": SIZE, "ranges": []}, {"ranges": [_range("a", 0, 10)]}) is None
+
+
+def test_unchanged_ranges_are_copied_and_the_rest_downloaded():
+    previous = {"ranges": [_range("fonts", 100, 100 + SIZE // 2)]}
+    pdf_file = {"size": SIZE, "ranges": [_range("new", 0, 1000), _range("fonts", 1000, 1000 + SIZE // 2)]}
+    assert plan_pdf(pdf_file, previous) == [(None, 0, 1000), (100, 1000, 1000 + SIZE // 2),
+                                            (None, 1000 + SIZE // 2, SIZE)]
+
+
+def test_small_copied_range_between_downloads_is_downloaded_along():
+    previous = {"ranges": [_range("small", 0, 10), _range("big", 10, 10 + SIZE // 2)]}
+    pdf_file = {"size": SIZE, "ranges": [_range("x", 0, 1000), _range("small", 1000, 1010),
+                                         _range("y", 1010, 2000), _range("big", 2000, 2000 + SIZE // 2)]}
+    assert plan_pdf(pdf_file, previous) == [(None, 0, 2000), (10, 2000, 2000 + SIZE // 2),
+                                            (None, 2000 + SIZE // 2, SIZE)]
+
+
+def test_plan_downloading_the_whole_pdf_is_rejected():
+    # Nothing of the previous PDF is reused, a single GET is as cheap as one range request for everything
+    previous = {"ranges": [_range("old", 0, 100)]}
+    pdf_file = {"size": SIZE, "ranges": [_range("new", 0, 100)]}
+    assert plan_pdf(pdf_file, previous) is None
+    assert plan_pdf(pdf_file, previous, jobs=8) is None
+
+
+def test_plan_is_only_taken_if_cheaper_than_one_download():
+    # Reusing a tiny range costs another request, which the concurrent jobs make cheaper but never free
+    previous = {"ranges": [_range("tiny", 0, 10)]}
+    pdf_file = {"size": SIZE, "ranges": [_range("a", 0, SIZE // 2), _range("tiny", SIZE // 2, SIZE // 2 + 10)]}
+    assert plan_pdf(pdf_file, previous, jobs=1) is None
+    assert plan_pdf(pdf_file, previous, jobs=4) is None
+
+
+def test_overlapping_or_invalid_ranges_are_not_planned():
+    previous = {"ranges": [_range("a", 0, SIZE // 2)]}
+    assert plan_pdf({"size": SIZE, "ranges": [_range("a", 0, SIZE // 2), _range("b", 10, 20)]}, previous) is None
+    assert plan_pdf({"size": SIZE, "ranges": [_range("a", 0, SIZE + 1)]}, previous) is None
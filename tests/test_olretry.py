@@ -0,0 +1,125 @@
+"""Tests of the request retry policy and the adaptive concurrency limit"""
+##################################################
+# MIT License
+##################################################
+# File: test_olretry.py
+# Description: When RetryPolicy retries and how ConcurrencyLimiter adapts its limit
+# License: MIT
+##################################################
+
+import email.utils
+import threading
+import time
+
+from olsync.olretry import ConcurrencyLimiter, RetryPolicy, retry_after
+
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert retry_after({}) is None
+    assert retry_after({"Retry-After": "7"}) == 7.0
+    assert retry_after({"Retry-After": "-3"}) == 0.0
+    assert retry_after({"Retry-After": "soon"}) is None
+    wait = retry_after({"Retry-After": email.utils.formatdate(time.time() + 60, usegmt=True)})
+    assert 55 < wait <= 60
+
+
+def test_backoff_grows_exponentially_up_to_the_maximum():
+    policy = RetryPolicy(backoff_base=1, backoff_max=5)
+    for attempt, bound in ((0, 1), (1, 2), (2, 4), (3, 5), (10, 5)):
+        assert all(0 <= policy.backoff(attempt) <= bound for _ in range(50))
+
+
+def test_overloaded_idempotent_requests_are_retried():
+    policy = RetryPolicy()
+    for status in (429, 502, 503, 504):
+        assert policy.delay(0, True, status) is not None
+
+
+def test_other_statuses_are_not_retried():
+    policy = RetryPolicy()
+    for status in (400, 403, 404, 500):
+        assert policy.delay(0, True, status) is None
+
+
+def test_requests_which_are_not_idempotent_are_only_retried_if_rejected():
+    policy = RetryPolicy()
+    assert policy.delay(0, False, 429) is not None
+    assert policy.delay(0, False, 503) is not None
+    # The proxy may have forwarded the request before it gave up
+    assert policy.delay(0, False, 502) is None
+    assert policy.delay(0, False, 504) is None
+
+
+def test_connection_errors_are_retried_if_the_request_was_not_sent():
+    policy = RetryPolicy()
+    error = ConnectionError()
+    assert policy.delay(0, True, error=error) is not None
+    assert policy.delay(0, False, error=error, connected=False) is not None
+    assert policy.delay(0, False, error=error) is None
+    assert policy.delay(0, True) is None
+
+
+def test_retry_after_is_honoured_up_to_the_maximum():
+    policy = RetryPolicy(retry_after_max=10)
+    assert policy.delay(0, True, 503, {"Retry-After": "4"}) == 4.0
+    assert policy.delay(0, True, 503, {"Retry-After": "11"}) is None
+
+
+def test_retries_are_limited():
+    policy = RetryPolicy(retries=2)
+    assert policy.delay(1, True, 503) is not None
+    assert policy.delay(2, True, 503) is None
+
+
+def test_limit_grows_by_one_per_round_of_successes():
+    limiter = ConcurrencyLimiter(8)
+    limiter.limit = 4.0
+    for _ in range(4):
+        limiter.release(limiter.acquire(), pressure=False)
+    assert 4.9 < limiter.limit < 5.0
+    for _ in range(100):
+        limiter.release(limiter.acquire(), pressure=False)
+    assert limiter.limit == 8
+
+
+def test_pressure_halves_the_limit_once_per_round():
+    limiter = ConcurrencyLimiter(8)
+    permits = [limiter.acquire() for _ in range(8)]
+    # All requests sent before the limit was lowered report the same overload
+    for permit in permits:
+        limiter.release(permit, pressure=True)
+    assert limiter.limit == 4
+    limiter.release(limiter.acquire(), pressure=True)
+    assert limiter.limit == 2
+
+
+def test_limit_never_drops_below_the_minimum():
+    limiter = ConcurrencyLimiter(8, min_limit=3)
+    for _ in range(10):
+        limiter.release(limiter.acquire(), pressure=True)
+    assert limiter.limit == 3
+
+
+def test_outcome_without_information_keeps_the_limit():
+    limiter = ConcurrencyLimiter(4)
+    limiter.limit = 2.0
+    limiter.release(limiter.acquire())
+    assert limiter.limit == 2.0
+
+
+def test_acquire_blocks_at_the_limit():
+    limiter = ConcurrencyLimiter(2)
+    permits = [limiter.acquire(), limiter.acquire()]
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.release(limiter.acquire())
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release(permits[0], pressure=False)
+    assert acquired.wait(5)
+    thread.join()
+    limiter.release(permits[1], pressure=False)